@@ -0,0 +1,307 @@
+"""
+UPSC MULTI-ANGLE PREDICTOR — HEADLESS JSON API
+==============================================
+For partners who call us from code: no script rerun, no CSS, no widget
+tree — just the generation core (predictor.core) behind three endpoints.
+
+    POST /generate          {"topic": "..."} or {"image": "<base64>"}, optional "pipeline": true
+                            → {"text", "usage", "timings"}
+    POST /generate/stream   same body; server-sent events:
+                              event: progress   {"text": "<newly completed blocks>"}
+                              event: done       {"text", "usage", "timings"}
+                              event: error      {"error", "kind"}
+    POST /export            {"text": "<a generated paper>", "format": "pdf" | "docx" | "csv" | "anki"}
+                            → the file, streamed in chunks (predictor.exports: built once
+                              per paper in a background pool, then served from disk)
+    GET  /health            → {"status": "ok", "stats": {...}}
+    GET  /metrics           Prometheus text: outcomes, latency / TTFT / queue-wait
+                            histograms, tokens, image bytes (predictor.telemetry)
+
+Same prompt, cache, admission queue and pooled upstream client as the
+Streamlit page (one Generator per process). Runs on tornado, which ships
+with streamlit already.
+
+    python api_server.py [--port 8600] [--host 127.0.0.1] [--behind-proxy]
+
+Set UPSC_API_TOKENS=tok1,tok2 to require "Authorization: Bearer <token>".
+Without tokens the server only listens on a loopback address: every request
+spends the Anthropic key, with no credit accounting in front of it.
+--behind-proxy trusts X-Forwarded-For / X-Real-Ip for the client address;
+leave it off unless a proxy in front sets them.
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import ipaddress
+import json
+import os
+
+import tornado.iostream
+import tornado.web
+
+from predictor.core import API_ERROR, CAPACITY, OVERLOADED, GenerationResult, Generator
+from predictor.exports import FORMATS as EXPORT_FORMATS, ExportStore
+from predictor.images import prepare as prepare_image
+
+MAX_BODY_BYTES = 20 * 1024 * 1024   # a base64 phone screenshot is a few MB
+MAX_EXPORT_CHARS = 200_000          # a paper is ~7,000 characters
+RETRY_AFTER = 30                    # seconds suggested to callers on 503
+
+# error_kind → HTTP status
+_STATUS = {CAPACITY: 503, OVERLOADED: 503, API_ERROR: 502}
+
+
+def token_id(token: str) -> str:
+    """
+    A stable, non-reversible name for an API token (queueing, telemetry).
+    """
+    return "token-" + hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def result_json(result: GenerationResult) -> dict:
+    return {
+        "text": result.text,
+        "usage": result.usage and result.usage.to_dict(),
+        "timings": result.timings,
+    }
+
+
+class BaseHandler(tornado.web.RequestHandler):
+
+    def initialize(self, generator: Generator, tokens: frozenset, exports: ExportStore):
+        self.generator = generator
+        self.tokens = tokens
+        self.exports = exports
+
+    def prepare(self):
+        if self.tokens:
+            scheme, _, token = self.request.headers.get("Authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or token not in self.tokens:
+                self.send_json(401, {"error": "missing or invalid API token"})
+                self.finish()
+
+    def send_json(self, status: int, payload: dict):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(payload))
+
+    @property
+    def session_id(self) -> str:
+        # Fair queueing per partner token — checked in prepare() — or per address
+        # when tokens are off (an unchecked header would let one caller rotate keys).
+        # The id lands in telemetry, so a token goes in as a digest, never as itself.
+        if self.tokens:
+            _, _, token = self.request.headers.get("Authorization", "").partition(" ")
+            return token_id(token)
+        return self.request.remote_ip
+
+    async def parse_request(self):
+        """
+        Body → (topic, prepared image, pipeline), or None after writing a 400.
+        """
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            self.send_json(400, {"error": "body must be JSON"})
+            return None
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "body must be a JSON object"})
+            return None
+
+        topic, image = body.get("topic"), None
+        if body.get("image"):
+            try:
+                data = base64.b64decode(body["image"], validate=True)
+                # Decoding + resizing is CPU work; keep it off the event loop
+                image = await asyncio.to_thread(prepare_image, data)
+            except (binascii.Error, ValueError) as e:
+                self.send_json(400, {"error": f"bad image: {e}"})
+                return None
+            self.generator.image_stats.record(image)
+            topic = None
+        elif not isinstance(topic, str) or len(topic.strip()) < 5:
+            self.send_json(400, {"error": "send a 'topic' (at least 5 characters) or a base64 'image'"})
+            return None
+        return topic, image, bool(body.get("pipeline"))
+
+    def write_error_result(self, result: GenerationResult):
+        status = _STATUS.get(result.error_kind, 500)
+        if status == 503:
+            self.set_header("Retry-After", str(RETRY_AFTER))
+        self.send_json(status, {"error": result.error, "kind": result.error_kind})
+
+
+class GenerateHandler(BaseHandler):
+
+    async def post(self):
+        request = await self.parse_request()
+        if request is None:
+            return
+        topic, image, pipeline = request
+        # Cache hits skip the generation pool; the lookup is SQLite, so still off the event loop
+        result = (await asyncio.to_thread(self.generator.cached, topic, image, session_id=self.session_id)
+                  or await self.generator.agenerate(topic, image, pipeline=pipeline, session_id=self.session_id))
+        if result.ok:
+            self.send_json(200, result_json(result))
+        else:
+            self.write_error_result(result)
+
+
+class StreamHandler(BaseHandler):
+
+    async def post(self):
+        request = await self.parse_request()
+        if request is None:
+            return
+        topic, image, pipeline = request
+
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")     # don't let a proxy sit on the events
+
+        result = await asyncio.to_thread(self.generator.cached, topic, image, session_id=self.session_id)
+        if result is not None:
+            await self.event("done", result_json(result))
+            return
+
+        # on_progress runs on a worker thread; hand each update to the loop
+        loop = asyncio.get_running_loop()
+        updates = asyncio.Queue()
+        sent = 0
+
+        def on_progress(text):
+            loop.call_soon_threadsafe(updates.put_nowait, text)
+
+        task = asyncio.ensure_future(self.generator.agenerate(
+            topic, image, stream=True, pipeline=pipeline,
+            session_id=self.session_id, on_progress=on_progress,
+        ))
+        while True:
+            getter = asyncio.ensure_future(updates.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            text = getter.result()
+            await self.event("progress", {"text": text[sent:]})
+            sent = len(text)
+
+        result = task.result()
+        if result.ok:
+            await self.event("done", result_json(result))
+        else:
+            await self.event("error", {"error": result.error, "kind": result.error_kind})
+
+    async def event(self, name: str, payload: dict):
+        self.write(f"event: {name}\ndata: {json.dumps(payload)}\n\n")
+        try:
+            await self.flush()
+        except tornado.iostream.StreamClosedError:
+            pass    # client went away; the generation still finishes and lands in the cache
+
+
+class ExportHandler(BaseHandler):
+
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            self.send_json(400, {"error": "body must be JSON"})
+            return
+        text = body.get("text") if isinstance(body, dict) else None
+        fmt = body.get("format") if isinstance(body, dict) else None
+        fmt = EXPORT_FORMATS.get(fmt) if isinstance(fmt, str) else None
+        if not isinstance(text, str) or not text.strip() or len(text) > MAX_EXPORT_CHARS:
+            self.send_json(400, {"error": f"send the paper as 'text' (up to {MAX_EXPORT_CHARS:,} characters)"})
+            return
+        if fmt is None:
+            self.send_json(400, {"error": f"'format' must be one of {', '.join(EXPORT_FORMATS)}"})
+            return
+
+        # Built (or found on disk) in the export pool, never on the event loop
+        artifact = await asyncio.wrap_future(self.exports.request(text, fmt.name))
+        self.set_header("Content-Type", fmt.mime)
+        self.set_header("Content-Length", str(artifact.size))
+        self.set_header("Content-Disposition", f'attachment; filename="upsc_questions.{fmt.extension}"')
+        for chunk in artifact.chunks():
+            self.write(chunk)
+            try:
+                await self.flush()
+            except tornado.iostream.StreamClosedError:
+                return
+
+
+class HealthHandler(BaseHandler):
+
+    def prepare(self):
+        pass        # load balancers probe without a token
+
+    def get(self):
+        self.send_json(200, {"status": "ok", "stats": {**self.generator.stats(), "exports": self.exports.stats()}})
+
+
+class MetricsHandler(BaseHandler):
+
+    def prepare(self):
+        pass        # scraped from inside the network, like /health
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(self.generator.telemetry.metrics_text())
+
+
+def make_app(generator: Generator, tokens=(), exports: ExportStore = None) -> tornado.web.Application:
+    options = {"generator": generator, "tokens": frozenset(tokens), "exports": exports or ExportStore.from_env()}
+    return tornado.web.Application([
+        (r"/generate", GenerateHandler, options),
+        (r"/generate/stream", StreamHandler, options),
+        (r"/export", ExportHandler, options),
+        (r"/health", HealthHandler, options),
+        (r"/metrics", MetricsHandler, options),
+    ])
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def serve(host: str, port: int, generator: Generator, tokens=(), behind_proxy: bool = False):
+    exports = ExportStore.from_env()
+    app = make_app(generator, tokens, exports)
+    server = app.listen(port, address=host, max_body_size=MAX_BODY_BYTES, xheaders=behind_proxy)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.stop()
+        exports.close()
+        generator.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UPSC predictor JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8600)))
+    parser.add_argument("--behind-proxy", action="store_true",
+                        help="take the client address from X-Forwarded-For / X-Real-Ip")
+    args = parser.parse_args()
+
+    tokens = [t.strip() for t in os.environ.get("UPSC_API_TOKENS", "").split(",") if t.strip()]
+    if not tokens and not is_loopback(args.host):
+        parser.error(f"refusing to listen on {args.host} without UPSC_API_TOKENS — "
+                     "anyone who can reach it could spend the API key")
+    generator = Generator.from_env()
+    print(f"UPSC predictor API on http://{args.host}:{args.port} "
+          f"({'token auth' if tokens else 'no auth'}, upstream {generator.model})")
+    asyncio.run(serve(args.host, args.port, generator, tokens, args.behind_proxy))
+
+
+if __name__ == "__main__":
+    main()
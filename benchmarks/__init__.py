@@ -0,0 +1,3 @@
+"""
+Benchmarks — run from the repo root, e.g. `python -m benchmarks.bench_client_pool`.
+"""
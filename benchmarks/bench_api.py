@@ -0,0 +1,149 @@
+"""
+BENCHMARK — headless JSON API
+=============================
+Starts the mock upstream in-process and api_server.py as a separate
+process (so the load generator doesn't share its GIL), then drives the API
+over real HTTP with an asyncio client at several concurrency levels and
+reports requests/s and p50 / p95 / p99 latency for:
+
+- cold      POST /generate, a new topic every request (upstream call each time)
+- warm      POST /generate, topics already answered (response cache)
+- stream    POST /generate/stream, new topics; also time to first event
+
+    python -m benchmarks.bench_api [-n 200] [--levels 1,10,50] [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.mock_anthropic import MockServer
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def start_api(upstream_url: str, cache_dir: str) -> tuple:
+    """
+    Launch api_server.py against the mock with admission limits out of the way.
+    Returns (process, base URL) once /health answers.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(
+        os.environ,
+        ANTHROPIC_API_KEY="x", ANTHROPIC_BASE_URL=upstream_url,
+        UPSC_CACHE_PATH=os.path.join(cache_dir, "responses.sqlite3"),
+        UPSC_MAX_CONCURRENCY="256", UPSC_REQUESTS_PER_MIN="1e9", UPSC_TOKENS_PER_MIN="1e12",
+        UPSC_WORKERS="64",
+    )
+    process = subprocess.Popen([sys.executable, "api_server.py", "--host", "127.0.0.1", "--port", str(port)],
+                               env=env, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{url}/health").raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("api_server.py did not come up")
+
+
+async def one(reader, writer, path: str, topic: str) -> tuple:
+    """
+    One request on a kept-alive connection.
+    Returns (seconds total, seconds to first event / body, ok).
+
+    A bare HTTP/1.1 client: an async httpx client tops out at a few hundred
+    requests/s in one process and would be what this measured.
+    """
+    body = json.dumps({"topic": topic}).encode()
+    start = time.perf_counter()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    ok = head.startswith("http/1.1 200")
+    if "transfer-encoding: chunked" not in head:
+        length = int(head.split("content-length:")[1].split("\r\n")[0])
+        await reader.readexactly(length)
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed, ok
+
+    # Server-sent events arrive as chunks; the last one is empty
+    first, done = None, False
+    while True:
+        size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+        chunk = await reader.readexactly(size + 2)
+        if not size:
+            break
+        first = first or time.perf_counter() - start
+        done = done or b"event: done" in chunk
+    return time.perf_counter() - start, first, ok and done
+
+
+async def run(url: str, topics: list, concurrency: int, stream: bool) -> tuple:
+    host, port = url.rsplit("/", 1)[1].split(":")
+    path = "/generate/stream" if stream else "/generate"
+    pending = iter(topics)
+    results = []
+
+    async def connection():
+        reader, writer = await asyncio.open_connection(host, int(port))
+        for topic in pending:
+            results.append(await one(reader, writer, path, topic))
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=200, help="requests per run")
+    parser.add_argument("--levels", default="1,10,50", help="client concurrency levels")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=20000, help="mock generation speed")
+    args = parser.parse_args()
+
+    with MockServer(latency=args.latency, tokens_per_sec=args.tokens_per_sec) as upstream, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        process, url = start_api(upstream.url, cache_dir)
+
+        print(f"{args.n} requests per run, mock latency {args.latency * 1000:.0f} ms\n")
+        print(f"{'mode':7} {'conc':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'first evt':>10} {'failed':>6}")
+        for concurrency in (int(c) for c in args.levels.split(",")):
+            cold = [f"Cold topic {concurrency}-{i}" for i in range(args.n)]
+            for mode, topics, stream in (("cold", cold, False),
+                                         ("warm", cold, False),
+                                         ("stream", [t.replace("Cold", "Stream") for t in cold], True)):
+                elapsed, results = asyncio.run(run(url, topics, concurrency, stream))
+                totals = [r[0] for r in results]
+                firsts = [r[1] for r in results if r[1] is not None]
+                failed = sum(not r[2] for r in results)
+                first = f"{percentile(firsts, 0.5) * 1000:8.0f}ms" if stream else f"{'-':>10}"
+                print(f"{mode:7} {concurrency:5d} {len(topics) / elapsed:8.1f} "
+                      f"{percentile(totals, 0.5) * 1000:6.0f}ms {percentile(totals, 0.95) * 1000:6.0f}ms "
+                      f"{percentile(totals, 0.99) * 1000:6.0f}ms {first} {failed:6d}")
+        process.terminate()
+        process.wait()
+        print(f"\nupstream calls: {upstream.config.requests}")
+
+
+if __name__ == "__main__":
+    main()
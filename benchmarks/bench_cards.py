@@ -0,0 +1,144 @@
+"""
+BENCHMARK — question cards vs one <pre> block
+=============================================
+The old page drew a paper as one f-string <div><pre>…</pre></div> with the
+raw model text inside; the new one draws escaped per-question cards, one
+page at a time (paper_cards). For a standard mock paper and one padded to
+the size of a real ~6,000-token answer:
+
+- payload: HTML bytes handed to the browser for the whole <pre> vs for the
+  page of cards on screen
+- build time: parsing into cards (first time, then the per-rerun cached hit)
+- escaping: a paper containing "<" and a <script> tag, old vs new
+- the real page through Streamlit's AppTest with a paper on screen: rerun
+  script time and the protobuf bytes of the elements sent (--script to run
+  an older streamlit_app.py for comparison)
+
+Browser layout time itself needs a browser; payload size and element count
+are what drive it and are what is measured here.
+
+    python -m benchmarks.bench_cards [--repeat 20] [--script streamlit_app.py] [--no-apptest]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import paper_cards
+from benchmarks.mock_anthropic import MockServer, sample_output
+
+# ~6,000 tokens: the size of a real paper with full explanations
+LONG_EXPLANATION = ("Section 45ZB of the RBI Act constitutes the MPC. " + "The committee meets at least four "
+                    "times a year and its decisions are taken by majority, the Governor voting only on a tie. ") * 20
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def old_html(output: str) -> str:
+    """
+    What display_output used to send: the raw text, unescaped, in one block.
+    """
+    return f"""
+    <div style="background: #f7fafc; padding: 1.5rem; border-radius: 10px; border: 1px solid #e2e8f0;">
+        <pre style="white-space: pre-wrap; font-family: 'Segoe UI', sans-serif; font-size: 0.95rem; line-height: 1.6;">{output}</pre>
+    </div>
+    """
+
+
+def page_bytes(paper, page: int) -> int:
+    cards = paper.page(page)
+    parts = [c.body + c.details + c.details_label for c in cards] + ([paper.summary] if page == 0 else [])
+    return sum(len(p.encode()) for p in parts)
+
+
+def offline(name: str, output: str):
+    old = len(old_html(output).encode())
+    paper_cards.build.cache_clear()
+    started = time.perf_counter()
+    paper = paper_cards.build(output)
+    cold = time.perf_counter() - started
+    warm = []
+    for _ in range(1000):
+        started = time.perf_counter()
+        paper_cards.build(output)
+        warm.append(time.perf_counter() - started)
+    pages = [page_bytes(paper, i) for i in range(paper.pages())]
+    print(f"{name}: {len(output):,} chars, {len(paper.cards)} cards on {paper.pages()} pages")
+    print(f"  payload: one <pre> {old / 1024:.1f} KB → cards on screen "
+          + ", ".join(f"{label} {b / 1024:.1f} KB" for label, b in zip(paper.page_labels(), pages))
+          + f" ({old / max(pages):.1f}× less per rerun)")
+    print(f"  build: first {cold * 1000:.2f} ms, cached p50 {percentile(warm, 0.5) * 1e6:.1f} µs")
+
+
+def escaping():
+    hostile = sample_output("Article 370 <abrogation> & J&K").replace(
+        "📖 Explanation: Section 45ZB", "📖 Explanation: if x < y then <script>alert(1)</script> Section 45ZB", 1)
+    paper = paper_cards.build(hostile)
+    html = "".join(c.body + c.details for c in paper.cards) + paper.summary
+    print(f"escaping: raw <script> in old block: {'<script>' in old_html(hostile)}, "
+          f"in cards: {'<script>' in html}; '<abrogation>' shown as text: {'&lt;abrogation&gt;' in html}")
+
+
+def proto_bytes(at) -> tuple:
+    count, size, stack = 0, 0, [at._tree]
+    while stack:
+        node = stack.pop()
+        children = getattr(node, "children", None)
+        if children:
+            stack.extend(children.values())
+        else:
+            count += 1
+            proto = getattr(node, "proto", None)
+            size += proto.ByteSize() if proto is not None else 0
+    return count, size
+
+
+def apptest(script: str, repeat: int):
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as directory, MockServer(latency=0.05, chunk_delay=0.0) as server:
+        os.environ.update({
+            "ANTHROPIC_BASE_URL": server.url,
+            "ANTHROPIC_API_KEY": "bench",
+            "UPSC_CACHE_PATH": os.path.join(directory, "cache.sqlite3"),
+            "UPSC_LEDGER": os.path.join(directory, "ledger.sqlite3"),
+        })
+        at = AppTest.from_file(script, default_timeout=60)
+        at.query_params["account"] = "bench-cards"
+        at.run()
+        at.text_area[0].input("RBI keeps repo rate unchanged").run()
+        at.button[0].click().run()
+        clicked = proto_bytes(at)
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            at.run()
+            runs.append(time.perf_counter() - started)
+        elements, size = proto_bytes(at)
+        print(f"{script} with a paper on screen (AppTest, {repeat} reruns):")
+        print(f"  generate click: {clicked[0]} elements, {clicked[1] / 1024:.1f} KB")
+        print(f"  rerun: p50 {percentile(runs, 0.5) * 1000:.1f} ms, p95 {percentile(runs, 0.95) * 1000:.1f} ms, "
+              f"{elements} elements, {size / 1024:.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--script", default="streamlit_app.py")
+    parser.add_argument("--no-apptest", action="store_true")
+    args = parser.parse_args()
+
+    standard = sample_output()
+    offline("mock paper", standard)
+    offline("real-size paper", standard.replace("Section 45ZB of the RBI Act constitutes the MPC.", LONG_EXPLANATION))
+    escaping()
+    if not args.no_apptest:
+        apptest(args.script, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
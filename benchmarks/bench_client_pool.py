@@ -0,0 +1,86 @@
+"""
+BENCHMARK — fresh client per request vs one pooled client
+=========================================================
+Simulates 1, 10 and 100 concurrent sessions hitting a local mock Messages
+endpoint with zero model latency, so what's left is pure client overhead:
+building the SDK client (httpx + SSL context), connecting, and tearing down.
+
+    python -m benchmarks.bench_client_pool [--requests 20]
+
+The mock is plain HTTP, so real-world savings are larger: every fresh client
+against api.anthropic.com also pays a TLS handshake.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import anthropic
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.client import build_client
+
+MESSAGES = [{"role": "user", "content": "Generate 10 UPSC practice questions for this topic:\n\nRBI repo rate\n\n"}]
+
+
+def one_call(client: anthropic.Anthropic):
+    client.messages.create(model="mock", max_tokens=16, messages=MESSAGES)
+
+
+def run(base_url: str, sessions: int, per_session: int, pooled: bool) -> list:
+    latencies = []
+    lock = threading.Lock()
+    shared = build_client("x", base_url=base_url) if pooled else None
+
+    def session():
+        mine = []
+        for _ in range(per_session):
+            start = time.perf_counter()
+            if pooled:
+                one_call(shared)
+            else:
+                # What the app did before: a brand-new client for every click
+                client = anthropic.Anthropic(api_key="x", base_url=base_url)
+                one_call(client)
+                client.close()
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if shared:
+        shared.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20, help="requests per session")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    with MockServer(output="ok") as server:
+        run(server.url, 1, 5, pooled=True)   # warm-up: imports, first connection
+
+        print(f"{'sessions':>8} {'mode':>7} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for sessions in args.sessions:
+            results = {}
+            for pooled in (False, True):
+                lat = sorted(run(server.url, sessions, args.requests, pooled))
+                results[pooled] = statistics.mean(lat)
+                print(f"{sessions:>8} {'pooled' if pooled else 'fresh':>7} "
+                      f"{statistics.mean(lat) * 1000:>9.2f} "
+                      f"{lat[len(lat) // 2] * 1000:>8.2f} "
+                      f"{lat[int(len(lat) * 0.95)] * 1000:>8.2f}")
+            saved = results[False] - results[True]
+            print(f"{'':>8} saved {saved * 1000:.2f} ms per request "
+                  f"({saved / results[False]:.0%})")
+
+
+if __name__ == "__main__":
+    main()
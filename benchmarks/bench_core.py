@@ -0,0 +1,89 @@
+"""
+LOAD TEST — generation core in a worker pool
+============================================
+Drives predictor.core.Generator directly (no Streamlit) against the local
+mock Messages endpoint and measures how throughput scales with the number
+of generations in flight, through both front ends:
+
+- submit()      concurrent.futures, from plain threads
+- agenerate()   asyncio, from one event loop
+
+Every request uses a distinct topic so nothing is served from the response
+cache or coalesced; admission limits are set high enough not to interfere.
+
+    python -m benchmarks.bench_core [-n 64] [--levels 1,4,16,64] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.cache import ResponseCache
+from predictor.core import Generator
+from predictor.scheduler import AdmissionController
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def build(url: str, workers: int) -> Generator:
+    return Generator(
+        "x", base_url=url, cache=ResponseCache(":memory:"),
+        controller=AdmissionController(max_concurrency=1024, requests_per_min=1e9, tokens_per_min=1e12),
+        max_workers=workers,
+    )
+
+
+def run_threads(url: str, n: int, workers: int, tag: str) -> tuple:
+    generator = build(url, workers)
+    start = time.perf_counter()
+    futures = [generator.submit(f"{tag} topic {i}") for i in range(n)]
+    results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    generator.close()
+    return elapsed, results
+
+
+def run_async(url: str, n: int, workers: int, tag: str) -> tuple:
+    generator = build(url, workers)
+
+    async def main():
+        return await asyncio.gather(*(generator.agenerate(f"{tag} topic {i}") for i in range(n)))
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    generator.close()
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=64, help="generations per run")
+    parser.add_argument("--levels", default="1,4,16,64", help="worker counts to try")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock seconds per response")
+    args = parser.parse_args()
+
+    print(f"{args.n} generations per run, mock latency {args.latency * 1000:.0f} ms\n")
+    print(f"{'front end':11} {'workers':>7} {'gen/s':>8} {'speedup':>8} {'p50':>8} {'p95':>8} {'errors':>6}")
+    with MockServer(latency=args.latency) as server:
+        for name, run in (("submit", run_threads), ("agenerate", run_async)):
+            baseline = None
+            for workers in (int(w) for w in args.levels.split(",")):
+                elapsed, results = run(server.url, args.n, workers, f"{name}-{workers}")
+                totals = [r.timings["total"] for r in results if r.ok]
+                errors = sum(not r.ok for r in results)
+                throughput = args.n / elapsed
+                baseline = baseline or throughput
+                print(f"{name:11} {workers:7d} {throughput:8.1f} {throughput / baseline:7.1f}x "
+                      f"{statistics.median(totals):7.2f}s {percentile(totals, 0.95):7.2f}s {errors:6d}")
+                if errors:
+                    print("  first error:", next(r.error for r in results if not r.ok))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+BENCHMARK — PDF / Word / flashcard exports for 100 papers
+=========================================================
+Builds every export format (predictor.exports) for 100 distinct papers
+and reports:
+
+- per format: build time p50 / p99 and file size
+- bulk export: all 100 papers × all formats through the ExportStore pool
+  — wall time, peak Python allocations (tracemalloc) and process RSS
+  growth — then the same requests again, now answered from disk
+- naive: building in the script on every rerun instead, at --reruns reruns
+  per paper on screen (page turns, expanders, other widgets), and the bytes
+  a session would hold if it kept the built files in session state
+- a store bounded at a quarter of the total: files and bytes kept, evictions
+
+    python -m benchmarks.bench_exports [--papers 100] [--reruns 5] [--workers 2]
+"""
+
+import argparse
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.mock_anthropic import sample_output
+from predictor.exports import FORMATS, ExportStore
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def rss_mb() -> float:
+    # Peak resident set size so far (Linux reports KB)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--papers", type=int, default=100)
+    parser.add_argument("--reruns", type=int, default=5, help="reruns per paper on screen, for the naive case")
+    parser.add_argument("--workers", type=int, default=2, help="export pool size")
+    args = parser.parse_args()
+    papers = [sample_output(f"Current affairs topic {i}") for i in range(args.papers)]
+
+    print(f"{args.papers} papers (~{len(papers[0]):,} characters each)\n")
+    print(f"{'format':18} {'p50':>8} {'p99':>8} {'size':>9}")
+    sizes = {}
+    for fmt in FORMATS.values():
+        seconds = []
+        for paper in papers:
+            started = time.perf_counter()
+            data = fmt.build(paper, None)
+            seconds.append(time.perf_counter() - started)
+        sizes[fmt.name] = len(data)
+        print(f"{fmt.label:18} {percentile(seconds, 0.5) * 1000:6.1f}ms {percentile(seconds, 0.99) * 1000:6.1f}ms "
+              f"{len(data) / 1024:7.1f}KB")
+    per_paper = sum(sizes.values())
+
+    directory = tempfile.mkdtemp(prefix="bench-exports-")
+    try:
+        store = ExportStore(f"{directory}/timed", workers=args.workers)
+        started = time.perf_counter()
+        artifacts = [f.result() for f in [store.request(paper, fmt) for paper in papers for fmt in FORMATS]]
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        warm_artifacts = [store.request(paper, fmt).result() for paper in papers for fmt in FORMATS]
+        warm = time.perf_counter() - started
+        store.close()
+
+        # Memory on a second, empty store (tracemalloc slows allocation down, so not timed)
+        store = ExportStore(f"{directory}/traced", workers=args.workers)
+        rss_before = rss_mb()
+        tracemalloc.start()
+        for future in [store.request(paper, fmt) for paper in papers for fmt in FORMATS]:
+            future.result()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_growth = rss_mb() - rss_before
+        store.close()
+
+        total = sum(a.size for a in artifacts)
+        print(f"\nbulk export, {len(artifacts)} files ({total / 1024 / 1024:.1f} MB) with {args.workers} workers:")
+        print(f"  built        {cold:6.2f}s ({cold / args.papers * 1000:.1f} ms per paper), "
+              f"peak allocations {peak / 1024 / 1024:.1f} MB, peak RSS +{rss_growth:.1f} MB")
+        print(f"  again        {warm:6.2f}s ({warm / len(warm_artifacts) * 1e6:.0f} µs per file, from disk)")
+
+        naive = args.reruns * cold      # every rerun rebuilds what the page shows
+        print(f"\nnaive, {args.reruns} reruns per paper: {naive:.2f}s of rebuilding vs {cold + warm * args.reruns:.2f}s; "
+              f"{per_paper / 1024:.0f} KB per paper held in session state vs none")
+
+        bounded = ExportStore(f"{directory}/bounded", max_bytes=total // 4, workers=args.workers)
+        for future in [bounded.request(paper, fmt) for paper in papers for fmt in FORMATS]:
+            future.result()
+        stats = bounded.stats()
+        print(f"\nbounded at {total // 4 / 1024 / 1024:.1f} MB: {stats['files']} files, "
+              f"{stats['bytes'] / 1024 / 1024:.2f} MB kept, {stats['evictions']} evicted")
+        bounded.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+BENCHMARK — query history at 1k entries per user
+================================================
+Fills one account's history with 1,000 generations (a third of them
+repeats of earlier topics, i.e. cache hits replaying the same paper) and
+reports:
+
+- storage: raw paper bytes vs what the ledger keeps (zlib + dedup)
+- per-session memory: the old in-session list (1k dicts with a 500-char
+  preview each) vs the recent window the page keeps now
+- page load: one sidebar page of entries, the count, and re-opening a
+  full paper, p50 / p99
+- the whole page through Streamlit's AppTest on page 1 and on the last page
+
+    python -m benchmarks.bench_history [--entries 1000] [--no-apptest]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.mock_anthropic import sample_output
+from predictor.ledger import SQLiteLedger
+from predictor.usage import UsageRecord
+
+ACCOUNT = "bench-history"
+PAGE = 8    # matches HISTORY_PAGE in streamlit_app.py
+
+
+def entries(n: int, rng: random.Random) -> list:
+    topics = []
+    for i in range(n):
+        if topics and rng.random() < 1 / 3:
+            topics.append(rng.choice(topics))        # repeat → cache hit → identical paper
+        else:
+            topics.append(f"Current affairs topic number {i}: {rng.choice(['RBI', 'LAC', 'GST', 'NEET'])} update")
+    usage = UsageRecord("claude-sonnet-4-20250514", 1200, 5200, 0, 3900, "end_turn")
+    return [(topic, sample_output(topic), usage) for topic in topics]
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    value = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return value, sum(s.size_diff for s in after.compare_to(before, "filename"))
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def timed(fn, repeat: int) -> list:
+    out = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - started)
+    return out
+
+
+def apptest(path: str, pages: int):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["UPSC_LEDGER"] = path
+    at = AppTest.from_file("streamlit_app.py", default_timeout=60)
+    at.query_params["account"] = ACCOUNT
+    started = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - started
+    reruns = timed(at.run, 5)
+    at.session_state["history_page"] = pages - 1
+    last_page = timed(at.run, 5)
+    shown = [b.label for b in at.sidebar.button if b.key and b.key.startswith("history-") and b.label not in "◀▶"]
+    print(f"page render (AppTest): first load {first * 1000:.0f} ms, rerun p50 "
+          f"{percentile(reruns, 0.5) * 1000:.0f} ms, on page {pages} p50 {percentile(last_page, 0.5) * 1000:.0f} ms "
+          f"({len(shown)} entries shown)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--no-apptest", action="store_true")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    data = entries(args.entries, random.Random(args.seed))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ledger.sqlite3")
+        ledger = SQLiteLedger(path)
+        ledger.open_account(ACCOUNT, 0)
+        hashes = []
+        started = time.perf_counter()
+        for topic, output, usage in data:
+            hashes.append(ledger.record(ACCOUNT, {
+                "topic": topic, "timestamp": datetime.now().isoformat(),
+                "timings": {"total": 21.0, "cached": False}, "usage": usage.to_dict(),
+            }, output))
+        ledger.flush()
+        print(f"recorded {len(data):,} entries in {time.perf_counter() - started:.2f}s "
+              f"({ledger.history_batches} batch writes)")
+
+        db = sqlite3.connect(path)
+        papers, stored, raw_unique = db.execute(
+            "SELECT COUNT(*), SUM(LENGTH(data)), SUM(size) FROM outputs").fetchone()
+        db.close()
+        raw = sum(len(output.encode()) for _, output, _ in data)
+        on_disk = sum(os.path.getsize(f) for f in (path, path + "-wal") if os.path.exists(f))
+        print(f"storage: {raw / 1e6:.1f} MB of (mock) papers → {papers:,} distinct ({raw_unique / 1e6:.1f} MB) "
+              f"→ {stored / 1e6:.2f} MB compressed ({raw / stored:.0f}× smaller), "
+              f"ledger file {on_disk / 1e6:.1f} MB incl. WAL")
+
+        # What a session used to hold vs what it holds now
+        old, old_bytes = measure(lambda: [{
+            "topic": topic, "timestamp": datetime.now().isoformat(), "output": output[:500] + "...",
+            "timings": {"total": 21.0, "cached": False}, "usage": usage,
+        } for topic, output, usage in data])
+        window, new_bytes = measure(lambda: ledger.history(ACCOUNT, PAGE))
+        print(f"per-session memory: old list {old_bytes / 1024:,.0f} KB (previews only, no full papers) "
+              f"→ recent window {new_bytes / 1024:,.1f} KB")
+        del old, window
+
+        pages = -(-len(data) // PAGE)
+        offsets = [random.randrange(pages) * PAGE for _ in range(500)]
+        page_times = [t for offset in offsets for t in timed(lambda: ledger.history(ACCOUNT, PAGE, offset), 1)]
+        count_times = timed(lambda: ledger.history_count(ACCOUNT), 500)
+        reopen_times = [t for h in random.sample(hashes, 200) for t in timed(lambda: ledger.output(h), 1)]
+        for name, values in (("history page", page_times), ("history count", count_times),
+                             ("re-open paper", reopen_times)):
+            print(f"{name:>14}: p50 {percentile(values, 0.5) * 1e6:,.0f} µs, p99 {percentile(values, 0.99) * 1e6:,.0f} µs")
+        ledger.close()
+
+        if not args.no_apptest:
+            apptest(path, pages)
+
+
+if __name__ == "__main__":
+    main()
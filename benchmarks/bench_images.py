@@ -0,0 +1,247 @@
+"""
+BENCHMARK — screenshot preprocessing
+====================================
+Renders synthetic phone-sized news screenshots (PNG, JPEG and WebP), runs
+them through predictor.images.prepare and reports per upload:
+
+- bytes before / after and estimated image tokens saved
+- time spent preparing vs upload time saved at a given uplink speed
+- measured request time against the local mock, raw vs prepared payload
+
+and checks the perceptual hash: re-encoded / resized copies of one
+screenshot must map to one cache key through HashIndex, and different
+screenshots must not share one — also for --dense text-only pages in small
+fonts, whose coarse hashes land within a few bits of each other — and that
+two processes sharing one cache file agree on the key whichever copy each
+saw first.
+
+    python -m benchmarks.bench_images [-n 12] [--dense 24] [--uplink-mbps 10]
+"""
+
+import argparse
+import base64
+import io
+import random
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.client import build_client
+from predictor.images import DETAIL_SIZE, HashIndex, hamming, image_tokens, prepare, sniff
+
+HEADLINES = [
+    "RBI keeps repo rate unchanged at 6.5%", "Governor delays NEET bill in Tamil Nadu",
+    "India-China LAC disengagement completed", "CEC removal and the 2023 Act",
+    "Heatwaves test urban planning", "Great Nicobar project clears review",
+    "One Nation One Election bill tabled", "DPDP rules notified",
+]
+
+WORDS = ("the government said on monday that the committee would examine the proposal in detail "
+         "before parliament takes it up in the winter session amid opposition demands").split()
+
+
+def screenshot(rng: random.Random, headline: str, size=(1170, 2532)) -> Image.Image:
+    """
+    A news-app screenshot: status bar, coloured masthead, photo, headline, body text.
+    """
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.rectangle((0, 0, width, 90), fill=(20, 20, 20))
+    draw.rectangle((0, 90, width, 260), fill=tuple(rng.randrange(40, 200) for _ in range(3)))
+    # "photo": noisy gradient block — the part that makes real screenshots heavy
+    photo = Image.effect_noise((width - 80, 600), rng.randrange(40, 90)).convert("RGB")
+    image.paste(photo, (40, 300))
+    y = 940
+    for line in range(3):
+        draw.text((40, y), headline.upper() if line == 0 else headline, fill="black", font_size=64)
+        y += 80
+    while y < height - 60:
+        words = " ".join(rng.choice(WORDS) for _ in range(9))
+        draw.text((40, y), words, fill=(60, 60, 60), font_size=38)
+        y += 52
+    return image
+
+
+def dense_screenshot(rng: random.Random, headline: str, size=(1170, 2532)) -> Image.Image:
+    """
+    A text-only article page in a small font: no photo, nothing but lines of body text.
+    """
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    draw.rectangle((0, 0, width, 90), fill=(20, 20, 20))
+    draw.text((40, 120), headline, fill="black", font_size=34)
+    font, step = rng.choice((18, 20, 22, 24)), rng.choice((26, 28, 30))
+    y = 180
+    while y < height - 40:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 14)))
+        draw.text((40, y), words, fill=(60, 60, 60), font_size=font)
+        y += step
+    return image
+
+
+def shared_copies(image: Image.Image) -> list:
+    """
+    The same screenshot as other users would share it.
+    """
+    return [encode(image, "JPEG", quality=70), encode(image.resize((585, 1266)), "PNG"),
+            encode(image, "WEBP", quality=60)]
+
+
+def check_dense(rng: random.Random, n: int) -> tuple:
+    """
+    (failures, worst coarse distance between copies, closest coarse pair of
+    different pages, closest detail pair) for n dense text pages.
+    """
+    index = HashIndex()
+    failures, worst, pages = 0, 0, []
+    for i in range(n):
+        image = dense_screenshot(rng, HEADLINES[i % len(HEADLINES)] + f" ({i})")
+        prepared = prepare(encode(image, "PNG"))
+        pages.append(prepared)
+        key = index.canonical(prepared.phash, prepared.detail_hash)
+        if key != prepared.phash:
+            print(f"dense page {i}: matched an earlier, different page")
+            failures += 1
+        for variant in shared_copies(image):
+            copy = prepare(variant)
+            worst = max(worst, hamming(prepared.phash, copy.phash))
+            if index.canonical(copy.phash, copy.detail_hash) != key:
+                print(f"dense page {i}: re-encoded copy got a different cache key")
+                failures += 1
+    pairs = [(a, b) for i, a in enumerate(pages) for b in pages[i + 1:]]
+    coarse = min(hamming(a.phash, b.phash) for a, b in pairs)
+    detail = min(hamming(a.detail_hash, b.detail_hash) for a, b in pairs)
+    return failures, worst, coarse, detail
+
+
+def check_processes(rng: random.Random, n: int) -> int:
+    """
+    Failures where two indexes on one file (two server processes) hand out
+    different keys for copies of a screenshot each saw in a different order.
+    """
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    first, second = HashIndex(path), HashIndex(path)
+    failures = 0
+    try:
+        for i in range(n):
+            image = screenshot(rng, HEADLINES[i % len(HEADLINES)] + f" [{i}]")
+            copies = [prepare(encode(image, "PNG"))] + [prepare(v) for v in shared_copies(image)]
+            keys = [first.canonical(c.phash, c.detail_hash) for c in copies]
+            keys += [second.canonical(c.phash, c.detail_hash) for c in reversed(copies)]
+            if len(set(keys)) != 1:
+                print(f"screenshot {i}: processes sharing a cache file disagree on its key")
+                failures += 1
+    finally:
+        first.close()
+        second.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    return failures
+
+
+def encode(image: Image.Image, fmt: str, **options) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def post_seconds(client, data_block: dict, repeats: int = 5) -> float:
+    messages = [{"role": "user", "content": [data_block, {"type": "text", "text": "Topic: screenshot"}]}]
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        client.messages.create(model="mock", max_tokens=16, messages=messages)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=12, help="screenshots")
+    parser.add_argument("--dense", type=int, default=24, help="dense text-only pages")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    uplink = args.uplink_mbps * 125_000
+    formats = [("PNG", {}), ("JPEG", {"quality": 95}), ("WEBP", {"quality": 95})]
+
+    rows, hashes, failures, worst = [], [], 0, 0
+    index = HashIndex()
+    with MockServer() as server:
+        client = build_client("x", base_url=server.url)
+        for n in range(args.n):
+            image = screenshot(rng, HEADLINES[n % len(HEADLINES)] + f" ({n})")
+            fmt, options = formats[n % len(formats)]
+            raw = encode(image, fmt, **options)
+            prepared = prepare(raw)
+            hashes.append(prepared.phash)
+            key = index.canonical(prepared.phash, prepared.detail_hash)
+            if key != prepared.phash:
+                print(f"screenshot {n}: matched an earlier, different screenshot")
+                failures += 1
+
+            # Same screenshot as another user would share it
+            for variant in shared_copies(image):
+                copy = prepare(variant)
+                worst = max(worst, hamming(prepared.phash, copy.phash))
+                if index.canonical(copy.phash, copy.detail_hash) != key:
+                    print(f"screenshot {n}: re-encoded copy got a different cache key")
+                    failures += 1
+
+            raw_block = {"type": "image", "source": {"type": "base64", "media_type": sniff(raw),
+                                                     "data": base64.standard_b64encode(raw).decode("ascii")}}
+            rows.append({
+                "format": fmt,
+                "original": prepared.original_bytes,
+                "sent": len(prepared.data),
+                "tokens_saved": prepared.tokens_saved,
+                "tokens_after": image_tokens(prepared.width, prepared.height),
+                "prepare_ms": prepared.elapsed * 1000,
+                "est_saved_s": prepared.upload_seconds_saved(uplink),
+                "post_raw_ms": post_seconds(client, raw_block) * 1000,
+                "post_prepared_ms": post_seconds(client, prepared.block()) * 1000,
+            })
+
+    distinct = min(hamming(a, b) for i, a in enumerate(hashes) for b in hashes[i + 1:])
+    dense_failures, dense_worst, dense_coarse, dense_detail = check_dense(rng, args.dense)
+    failures += dense_failures
+    process_failures = check_processes(rng, min(args.n, 6))
+    failures += process_failures
+
+    print(f"{'fmt':5} {'original':>10} {'sent':>9} {'saved':>6} {'prep ms':>8} "
+          f"{'upload saved @' + format(args.uplink_mbps, 'g') + 'Mbit':>20} {'POST raw':>9} {'prepared':>9}")
+    for r in rows:
+        print(f"{r['format']:5} {r['original'] / 1024:9,.0f}K {r['sent'] / 1024:8,.0f}K "
+              f"{1 - r['sent'] / r['original']:6.0%} {r['prepare_ms']:8.1f} {r['est_saved_s']:19.2f}s "
+              f"{r['post_raw_ms']:8.1f}ms {r['post_prepared_ms']:8.1f}ms")
+
+    original = sum(r["original"] for r in rows)
+    sent = sum(r["sent"] for r in rows)
+    print(f"\ntotal: {original / 1e6:.1f} MB → {sent / 1e6:.1f} MB ({1 - sent / original:.0%} fewer bytes), "
+          f"mean prepare {statistics.mean(r['prepare_ms'] for r in rows):.0f} ms, "
+          f"mean upload saved {statistics.mean(r['est_saved_s'] for r in rows):.2f} s per screenshot")
+    print(f"image tokens per screenshot after prepare: ~{rows[0]['tokens_after']:,}"
+          f" (saved vs raw: {statistics.mean(r['tokens_saved'] for r in rows):,.0f})")
+    print(f"hash bits moved by re-encoding: up to {worst}; closest pair of different screenshots: "
+          f"{distinct} (match threshold {index.max_distance} of {len(hashes[0]) * 4})")
+    print(f"dense text pages ({args.dense}): copies move up to {dense_worst} bits; closest different pair "
+          f"{dense_coarse} coarse bits (threshold {index.max_distance}), {dense_detail} detail bits "
+          f"(threshold {index.max_detail_distance} of {DETAIL_SIZE * DETAIL_SIZE})")
+    print(f"processes sharing a cache file: {process_failures} disagreements")
+    print(f"hash failures: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
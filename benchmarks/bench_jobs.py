@@ -0,0 +1,134 @@
+"""
+BENCHMARK — generation jobs that survive a page going away
+==========================================================
+Sessions click Generate against the local mock (streamed answers taking a
+couple of seconds); a share of them lose their page part-way through (a
+refresh, a mobile connection dropping) and come back a few seconds later.
+
+- in the script     the old way: the generation runs in the page's script
+                    thread, so losing the page stops it (Streamlit raises
+                    StopException at the next progress update); the user
+                    comes back and clicks again — a second upstream call
+- background job    predictor.jobs: the generation keeps running, and the
+                    returning session finds it with pending() and reattaches
+
+Reports, per mode: papers delivered, upstream calls per paper, and click →
+paper time for the sessions that dropped; for jobs also abandoned (finished
+while nobody watched) and recovered counts from the store.
+
+    python -m benchmarks.bench_jobs [-n 40] [--concurrency 8] [--drop-rate 0.3] [--away 4]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.cache import ResponseCache
+from predictor.core import Generator
+from predictor.jobs import JobStore
+from predictor.scheduler import AdmissionController
+
+
+class Disconnected(BaseException):
+    """
+    What a lost page looks like from inside its script thread (Streamlit's
+    StopException is a BaseException too, so nothing on the way catches it).
+    """
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values) or [0.0]
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def build(url: str) -> Generator:
+    # Similar-topic matching off: every session's topic is its own paid call
+    return Generator("x", base_url=url, cache=ResponseCache(":memory:"), similar_threshold=2.0,
+                     controller=AdmissionController(max_concurrency=64, requests_per_min=1e9, tokens_per_min=1e12))
+
+
+def plans(args) -> list:
+    """
+    [(topic, seconds after the click the page is lost, or None)] — the same for both modes.
+    """
+    rng = random.Random(args.seed)
+    return [(f"session topic {i}", rng.uniform(0.3, 1.2) if rng.random() < args.drop_rate else None)
+            for i in range(args.n)]
+
+
+def in_script(generator: Generator, plan: tuple, away: float) -> tuple:
+    topic, drop_at = plan
+    clicked = time.perf_counter()
+
+    def on_progress(text):
+        if drop_at is not None and time.perf_counter() - clicked > drop_at:
+            raise Disconnected()
+
+    try:
+        result = generator.generate(topic, stream=True, on_progress=on_progress)
+    except Disconnected:
+        time.sleep(away)
+        result = generator.generate(topic, stream=True)        # back again: click again
+    return time.perf_counter() - clicked, result.ok, drop_at is not None
+
+
+def as_job(generator: Generator, jobs: JobStore, plan: tuple, away: float, index: int) -> tuple:
+    topic, drop_at = plan
+    owner = f"account-{index}"
+    clicked = time.perf_counter()
+    job = jobs.start(f"click-{index}", owner=owner, session="first", label=topic,
+                     work=lambda report: generator.generate(topic, stream=True, on_progress=report.progress))
+    while not job.finished:
+        if drop_at is not None and time.perf_counter() - clicked > drop_at:
+            break
+        job = jobs.wait(job.id, timeout=0.2)
+    reattached = not job.finished
+    if reattached:
+        time.sleep(away)
+        job = jobs.pending(owner)[0]                            # back again: pick the job up
+        while not job.finished:
+            job = jobs.wait(job.id, timeout=0.2)
+    jobs.deliver(job.id, "second" if reattached else "first", reattached=reattached)
+    return time.perf_counter() - clicked, bool(job.output), reattached
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=40, help="sessions per mode")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--drop-rate", type=float, default=0.3, help="share of pages lost mid-generation")
+    parser.add_argument("--away", type=float, default=4.0, help="seconds before a lost page comes back")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    sessions = plans(args)
+    print(f"{args.n} sessions, {args.concurrency} at a time; {sum(d is not None for _, d in sessions)} lose the page "
+          f"mid-generation and come back {args.away:g}s later\n")
+    print(f"{'':16} {'papers':>7} {'calls/paper':>11} {'dropped p50':>11} {'p95':>7} {'others p50':>10} "
+          f"{'abandoned':>9} {'recovered':>9}")
+    for mode in ("in the script", "background job"):
+        with MockServer(latency=0.5, chunk_delay=0.01) as server:
+            generator = build(server.url)
+            jobs = JobStore(":memory:", abandon_after=1.0)
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                if mode == "in the script":
+                    results = list(pool.map(lambda plan: in_script(generator, plan, args.away), sessions))
+                else:
+                    results = list(pool.map(lambda item: as_job(generator, jobs, item[1], args.away, item[0]),
+                                            enumerate(sessions)))
+            calls = server.config.requests
+            stats = jobs.stats()
+            jobs.close()
+            generator.close()
+        papers = sum(ok for _, ok, _ in results)
+        dropped = [s for s, _, lost in results if lost]
+        others = [s for s, _, lost in results if not lost]
+        abandoned = f"{stats['abandoned']:9}" if mode == "background job" else f"{'—':>9}"
+        recovered = f"{stats['recovered']:9}" if mode == "background job" else f"{'—':>9}"
+        print(f"{mode:16} {papers:4}/{args.n:<2} {calls / max(papers, 1):11.2f} {percentile(dropped, 0.5):10.2f}s "
+              f"{percentile(dropped, 0.95):6.2f}s {percentile(others, 0.5):9.2f}s {abandoned} {recovered}")
+
+
+if __name__ == "__main__":
+    main()
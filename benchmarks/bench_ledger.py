@@ -0,0 +1,154 @@
+"""
+BENCHMARK — credit ledger under multi-process contention
+========================================================
+Many processes hammer ONE account's credits at once, the way replicas and
+double-clicking users would:
+
+- every click is sent twice with the same idempotency key (double-click /
+  rerun), and some clicks are refunded (failed generations)
+- there are more clicks than credits, so the last credits are fought over
+
+Then the books are checked: the balance never went negative, no key was
+charged twice, and final credits == initial - committed. Throughput and
+reserve latency are reported, plus batched vs unbatched history writes.
+
+    python -m benchmarks.bench_ledger [--processes 16] [--clicks 50] [--credits 500]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from predictor.ledger import COMMITTED, HELD, REFUNDED, InsufficientCredits, SQLiteLedger
+
+ACCOUNT = "contended"
+
+
+def worker(path: str, worker_id: int, clicks: int, refund_rate: float, start, results):
+    ledger = SQLiteLedger(path)
+    rng = random.Random(worker_id)
+    start.wait()
+    latencies, committed, refunded, refused, replays = [], 0, 0, 0, 0
+    began = time.perf_counter()
+    for click in range(clicks):
+        key = f"{ACCOUNT}:{worker_id}:{click}"
+        try:
+            for _ in range(2):      # the double-click: same key twice
+                t = time.perf_counter()
+                reservation = ledger.reserve(ACCOUNT, key)
+                latencies.append(time.perf_counter() - t)
+                replays += reservation.replayed
+        except InsufficientCredits:
+            refused += 1
+            continue
+        if rng.random() < refund_rate:
+            ledger.refund(key)
+            ledger.refund(key)      # a retried refund must not credit twice
+            refunded += 1
+        else:
+            ledger.commit(key)
+            committed += 1
+    elapsed = time.perf_counter() - began
+    ledger.close()
+    results.put((latencies, committed, refunded, refused, replays, elapsed))
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def contention(path: str, processes: int, clicks: int, credits: int, refund_rate: float) -> bool:
+    ledger = SQLiteLedger(path)
+    ledger.open_account(ACCOUNT, credits)
+    ledger.close()
+
+    ctx = mp.get_context("spawn")
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(path, i, clicks, refund_rate, start, results))
+             for i in range(processes)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)         # let every process import and connect before the gun
+    began = time.perf_counter()
+    start.set()
+    outcomes = [results.get() for _ in procs]
+    wall = time.perf_counter() - began
+    for p in procs:
+        p.join()
+
+    latencies = [x for o in outcomes for x in o[0]]
+    committed = sum(o[1] for o in outcomes)
+    refunded = sum(o[2] for o in outcomes)
+    refused = sum(o[3] for o in outcomes)
+    replays = sum(o[4] for o in outcomes)
+
+    db = sqlite3.connect(path)
+    balance, total = db.execute("SELECT credits, total_queries FROM accounts WHERE account = ?", (ACCOUNT,)).fetchone()
+    states = dict(db.execute("SELECT state, COUNT(*) FROM reservations GROUP BY state").fetchall())
+    db.close()
+
+    operations = len(latencies) + 2 * (committed + refunded)    # reserves + settles (incl. replays)
+    checks = {
+        "balance == credits - committed": balance == credits - committed,
+        "balance >= 0": balance >= 0,
+        "total_queries == committed": total == committed,
+        "one row per charged click": states.get(COMMITTED, 0) == committed and states.get(REFUNDED, 0) == refunded,
+        "no holds left": states.get(HELD, 0) == 0,
+        "every duplicate was a replay": replays == committed + refunded,
+        "clicks refused only once credits ran out": refused == 0 or balance < 1 + refunded,
+    }
+    print(f"{processes} processes × {clicks} clicks (each sent twice) on one account with {credits} credits")
+    print(f"  committed {committed}, refunded {refunded}, refused {refused}, replays absorbed {replays}, "
+          f"final balance {balance}")
+    print(f"  {operations:,} ledger operations in {wall:.2f}s → {operations / wall:,.0f} ops/s; "
+          f"reserve p50 {percentile(latencies, 0.5) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    for name, ok in checks.items():
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    return all(checks.values())
+
+
+def history_writes(path: str, entries: int):
+    entry = {"topic": "RBI keeps repo rate unchanged", "output": "x" * 500, "timings": {"total": 12.3}}
+
+    ledger = SQLiteLedger(path, flush_batch=entries + 1, flush_interval=3600)
+    started = time.perf_counter()
+    for _ in range(entries):
+        ledger.record("history", entry)
+    ledger.flush()
+    batched = time.perf_counter() - started
+    ledger.close()
+
+    ledger = SQLiteLedger(path, flush_interval=3600)
+    started = time.perf_counter()
+    for _ in range(entries):
+        ledger.record("history", entry)
+        ledger.flush()          # what writing each entry as it happens costs
+    unbatched = time.perf_counter() - started
+    ledger.close()
+    print(f"history: {entries:,} entries batched {entries / batched:,.0f}/s vs one transaction each "
+          f"{entries / unbatched:,.0f}/s ({unbatched / batched:.0f}×)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=16)
+    parser.add_argument("--clicks", type=int, default=50, help="per process")
+    parser.add_argument("--credits", type=int, default=500)
+    parser.add_argument("--refund-rate", type=float, default=0.1)
+    parser.add_argument("--history", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        ok = contention(os.path.join(directory, "ledger.sqlite3"), args.processes, args.clicks,
+                        args.credits, args.refund_rate)
+        history_writes(os.path.join(directory, "history.sqlite3"), args.history)
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
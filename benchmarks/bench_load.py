@@ -0,0 +1,343 @@
+"""
+BENCHMARK — many concurrent sessions against one replica
+========================================================
+Drives the real streamlit_app.py with --sessions simulated visitors,
+--concurrency of them at a time, each a separate Streamlit session
+(AppTest: the real script runner and session state, no browser) sharing
+this process's generator, ledger, job and export stores like sessions on
+one replica do. Upstream is the local mock, shaped by a profile:
+
+    fast        first token after 50 ms, instant answers — page overhead only
+    realistic   first token after ~1 s, ~400 tokens/s, ±30% jitter
+    flaky       realistic, plus 5% of calls answered 500 and 3% stalling 3 s
+
+Each visitor: opens the page, types a topic (a --popular share of them
+pick one of a few shared headlines, the rest their own), clicks Generate,
+turns the question page, re-opens the paper from the history and asks for
+the PDF (unless another session already built it). Reported:
+
+- sessions/s completed, and the wall time
+- script run time per action, p50 / p95 / p99 (every interaction reruns
+  the script); Generate is click → paper on screen, end to end
+- RSS growth per session while all of them stay connected
+- upstream calls per user action and per Generate
+- script exceptions and error / warning messages shown
+
+Results go to a JSON file (--out; default .cache/loadtest/<profile>-<commit>.json)
+so a run can be compared with one from another commit:
+
+    python -m benchmarks.bench_load [--profile realistic] [--sessions 40] [--concurrency 8]
+                                    [--no-stream] [--popular 0.3] [--compare OLD.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from benchmarks.mock_anthropic import MockServer
+
+PROFILES = {
+    "fast": dict(latency=0.05),
+    "realistic": dict(latency=1.0, tokens_per_sec=400, jitter=0.3),
+    "flaky": dict(latency=1.0, tokens_per_sec=400, jitter=0.3, error_rate=0.05, error_status=500,
+                  stall_rate=0.03, stall=3.0),
+}
+
+POPULAR = ["RBI keeps repo rate unchanged", "Great Nicobar project approved", "DPDP rules notified"]
+ACTIONS = ("load", "type", "generate", "turn page", "re-open", "export")
+
+# Compared between runs: (path in the results, lower is better)
+HEADLINE = [
+    (("sessions_per_second",), False),
+    (("actions", "generate", "p50"), True),
+    (("actions", "generate", "p95"), True),
+    (("actions", "generate", "p99"), True),
+    (("actions", "type", "p50"), True),
+    (("actions", "type", "p95"), True),
+    (("rss_mb_per_session",), True),
+    (("upstream_calls_per_action",), True),
+    (("upstream_calls_per_generate",), True),
+]
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    return {f"p{q}": round(values[min(int(len(values) * q / 100), len(values) - 1)], 4) for q in (50, 95, 99)}
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size (peak on systems without /proc).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextmanager
+def shared_runtime():
+    """
+    One stand-in Streamlit runtime (media files, st.cache_data, compiled
+    script) for every session in the process, as on a real server.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1.util import patch_config_options
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.script_cache = ScriptCache()
+    Runtime._instance = runtime
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield runtime
+    finally:
+        Runtime._instance = None
+
+
+def session_app(script: str, timeout: float):
+    """
+    An AppTest whose runs can overlap with other sessions' runs.
+
+    AppTest installs a stand-in runtime for each run and removes it when the
+    run ends — while other sessions' script threads may still be using it —
+    and gives every run a fresh script cache, so each rerun compiles the
+    script again (and compiling on several threads at once trips Python
+    3.11's AST recursion check). This one runs under shared_runtime() with
+    one script cache for every session, as a server does. Written against
+    the Streamlit pinned in requirements.txt.
+    """
+    from urllib import parse
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    class SessionApp(AppTest):
+
+        def _run(self, widget_state=None, timeout=None):
+            pages = PagesManager(self._script_path, setup_watcher=False)
+            runner = LocalScriptRunner(self._script_path, self.session_state, pages, args=self.args, kwargs=self.kwargs)
+            runner._script_cache = Runtime.instance().script_cache
+            self._tree = runner.run(widget_state, self.query_params, timeout or self.default_timeout, self._page_hash)
+            self._tree._runner = self
+            self.query_params = parse.parse_qs(runner.event_data[-1]["client_state"].query_string)
+            return self
+
+    return SessionApp(os.path.abspath(script), default_timeout=timeout)      # from_file() would build a plain AppTest
+
+
+class Visitor:
+    """
+    One simulated session working through ACTIONS; times every script run.
+    """
+
+    def __init__(self, index: int, topic: str, script: str, timeout: float):
+        self.index = index
+        self.topic = topic
+        self.at = session_app(script, timeout)
+        self.at.query_params["account"] = f"load-{index}-{random.getrandbits(32):08x}"
+        self.timings = {}       # action → seconds
+        self.exceptions = []
+        self.errors = []
+        self.warnings = []
+        self.export_ready = False   # the PDF was already built (by another session) — a download, no click
+
+    def _timed(self, action: str, step):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:      # a missing widget means the page didn't render as expected
+            self.exceptions.append(f"{action}: {type(e).__name__}: {e}")
+            return False
+        self.timings[action] = time.perf_counter() - started
+        self.exceptions += [f"{action}: {e.message}" for e in self.at.exception]
+        return True
+
+    def run(self):
+        at = self.at
+        if not self._timed("load", at.run):
+            return self
+        if not self._timed("type", lambda: at.text_area[0].input(self.topic).run()):
+            return self
+        if not self._timed("generate", lambda: at.button[0].click().run()):
+            return self
+        self.errors = [e.value for e in at.error if "secrets" not in e.value]
+        self.warnings = [w.value for w in at.main.warning]     # the sidebar's low-credit notice is expected
+        pager = [r for r in at.radio if r.label == "Questions"]
+        if pager:
+            self._timed("turn page", lambda: pager[0].set_value(pager[0].options[-1]).run())
+        history = [b for b in at.sidebar.button if b.key and b.key.startswith("history-") and b.label not in "◀▶"]
+        if history:
+            self._timed("re-open", lambda: history[0].click().run())
+        export = [b for b in at.button if b.key == "export-pdf"]
+        if export:
+            self._timed("export", lambda: export[0].click().run())
+        else:
+            self.export_ready = any(b.key == "export-docx" for b in at.button)
+        return self
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as directory, MockServer(**PROFILES[args.profile]) as server, \
+            shared_runtime():
+        os.environ.update({
+            "ANTHROPIC_BASE_URL": server.url,
+            "ANTHROPIC_API_KEY": "load-test",
+            "UPSC_CACHE_PATH": os.path.join(directory, "cache.sqlite3"),
+            "UPSC_LEDGER": os.path.join(directory, "ledger.sqlite3"),
+            "UPSC_JOBS": os.path.join(directory, "jobs.sqlite3"),
+            "UPSC_EXPORTS": os.path.join(directory, "exports"),
+            "UPSC_TELEMETRY": "off",
+            "UPSC_STREAMING": "1" if args.stream else "0",
+        })
+        rng = random.Random(args.seed)
+        topics = [rng.choice(POPULAR) if rng.random() < args.popular else f"Load test topic {i} {args.seed}"
+                  for i in range(args.sessions)]
+
+        # One visitor first, unmeasured: imports, the shared caches and the generator come up once per process
+        Visitor(-1, "Warm-up topic for the load test", args.script, args.timeout).run()
+        server.config.requests = server.config.errors = server.config.stalls = 0
+        rss_before = rss_mb()
+
+        done = []
+        lock = threading.Lock()
+
+        def visit(index):
+            visitor = Visitor(index, topics[index], args.script, args.timeout).run()
+            with lock:
+                done.append(visitor)        # kept: every session stays "connected" until the end
+            return visitor
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(visit, range(args.sessions)))
+        wall = time.perf_counter() - started
+        rss_after = rss_mb()
+        calls = server.config.requests
+        upstream_errors, stalls = server.config.errors, server.config.stalls
+
+    actions = {name: [v.timings[name] for v in done if name in v.timings] for name in ACTIONS}
+    performed = sum(len(times) for times in actions.values())
+    generated = len(actions["generate"])
+    return {
+        "commit": commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"profile": args.profile, "mock": PROFILES[args.profile], "sessions": args.sessions,
+                   "concurrency": args.concurrency, "stream": args.stream, "popular": args.popular,
+                   "script": args.script, "seed": args.seed, "cpus": os.cpu_count(),
+                   "python": sys.version.split()[0]},
+        "wall_seconds": round(wall, 3),
+        "sessions_per_second": round(len(done) / wall, 3),
+        "actions": {name: {"count": len(times), **percentiles(times)} for name, times in actions.items()},
+        "rss_mb": {"before": round(rss_before, 1), "after": round(rss_after, 1)},
+        "rss_mb_per_session": round((rss_after - rss_before) / max(len(done), 1), 3),
+        "upstream_calls": calls,
+        "upstream_errors_injected": upstream_errors,
+        "upstream_stalls_injected": stalls,
+        "upstream_calls_per_action": round(calls / max(performed, 1), 4),
+        "upstream_calls_per_generate": round(calls / max(generated, 1), 4),
+        "exports_already_built": sum(v.export_ready for v in done),
+        "sessions_with_exceptions": sum(bool(v.exceptions) for v in done),
+        "sessions_with_errors": sum(bool(v.errors) for v in done),
+        "sessions_with_warnings": sum(bool(v.warnings) for v in done),
+        "exceptions": sorted({e for v in done for e in v.exceptions})[:20],
+        "errors": sorted({e for v in done for e in v.errors + v.warnings})[:20],
+    }
+
+
+def lookup(results: dict, path: tuple):
+    for key in path:
+        results = results.get(key) if isinstance(results, dict) else None
+    return results
+
+
+def show(results: dict):
+    config = results["config"]
+    print(f"{config['sessions']} sessions, {config['concurrency']} at a time, profile {config['profile']}, "
+          f"{'streaming' if config['stream'] else 'not streaming'}, {config['popular']:.0%} popular topics "
+          f"(commit {results['commit']}, {config['cpus']} CPU)\n")
+    print(f"{'action':12} {'runs':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, stats in results["actions"].items():
+        if stats["count"]:
+            print(f"{name:12} {stats['count']:5} " + " ".join(f"{stats[p]:7.3f}s" for p in ("p50", "p95", "p99")))
+    print(f"\n{results['sessions_per_second']:.2f} sessions/s ({results['wall_seconds']:.1f}s wall); "
+          f"RSS {results['rss_mb']['before']:.0f} → {results['rss_mb']['after']:.0f} MB, "
+          f"{results['rss_mb_per_session'] * 1024:.0f} KB per session")
+    print(f"upstream: {results['upstream_calls']} calls — {results['upstream_calls_per_action']:.3f} per action, "
+          f"{results['upstream_calls_per_generate']:.3f} per Generate "
+          f"({results['upstream_errors_injected']} injected errors, {results['upstream_stalls_injected']} stalls)")
+    print(f"PDF already built for {results.get('exports_already_built', 0)} sessions (served without a click)")
+    print(f"sessions with script exceptions {results['sessions_with_exceptions']}, "
+          f"errors shown {results['sessions_with_errors']}, warnings shown {results['sessions_with_warnings']}")
+    for message in results["exceptions"][:5]:
+        print(f"  ! {message}")
+
+
+def compare(results: dict, baseline: dict):
+    print(f"\nvs {baseline['commit']} ({baseline['config']['profile']}, {baseline['config']['sessions']} sessions):")
+    for path, lower_is_better in HEADLINE:
+        old, new = lookup(baseline, path), lookup(results, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = change > 0.1 if lower_is_better else change < -0.1
+        print(f"  {'.'.join(path):32} {old:10.3f} → {new:10.3f}  {change:+7.1%}{'  ← worse' if worse else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profile", choices=PROFILES, default="realistic")
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="visitors active at once")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--popular", type=float, default=0.3, help="share of visitors on a shared headline")
+    parser.add_argument("--script", default="streamlit_app.py")
+    parser.add_argument("--timeout", type=float, default=180, help="seconds one script run may take")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default .cache/loadtest/<profile>-<commit>.json)")
+    parser.add_argument("--compare", help="an earlier results file to compare with")
+    args = parser.parse_args()
+
+    results = run(args)
+    show(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    out = args.out or os.path.join(".cache", "loadtest", f"{args.profile}-{results['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nsaved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+FUZZ + BENCHMARK — incremental output parser
+============================================
+Builds a corpus of outputs, mangles a share of them the way real model
+output goes wrong, and checks for every document that:
+
+- parsing never raises
+- feeding random-sized chunks gives exactly the same records as one feed
+- record offsets are ordered and inside the text
+- untouched documents yield 1 detection, 5 complete MCQs and 5 complete MAINS
+- every way of naming the correct option (ANSWER_FORMS) passes validation
+  and anything else is flagged — a false flag costs a paid repair call
+
+then reports throughput for whole-text and streaming-sized (64 char) feeds.
+
+    python -m benchmarks.bench_parser [-n 2000] [--from-cache .cache/responses.sqlite3]
+
+--from-cache adds every real output stored in the response cache.
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+import zlib
+
+from benchmarks.mock_anthropic import sample_output
+from predictor.parser import MCQ, MainsQuestion, OutputParser, TopicDetection
+from predictor.validation import validate
+
+TOPICS = [
+    "RBI keeps repo rate unchanged", "Governor delays NEET bill in Tamil Nadu",
+    "India-China LAC disengagement", "CEC removal and the 2023 Act", "Heatwaves and urban planning",
+    "Great Nicobar project", "One Nation One Election", "Digital Personal Data Protection Act",
+]
+
+# "✅ Answer: …" forms the prompt's "[Correct option]" gets written as
+ANSWER_FORMS = ["(c)", "c)", "c", "C", "C.", "c:", "Option (c)", "option c", "Option C.", "(c) Only 1 and 2",
+                "C. Both statements"]
+NOT_ANSWERS = ["", "(e)", "e", "None of these", "All of the above", "Both 1 and 2", "see explanation"]
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    """
+    Apply 1-3 of the ways real outputs drift from the format.
+    """
+    lines = text.split("\n")
+    for _ in range(rng.randint(1, 3)):
+        kind = rng.randrange(9)
+        i = rng.randrange(len(lines))
+        if kind == 0:       # markdown bold labels
+            lines[i] = f"**{lines[i]}**"
+        elif kind == 1:     # markdown headings instead of ═ rules
+            lines = [("## " + l if l.startswith(("MCQ", "MAINS", "SECTION", "TOPIC")) else l)
+                     for l in lines if not l.startswith("═")]
+        elif kind == 2:     # model skipped a line
+            del lines[i]
+        elif kind == 3:     # truncated (max_tokens hit)
+            return "\n".join(lines)[:rng.randrange(len(text))]
+        elif kind == 4:     # emoji without the variation selector
+            lines = [l.replace("\ufe0f", "") for l in lines]
+        elif kind == 5:     # Windows line endings
+            lines = [l + "\r" for l in lines]
+        elif kind == 6:     # duplicated line
+            lines.insert(i, lines[i])
+        elif kind == 7:     # garbage
+            lines.insert(i, "".join(chr(rng.randrange(32, 0x2FFF)) for _ in range(rng.randrange(80))))
+        else:               # empty section
+            lines = lines[:i]
+    return "\n".join(lines)
+
+
+def parse_whole(text: str) -> list:
+    parser = OutputParser()
+    return parser.feed(text) + parser.close()
+
+
+def parse_chunked(text: str, sizes) -> list:
+    parser = OutputParser()
+    records, i = [], 0
+    for size in sizes:
+        records += parser.feed(text[i:i + size])
+        i += size
+        if i >= len(text):
+            break
+    records += parser.feed(text[i:])
+    return records + parser.close()
+
+
+def complete(records: list) -> bool:
+    detections = [r for r in records if isinstance(r, TopicDetection)]
+    mcqs = [r for r in records if isinstance(r, MCQ)]
+    mains = [r for r in records if isinstance(r, MainsQuestion)]
+    return (
+        len(detections) == 1 and detections[0].subject and len(detections[0].angles) == 3
+        and [m.number for m in mcqs] == [1, 2, 3, 4, 5]
+        and all(m.answer and m.trap_code and m.archetype and m.question for m in mcqs)
+        and [m.number for m in mains] == [1, 2, 3, 4, 5]
+        and all(m.question and m.archetype and len(m.framework) == 6 and m.must_include for m in mains)
+    )
+
+
+def check_answer_forms() -> int:
+    """
+    Validate one paper with every MCQ answer rewritten to each form; count wrong verdicts.
+    """
+    failures = 0
+    paper = sample_output(TOPICS[0])
+    for form, accepted in [(f, True) for f in ANSWER_FORMS] + [(f, False) for f in NOT_ANSWERS]:
+        text = paper.replace("✅ Answer: (c)", f"✅ Answer: {form}")
+        flagged = any("no answer option" in issue.problems for issue in validate(text).issues)
+        if flagged == accepted:
+            print(f"answer {form!r}: {'rejected' if flagged else 'accepted'}")
+            failures += 1
+    return failures
+
+
+def load_cache(path: str) -> list:
+    db = sqlite3.connect(path)
+    return [zlib.decompress(v).decode("utf-8") for (v,) in db.execute("SELECT value FROM responses")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=2000, help="synthetic documents")
+    parser.add_argument("--mutate", type=float, default=0.5, help="share of documents to mangle")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--from-cache", help="also parse real outputs from a response-cache file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = []     # (text, expect_complete)
+    for _ in range(args.n):
+        text = sample_output(rng.choice(TOPICS))
+        if rng.random() < args.mutate:
+            corpus.append((mutate(text, rng), False))
+        else:
+            corpus.append((text, True))
+    if args.from_cache:
+        corpus += [(text, False) for text in load_cache(args.from_cache)]
+
+    failures = 0
+    for n, (text, expect_complete) in enumerate(corpus):
+        try:
+            whole = parse_whole(text)
+            chunked = parse_chunked(text, iter(lambda: rng.randint(1, 200), None))
+        except Exception as e:
+            print(f"doc {n}: raised {e!r}")
+            failures += 1
+            continue
+        offsets = [(r.start, r.end) for r in whole]
+        if whole != chunked:
+            print(f"doc {n}: chunked parse differs")
+            failures += 1
+        elif any(s > e or e > len(text) for s, e in offsets) or offsets != sorted(offsets):
+            print(f"doc {n}: bad offsets {offsets}")
+            failures += 1
+        elif expect_complete and not complete(whole):
+            print(f"doc {n}: well-formed document parsed incompletely")
+            failures += 1
+
+    failures += check_answer_forms()
+
+    total_chars = sum(len(t) for t, _ in corpus)
+    total_bytes = sum(len(t.encode("utf-8")) for t, _ in corpus)
+
+    start = time.perf_counter()
+    records = sum(len(parse_whole(t)) for t, _ in corpus)
+    whole_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text, _ in corpus:
+        parse_chunked(text, iter(lambda: 64, None))
+    chunked_s = time.perf_counter() - start
+
+    print(f"documents: {len(corpus)} ({total_chars:,} chars, {total_bytes / 1e6:.1f} MB), records: {records:,}")
+    print(f"whole-text feed:  {total_bytes / 1e6 / whole_s:7.1f} MB/s  {records / whole_s:10,.0f} records/s  "
+          f"{whole_s / len(corpus) * 1e6:7.0f} µs/doc")
+    print(f"64-char chunks:   {total_bytes / 1e6 / chunked_s:7.1f} MB/s  {records / chunked_s:10,.0f} records/s  "
+          f"{chunked_s / len(corpus) * 1e6:7.0f} µs/doc")
+    print(f"robustness failures: {failures}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+BENCHMARK — single call vs sectional pipeline latency
+=====================================================
+Generates the same paper repeatedly in both modes against the local mock,
+which simulates generation speed (tokens/sec) and random slowdowns, and
+prints p50 / p95 wall-clock per mode. Also checks the pipeline's merged text
+is identical to the single-call output.
+
+    python -m benchmarks.bench_pipeline [-n 20] [--tokens-per-sec 400] [--concurrency 4]
+
+Default speed is ~5x a real model so a run takes seconds, not minutes; the
+ratio between the modes is what matters.
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_anthropic import MockServer, sample_output
+from predictor.client import build_client
+from predictor.pipeline import generate_sectional
+from predictor.prompts import SYSTEM_BLOCKS
+
+MODEL = "claude-sonnet-4-20250514"
+TOPIC = "RBI keeps repo rate unchanged"
+
+
+def single(client) -> str:
+    response = client.beta.prompt_caching.messages.create(
+        model=MODEL, max_tokens=6000, system=SYSTEM_BLOCKS,
+        messages=[{"role": "user", "content": f"Generate 10 UPSC practice questions for this topic:\n\n{TOPIC}\n\n"
+                                              "Follow the exact output format specified."}],
+    )
+    return response.content[0].text
+
+
+def sectional(client) -> str:
+    source = [{"type": "text", "text": f"Topic:\n\n{TOPIC}"}]
+    return generate_sectional(client.beta.prompt_caching.messages.create, source,
+                              model=MODEL, system=SYSTEM_BLOCKS).text
+
+
+def timed(fn, client):
+    start = time.perf_counter()
+    text = fn(client)
+    return time.perf_counter() - start, text
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=20, help="papers per mode")
+    parser.add_argument("--tokens-per-sec", type=float, default=400)
+    parser.add_argument("--latency", type=float, default=0.3, help="mock time to first token")
+    parser.add_argument("--jitter", type=float, default=0.5, help="random slowdown, as a fraction")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with MockServer(latency=args.latency, tokens_per_sec=args.tokens_per_sec, jitter=args.jitter) as server:
+        client = build_client("x", base_url=server.url)
+        print(f"{'mode':>10} {'p50 s':>7} {'p95 s':>7} {'mean s':>7} {'upstream calls':>15}")
+        for name, fn in (("single", single), ("sectional", sectional)):
+            before = server.config.requests
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                runs = list(pool.map(lambda _: timed(fn, client), range(args.n)))
+            latencies = [t for t, _ in runs]
+            print(f"{name:>10} {percentile(latencies, 0.5):>7.2f} {percentile(latencies, 0.95):>7.2f} "
+                  f"{statistics.mean(latencies):>7.2f} {server.config.requests - before:>15}")
+            if name == "sectional":
+                same = all(text == sample_output(TOPIC) for _, text in runs)
+                print(f"merged output identical to single-call format: {same}")
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+BENCHMARK — system prompt with and without prompt caching
+=========================================================
+Sends the same short request N times with the plain-string system prompt,
+then N times with the cacheable SYSTEM_BLOCKS, and prints per-request usage
+records plus mean latency. max_tokens is tiny so the timing is dominated by
+prompt processing.
+
+    python -m benchmarks.bench_prompt_cache             # local mock (token accounting only)
+    python -m benchmarks.bench_prompt_cache --live      # real API, needs ANTHROPIC_API_KEY
+
+Cache entries live for ~5 minutes, so the first cached request pays a cache
+write and the rest should show cache_read_input_tokens.
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.client import build_client
+from predictor.prompts import SYSTEM_BLOCKS, SYSTEM_PROMPT
+from predictor.usage import UsageRecord, UsageTotals
+
+MODEL = "claude-sonnet-4-20250514"
+MESSAGES = [{"role": "user", "content": "Generate 10 UPSC practice questions for this topic:\n\n"
+                                        "RBI keeps repo rate unchanged\n\nFollow the exact output format specified."}]
+
+
+def run(client, system, n: int, max_tokens: int):
+    totals = UsageTotals()
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        response = client.beta.prompt_caching.messages.create(
+            model=MODEL, max_tokens=max_tokens, system=system, messages=MESSAGES,
+        )
+        latencies.append(time.perf_counter() - start)
+        record = UsageRecord.from_message(response)
+        totals.add(record)
+        print(f"    in={record.input_tokens:>5} write={record.cache_creation_input_tokens:>5} "
+              f"read={record.cache_read_input_tokens:>5} out={record.output_tokens:>4} "
+              f"{latencies[-1] * 1000:>8.1f} ms")
+    return latencies, totals.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=5, help="requests per mode")
+    parser.add_argument("--max-tokens", type=int, default=1)
+    parser.add_argument("--live", action="store_true", help="hit the real API (costs tokens)")
+    args = parser.parse_args()
+
+    server = None
+    if args.live:
+        client = build_client(os.environ["ANTHROPIC_API_KEY"])
+    else:
+        server = MockServer(output="ok").__enter__()
+        client = build_client("x", base_url=server.url)
+
+    try:
+        for label, system in (("uncached", SYSTEM_PROMPT), ("cached", SYSTEM_BLOCKS)):
+            print(f"{label}:")
+            latencies, snap = run(client, system, args.n, args.max_tokens)
+            print(f"  mean {statistics.mean(latencies) * 1000:.1f} ms, "
+                  f"prompt tokens read from cache: {snap['prompt_cache_read_ratio']:.0%}\n")
+    finally:
+        client.close()
+        if server:
+            server.__exit__(None, None, None)
+
+
+if __name__ == "__main__":
+    main()
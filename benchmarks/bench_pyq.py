@@ -0,0 +1,109 @@
+"""
+BENCHMARK — PYQ retrieval latency
+=================================
+Builds the memory-mapped BM25 index over a synthetic corpus (real PYQ sets
+are ~2k questions; 50k is there to show headroom), opens it the way a
+worker process does, and times top-k searches for headline-style topics.
+
+A few hand-written questions are planted in the corpus with a known
+matching topic, as a check that the ranking finds them (hit@k).
+
+    python -m benchmarks.bench_pyq [--sizes 2000,50000] [-k 4]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_similarity import FILLER, GROUPS
+from predictor.pyq import PYQ, PYQIndex, build_index, few_shot
+
+# (topic, planted question) — written for this benchmark, not real PYQs
+PLANTED = [
+    ("Governor delays NEET bill in Tamil Nadu",
+     PYQ("With reference to the Governor's assent to State Bills, consider the following statements: "
+         "1. The Governor may withhold assent. 2. The Governor may reserve a Bill for the President.",
+         2022, "Prelims", "Polity")),
+    ("RBI keeps repo rate unchanged at 6.5%",
+     PYQ("Which of the following is the most likely consequence of the RBI's Monetary Policy Committee "
+         "raising the repo rate?", 2020, "Prelims", "Economy")),
+    ("Sikkim glacial lake outburst flood at South Lhonak",
+     PYQ("Glacial lake outburst floods are an increasing hazard in the Himalaya. Discuss the causes and "
+         "suggest mitigation measures.", 2023, "Mains GS1", "Geography")),
+    ("Supreme Court strikes down electoral bonds scheme",
+     PYQ("Discuss the role of electoral bonds and other instruments in the transparency of political "
+         "funding in India.", 2018, "Mains GS2", "Polity")),
+    ("Chandrayaan-3 lands near lunar south pole",
+     PYQ("What is the significance of exploring the lunar south pole? Discuss India's Chandrayaan missions.",
+         2019, "Mains GS3", "Science & Technology")),
+]
+
+
+def synthetic_corpus(n: int, rng: random.Random) -> list:
+    rare = [f"term{i}" for i in range(20_000)]      # long tail: places, schemes, acts
+    questions = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(15, 35))
+        words += rng.choices(rare, k=rng.randint(2, 6))
+        rng.shuffle(words)
+        options = [" ".join(rng.choices(FILLER + rare[:2000], k=rng.randint(2, 6))) for _ in range(4)]
+        questions.append(PYQ(" ".join(words).capitalize() + "?", rng.randint(2011, 2024),
+                             rng.choice(["Prelims", "Mains GS2", "Mains GS3"]), None, options))
+    return questions
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def run(size: int, k: int, rng: random.Random, directory: str):
+    questions = synthetic_corpus(size - len(PLANTED), rng)
+    for _, pyq in PLANTED:
+        questions.insert(rng.randrange(len(questions) + 1), pyq)
+    path = os.path.join(directory, f"pyq-{size}.idx")
+    stats = build_index(questions, path)
+
+    started = time.perf_counter()
+    index = PYQIndex(path)
+    opened = time.perf_counter() - started
+
+    topics = [t for topic, paraphrases, negatives in GROUPS for t in [topic, *paraphrases, *negatives]]
+    topics = topics * (2000 // len(topics) + 1)
+    timings = []
+    for topic in topics:
+        started = time.perf_counter()
+        index.search(topic, k)
+        timings.append(time.perf_counter() - started)
+
+    found = sum(any(pyq.question == planted.question for _, pyq in index.search(topic, k))
+                for topic, planted in PLANTED)
+    blocks = [few_shot(index.search(topic, k)) for topic, _, _ in GROUPS]
+    block_tokens = sum(len(b) for b in blocks) / len(blocks) / 4      # ~4 chars per token
+
+    print(f"{size:>7,} questions: build {stats['seconds']:.2f}s, file {stats['bytes'] / 1024:,.0f} KB, "
+          f"open {opened * 1000:.1f} ms")
+    print(f"         search top-{k}: p50 {percentile(timings, 0.5) * 1e6:.0f} µs, "
+          f"p99 {percentile(timings, 0.99) * 1e6:.0f} µs, max {max(timings) * 1e6:.0f} µs "
+          f"({len(timings):,} searches)")
+    print(f"         planted hit@{k}: {found}/{len(PLANTED)}, few-shot block ≈ {block_tokens:.0f} tokens")
+    index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="2000,50000")
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(s) for s in args.sizes.split(",")):
+            run(size, args.k, rng, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+BENCHMARK — script time per interaction
+=======================================
+Every widget interaction reruns the page script. This drives
+streamlit_app.py through Streamlit's AppTest (no browser, no network —
+generation goes to the mock upstream) and times each kind of interaction:
+
+    first load, switch input method, type a topic, toggle fast mode,
+    click "Buy Credits", generate (cache hit), re-open a past paper
+
+reporting the script run time (p50 / p95 over --repeat runs) and how many
+elements each run sends to the browser. --script times another version of
+the page (e.g. `git show HEAD~1:streamlit_app.py > old_app.py`) for a
+before/after. Where Streamlit has fragments, the input/generate/output
+interactions rerun only the workspace fragment in the browser; what is
+timed here is still the full script, i.e. the worst case.
+
+    python -m benchmarks.bench_rerun [--repeat 20] [--script streamlit_app.py]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.mock_anthropic import MockServer
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def elements(at) -> int:
+    count, stack = 0, [at._tree]
+    while stack:
+        node = stack.pop()
+        children = getattr(node, "children", None)
+        if children:
+            stack.extend(children.values())
+        else:
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--script", default="streamlit_app.py")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as directory, MockServer(latency=0.05, chunk_delay=0.0) as server:
+        os.environ.update({
+            "ANTHROPIC_BASE_URL": server.url,
+            "ANTHROPIC_API_KEY": "bench",
+            "UPSC_CACHE_PATH": os.path.join(directory, "cache.sqlite3"),
+            "UPSC_LEDGER": os.path.join(directory, "ledger.sqlite3"),
+        })
+        at = AppTest.from_file(args.script, default_timeout=60)
+        at.query_params["account"] = "bench-rerun"
+
+        def timed(action) -> float:
+            started = time.perf_counter()
+            action()
+            return time.perf_counter() - started
+
+        results = {}
+
+        def record(name, action, reset=None):
+            runs = []
+            for _ in range(args.repeat):
+                if reset:
+                    reset()
+                runs.append(timed(action))
+            results[name] = (runs, elements(at))
+
+        record("first load", lambda: at.run())
+        # Warm the generation cache once so "generate" measures the page, not upstream
+        at.text_area[0].input("RBI keeps repo rate unchanged").run()
+        at.button[0].click().run()
+        from predictor.ledger import SQLiteLedger
+        ledger = SQLiteLedger(os.environ["UPSC_LEDGER"])
+        ledger.grant("bench-rerun", 10 * args.repeat, "bench-rerun-credits")
+        ledger.close()
+
+        def switch():
+            radio = at.radio[0]
+            radio.set_value(radio.options[1] if radio.value == radio.options[0] else radio.options[0]).run()
+
+        def buy():
+            next(b for b in at.sidebar.button if "Buy" in b.label).click().run()
+
+        def reopen():
+            history = [b for b in at.sidebar.button
+                       if b.key and b.key.startswith("history-") and b.label not in "◀▶"]
+            history[0].click().run()
+
+        record("switch input method", switch)
+        if at.radio[0].value != at.radio[0].options[0]:
+            switch()
+        record("type a topic", lambda: at.text_area[0].input(f"Great Nicobar project {time.time()}").run())
+        record("toggle fast mode", lambda: at.toggle[0].set_value(not at.toggle[0].value).run())
+        record("click Buy Credits", buy)
+        at.text_area[0].input("RBI keeps repo rate unchanged").run()
+        record("generate (cache hit)", lambda: at.button[0].click().run())
+        record("re-open past paper", reopen)
+
+        print(f"{args.script}: script time per interaction over {args.repeat} runs\n")
+        print(f"{'interaction':<24} {'p50 ms':>7} {'p95 ms':>7} {'elements':>9}")
+        for name, (runs, count) in results.items():
+            print(f"{name:<24} {percentile(runs, 0.5) * 1000:7.1f} {percentile(runs, 0.95) * 1000:7.1f} {count:9d}")
+
+
+if __name__ == "__main__":
+    main()
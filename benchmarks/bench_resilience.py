@@ -0,0 +1,134 @@
+"""
+BENCHMARK — retries, hedging and the circuit breaker under injected faults
+==========================================================================
+Streams distinct topics through predictor.core.Generator against the local
+mock with faults switched on: a share of requests answered 500 and a share
+that stall before their first byte. Compares, on the same fault mix:
+
+- single attempt      no retries, no hedging (one call, as if the SDK's
+                      retries were off)
+- retries             jittered backoff inside the deadline
+- retries + hedging   plus a duplicate request when the first token is
+                      later than the recent p95
+
+and reports p50 / p95 / p99 time to a finished paper (failures counted at
+the time they were given up on), error rate, and upstream calls per paper.
+
+(500 rather than 529 there: a 429 / 529 also pauses admission control for
+its back-off, which would swamp the differences being measured.)
+
+Then a full outage (every request 529): time to give up per request and
+upstream calls with the breaker effectively off vs on, and how many
+paraphrased topics were still answered from cache while it was open.
+
+    python -m benchmarks.bench_resilience [-n 200] [--concurrency 8] [--error-rate 0.05]
+                                          [--stall-rate 0.03] [--stall 3]
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.cache import ResponseCache
+from predictor.core import Generator
+from predictor.resilience import CircuitBreaker, Hedger, RetryPolicy
+from predictor.scheduler import AdmissionController
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def build(url: str, **options) -> Generator:
+    return Generator(
+        "x", base_url=url, cache=ResponseCache(":memory:"),
+        controller=AdmissionController(max_concurrency=1024, requests_per_min=1e9, tokens_per_min=1e12),
+        **options,
+    )
+
+
+def run(generator: Generator, topics: list, concurrency: int) -> list:
+    """
+    [(seconds, result)] — wall time per generation, as the user would wait.
+    """
+    def one(topic):
+        started = time.perf_counter()
+        result = generator.generate(topic, stream=True)
+        return time.perf_counter() - started, result
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, topics))
+
+
+def faults(args):
+    configurations = (
+        ("single attempt", lambda: dict(retry_policy=RetryPolicy(max_attempts=1))),
+        ("retries", lambda: dict(retry_policy=RetryPolicy(base=0.1))),
+        ("retries + hedging", lambda: dict(retry_policy=RetryPolicy(base=0.1),
+                                           hedger=Hedger(enabled=True, budget=args.hedge_budget))),
+    )
+    print(f"{args.n} streamed generations, {args.concurrency} at a time; mock: first token {args.latency * 1000:.0f} ms, "
+          f"{args.error_rate:.0%} answered 500, {args.stall_rate:.0%} stall {args.stall:.1f}s\n")
+    print(f"{'':18} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'errors':>7} {'calls/paper':>11} {'hedges':>6}")
+    for name, options in configurations:
+        with MockServer(latency=args.latency, chunk_delay=0.002, error_rate=args.error_rate, error_status=500,
+                        stall_rate=args.stall_rate, stall=args.stall) as server:
+            # Similar-topic matching off: every topic here is a separate paid call
+            generator = build(server.url, breaker=CircuitBreaker(failure_threshold=10 ** 6),
+                              similar_threshold=2.0, **options())
+            # Warm the p95 the hedger waits on, then measure
+            run(generator, [f"warm-up {name} {i}" for i in range(40)], args.concurrency)
+            before = server.config.requests
+            results = run(generator, [f"{name} topic {i}" for i in range(args.n)], args.concurrency)
+            calls = server.config.requests - before
+            hedges = generator.hedger.stats()["hedges"]
+            generator.close()
+        seconds = [s for s, _ in results]
+        errors = sum(not r.ok for _, r in results)
+        papers = args.n - errors
+        print(f"{name:18} {percentile(seconds, 0.5):6.2f}s {percentile(seconds, 0.95):6.2f}s "
+              f"{percentile(seconds, 0.99):6.2f}s {max(seconds):6.2f}s {errors / args.n:7.1%} "
+              f"{calls / max(papers, 1):11.2f} {hedges:6}")
+
+
+def outage(args):
+    known = ["RBI keeps repo rate unchanged", "Great Nicobar project approved", "DPDP rules notified"]
+    asked = ["RBI keeps the repo rate unchanged again", "Great Nicobar project cleared",
+             "DPDP rules notified by MeitY", "Monsoon session of Parliament", "Chandrayaan-4 mission"] * 4
+    print(f"\nfull outage: {len(asked)} requests, {len(known)} related topics cached beforehand")
+    print(f"{'':18} {'give-up p50':>11} {'p99':>7} {'upstream calls':>14} {'served from cache':>17}")
+    for name, threshold in (("breaker off", 10 ** 6), ("breaker on", 5)):
+        with MockServer(latency=args.latency, chunk_delay=0.002) as server:
+            generator = build(server.url, retry_policy=RetryPolicy(base=0.1),
+                              breaker=CircuitBreaker(failure_threshold=threshold))
+            for topic in known:
+                generator.generate(topic, stream=True)
+            server.config.error_rate = 1.0
+            before = server.config.requests
+            results = run(generator, asked, 1)
+            calls = server.config.requests - before
+            generator.close()
+        failed = [s for s, r in results if not r.ok] or [0.0]
+        served = sum(r.ok for _, r in results)
+        print(f"{name:18} {percentile(failed, 0.5) * 1000:9.0f}ms {percentile(failed, 0.99) * 1000:5.0f}ms "
+              f"{calls:14} {served:11}/{len(asked)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=200, help="generations per configuration")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds to first token")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall", type=float, default=3.0, help="seconds a stalled request waits")
+    parser.add_argument("--hedge-budget", type=float, default=0.15, help="share of calls that may be hedged")
+    args = parser.parse_args()
+    faults(args)
+    outage(args)
+
+
+if __name__ == "__main__":
+    main()
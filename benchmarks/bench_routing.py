@@ -0,0 +1,122 @@
+"""
+BENCHMARK — adaptive max_tokens and model tiers per plan
+========================================================
+Runs predictor.core.Generator against the local mock (which counts ~4
+characters per token and cuts answers off at max_tokens, like the API):
+
+- budgets: distinct text topics with the fixed 6,000-token budget vs the
+  adaptive one — max_tokens reserved per generation once warmed up, what
+  that means for generations per minute under the tokens-per-minute limit
+  admission control enforces, and answers cut off
+- drift: the answers then get 60% longer; how many are cut off (not
+  cached, paid again next time) before the budget for that kind goes back
+  to its ceiling
+- tiers: the sectional pipeline for a "trial" plan (detection on the fast
+  tier) and a "premium" one (all standard), from the per-tier call events
+  telemetry records — calls, seconds and list-price cost per paper
+
+    python -m benchmarks.bench_routing [-n 120] [--tokens-per-min 200000]
+"""
+
+import argparse
+
+from benchmarks.mock_anthropic import MockServer, sample_output
+from predictor.cache import ResponseCache
+from predictor.core import PROMPT_TOKENS, Generator
+from predictor.routing import CEILINGS, TEXT, Router, TokenBudget
+from predictor.scheduler import AdmissionController
+from predictor.telemetry import CALL, Telemetry
+from predictor.usage import cost_usd
+
+
+class Recorder(Telemetry):
+    """
+    Metrics-only telemetry that also keeps the call events, to summarise here.
+    """
+
+    def __init__(self):
+        super().__init__(None)
+        self.calls = []
+
+    def emit(self, event: str, **fields):
+        super().emit(event, **fields)
+        if event == CALL:
+            self.calls.append(fields)
+
+
+def build(url: str, router: Router, telemetry: Telemetry = None) -> Generator:
+    # Similar-topic matching off: every topic is its own paid call
+    return Generator("x", base_url=url, cache=ResponseCache(":memory:"), similar_threshold=2.0, router=router,
+                     controller=AdmissionController(max_concurrency=64, requests_per_min=1e9, tokens_per_min=1e12),
+                     telemetry=telemetry)
+
+
+def budgets(url: str, n: int, tokens_per_min: float):
+    print(f"budgets: {n} text topics\n")
+    print(f"{'':9} {'max_tokens':>10} {'reserved':>9} {'gen/min at TPM':>14} {'cut off':>7}")
+    for name, router in (("fixed", Router(budget=TokenBudget(min_samples=10 ** 9))), ("adaptive", Router())):
+        generator = build(url, router)
+        for i in range(n):
+            generator.generate(f"{name} budget topic {i}")
+        budget = generator.router.budget.max_tokens(TEXT)
+        reserved = PROMPT_TOKENS + budget
+        print(f"{name:9} {budget:10,} {reserved:9,} {tokens_per_min / reserved:14.1f} "
+              f"{generator.router.budget.truncated[TEXT]:7}")
+        generator.close()
+
+
+def drift(server: MockServer, n: int):
+    generator = build(server.url, Router())
+    for i in range(n):
+        generator.generate(f"drift warm-up {i}")
+    before = generator.router.budget.max_tokens(TEXT)
+    paper = sample_output()
+    longer = paper + "\n" + paper[:int(len(paper) * 0.6)]    # answers now 60% longer
+    server.config.output = longer
+    results = [generator.generate(f"drift topic {i}") for i in range(n)]
+    server.config.output = None
+    stats = generator.router.budget.stats()[TEXT]
+    first_ok = next((i for i, r in enumerate(results) if r.ok and r.usage.stop_reason == "end_turn"), None)
+    print(f"\ndrift: budget {before:,}, answers now ~{len(longer) // 4:,} tokens: {stats['truncated']} cut off, "
+          f"full answers again from request {'—' if first_ok is None else first_ok + 1}; "
+          f"budget now {stats['max_tokens']:,} (ceiling {stats['ceiling']:,})")
+    generator.close()
+
+
+def tiers(url: str, n: int):
+    print(f"\ntiers: {n} sectional-pipeline papers per plan")
+    print(f"{'':9} {'tier/task':20} {'calls':>5} {'p50':>7} {'model':28} {'$/paper':>8}")
+    for plan in ("trial", "premium"):
+        telemetry = Recorder()
+        generator = build(url, Router(), telemetry)
+        for i in range(n):
+            generator.generate(f"{plan} tier topic {i}", pipeline=True, plan=plan)
+        groups = {}
+        for call in telemetry.calls:
+            groups.setdefault((call["tier"], call["task"]), []).append(call)
+        total = 0.0
+        for (tier, task), calls in sorted(groups.items()):
+            seconds = sorted(c["seconds"] for c in calls)
+            cost = sum(cost_usd(c["model"], c["input_tokens"], c["output_tokens"], c["cache_creation_input_tokens"],
+                                c["cache_read_input_tokens"]) for c in calls)
+            total += cost
+            print(f"{plan:9} {tier + '/' + task:20} {len(calls):5} {seconds[len(seconds) // 2]:6.2f}s "
+                  f"{calls[0]['model']:28} {cost / n:8.4f}")
+        print(f"{plan:9} {'all':20} {'':5} {'':7} {'':28} {total / n:8.4f}")
+        generator.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=120, help="generations per run")
+    parser.add_argument("--tokens-per-min", type=float, default=200_000, help="the upstream TPM limit")
+    args = parser.parse_args()
+    print(f"ceilings: {', '.join(f'{kind} {n:,}' for kind, n in CEILINGS.items())}; prompt ~{PROMPT_TOKENS:,} tokens\n")
+    with MockServer(latency=0.0) as server:
+        budgets(server.url, args.n, args.tokens_per_min)
+        drift(server, args.n // 2)
+        tiers(server.url, max(args.n // 6, 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+BENCHMARK — near-duplicate topic matching
+=========================================
+Indexes 100k synthetic headline-like topics plus a hand-labelled set of
+real stories, then queries with:
+
+- paraphrases of a stored story (should resolve to it)
+- hard negatives: same actors, different news — including the same story
+  with another outcome ("upholds" vs "strikes down", "gives assent" vs
+  "delays") or in another state. They must NOT resolve to it: serving the
+  "repo rate unchanged" paper for "repo rate cut" is worse than a miss,
+  and the user is charged for it
+
+and reports, per threshold, precision / recall of the matches plus lookup
+latency (p50 / p99) at the full index size. IDF depends on what else is
+stored, so run a small index too (--size 200: a fresh deployment's cache).
+
+Then, through predictor.core against the mock endpoint: a paraphrase is
+served from a paper cached under the same setup, and never from one cached
+under another model or max_tokens sharing the cache file (exits 1 if it is).
+
+    python -m benchmarks.bench_similarity [--size 100000] [--thresholds 0.5,0.6,...]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_anthropic import MockServer
+from predictor.cache import ResponseCache
+from predictor.core import Generator
+from predictor.scheduler import AdmissionController
+from predictor.similarity import DEFAULT_THRESHOLD, TopicIndex
+
+# (stored topic, [paraphrases], [hard negatives])
+GROUPS = [
+    ("Governor delays NEET bill in Tamil Nadu",
+     ["TN governor NEET bill delay", "NEET bill – TN Governor withholding assent",
+      "Tamil Nadu Governor sits on NEET exemption bill"],
+     ["Supreme Court strikes down NEET PG domicile quota", "Kerala Governor returns university bill",
+      "Governor gives assent to NEET bill in Tamil Nadu", "Kerala governor delays NEET bill"]),
+    ("RBI keeps repo rate unchanged at 6.5%",
+     ["repo rate unchanged by RBI", "RBI MPC holds repo rate at 6.5 per cent", "RBI policy: repo rate kept unchanged"],
+     ["RBI cuts repo rate by 25 bps", "RBI hikes CRR to curb liquidity", "RBI hikes repo rate to 6.75%"]),
+    ("India-China LAC disengagement in Depsang and Demchok",
+     ["LAC disengagement India China Depsang Demchok", "India China complete disengagement at Depsang, Demchok"],
+     ["India China resume Kailash Mansarovar yatra", "China renames places in Arunachal Pradesh",
+      "India-China LAC standoff escalates", "India China troops clash at Depsang"]),
+    ("Great Nicobar Island development project",
+     ["Great Nicobar project", "Nicobar island mega infrastructure project concerns"],
+     ["Andaman and Nicobar Command tri-service exercise"]),
+    ("One Nation One Election bill introduced in Lok Sabha",
+     ["ONOE bill Lok Sabha introduced", "One Nation One Election bill tabled in Lok Sabha",
+      "Simultaneous elections bill – One Nation One Election introduced"],
+     ["Election Commission announces Maharashtra assembly polls",
+      "One Nation One Election bill passed by Lok Sabha"]),
+    ("Digital Personal Data Protection Rules notified",
+     ["DPDP rules notified", "Data protection rules under DPDP Act notified",
+      "Govt notifies Digital Personal Data Protection Rules"],
+     ["Telecommunications Act rules on satellite spectrum"]),
+    ("Supreme Court strikes down electoral bonds scheme",
+     ["SC strikes down electoral bonds", "Electoral bond scheme struck down by Supreme Court",
+      "Supreme Court verdict electoral bonds unconstitutional"],
+     ["SBI submits electoral bond data to Election Commission",
+      "Supreme Court upholds electoral bonds scheme"]),
+    ("Heatwave deaths and urban heat action plans",
+     ["Heat action plans urban heatwave deaths", "Heatwave deaths: cities need heat action plans"],
+     ["Cold wave grips north India"]),
+    ("Uniform Civil Code passed by Uttarakhand assembly",
+     ["Uttarakhand UCC bill passed", "Uttarakhand assembly passes Uniform Civil Code bill"],
+     ["Law Commission consultation on Uniform Civil Code", "Goa civil code debate",
+      "Gujarat assembly passes Uniform Civil Code bill", "Uttarakhand assembly rejects Uniform Civil Code bill"]),
+    ("Chandrayaan-3 lands near lunar south pole",
+     ["Chandrayaan 3 landing near Moon south pole", "Chandrayaan-3 lander touches down near lunar south pole"],
+     ["Aditya-L1 reaches Lagrange point", "Gaganyaan test vehicle flight"]),
+    ("Women's reservation bill passed by Parliament",
+     ["Nari Shakti Vandan Adhiniyam women's reservation bill passed",
+      "Parliament passes women reservation bill"],
+     ["Women's reservation in panchayats 25 years on"]),
+    ("CAA rules notified by Centre",
+     ["Citizenship Amendment Act rules notified", "Centre notifies CAA rules"],
+     ["NRC Assam final list exclusions"]),
+    ("Removal of Chief Election Commissioner under 2023 Act",
+     ["CEC removal 2023 Act", "Chief Election Commissioner removal process under new Act"],
+     ["Election Commission bans exit polls"]),
+    ("India signs free trade agreement with EFTA",
+     ["India EFTA free trade agreement signed", "India-EFTA FTA TEPA signed"],
+     ["India UK free trade agreement talks stall"]),
+    ("Manipur ethnic violence and President's Rule",
+     ["President's Rule imposed in Manipur", "Manipur violence President Rule"],
+     ["Mizoram refugee influx from Myanmar", "President's Rule in Manipur revoked"]),
+    ("Sikkim glacial lake outburst flood at South Lhonak",
+     ["South Lhonak GLOF Sikkim", "Sikkim glacial lake outburst flood Teesta"],
+     ["Himachal Pradesh flash floods in Kullu"]),
+    ("GST Council cuts rate on health insurance premiums",
+     ["GST on health insurance premium cut by GST Council", "GST Council health insurance premium rate cut"],
+     ["GST collections hit record high in April", "GST Council raises rate on health insurance premiums"]),
+    ("Waqf Amendment Bill referred to Joint Parliamentary Committee",
+     ["Waqf bill sent to JPC", "Waqf Amendment Bill JPC referral"],
+     ["Places of Worship Act challenge in Supreme Court"]),
+    ("India hosts G20 summit in New Delhi",
+     ["G20 New Delhi summit India hosts", "New Delhi G20 leaders summit"],
+     ["India to host BRICS summit", "G7 summit in Italy outreach"]),
+    ("Mpox declared public health emergency by WHO",
+     ["WHO declares mpox global health emergency", "Mpox public health emergency of international concern"],
+     ["WHO pandemic treaty negotiations", "Nipah virus outbreak in Kerala",
+      "WHO ends mpox public health emergency"]),
+]
+
+# Words the synthetic corpus is made of: common headline vocabulary, plus the
+# stories' own words at low frequency so they are not artificially unique
+FILLER = """india indian government centre state minister ministry policy scheme bill act court supreme high
+election commission parliament lok sabha rajya assembly report data rules amendment committee board
+national rural urban health education farmers water river climate heat flood drought monsoon energy
+solar power coal gas oil price prices inflation growth gdp budget tax gst bank banks rbi sebi market
+trade export import china pakistan nepal bangladesh sri lanka us russia ukraine israel gaza iran
+summit talks agreement treaty defence army navy air force missile test launch satellite isro space
+digital cyber ai technology startup jobs employment wages labour women children tribal forest wildlife
+tiger elephant project railway railways road highway port airport metro city cities village district
+police crime law order protest strike union cabinet approves launches announces plans review verdict
+probe case hearing petition rights citizens census caste quota reservation welfare subsidy loan debt
+""".split()
+
+
+def story_words() -> list:
+    words = set()
+    for topic, paraphrases, negatives in GROUPS:
+        for text in [topic, *paraphrases, *negatives]:
+            words.update(w.strip(",.–:'%").lower() for w in text.split())
+    return sorted(w for w in words if w)
+
+
+def synthetic_topics(n: int, rng: random.Random) -> list:
+    common = FILLER
+    rare = story_words()
+    topics = []
+    for i in range(n):
+        words = rng.sample(common, rng.randint(4, 8))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(rare))
+        words.append(f"x{i % 5000}")    # some long-tail entity, so topics aren't all one soup
+        topics.append(" ".join(words))
+    return topics
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def check_setups() -> list:
+    """
+    Failures: paraphrase lookups that crossed from one setup's cached paper
+    to another's, or didn't find the same setup's.
+    """
+    (stored, paraphrases, _), failures = GROUPS[1], []
+    with tempfile.TemporaryDirectory() as directory, MockServer() as server:
+        path = os.path.join(directory, "responses.sqlite3")
+
+        def generator(**setup) -> Generator:
+            return Generator("x", base_url=server.url, cache=ResponseCache(path), **setup,
+                             controller=AdmissionController(requests_per_min=1e9, tokens_per_min=1e12))
+
+        old = generator(model="model-old")
+        if not old.generate(stored).ok:
+            return [f"could not cache {stored!r}"]
+        hit = old.cached(paraphrases[0])
+        if hit is None or not hit.timings["similar_to"]:
+            failures.append(f"same setup: {paraphrases[0]!r} missed {stored!r}")
+        old.close()
+
+        for name, setup in (("model", {"model": "model-new"}), ("max_tokens", {"model": "model-old", "max_tokens": 4000})):
+            other = generator(**setup)
+            hit = other.cached(paraphrases[0])
+            calls = server.config.requests
+            result = other.generate(paraphrases[1])
+            if hit is not None or result.timings.get("similar_to") or server.config.requests == calls:
+                failures.append(f"{name} changed: {paraphrases[0]!r} / {paraphrases[1]!r} served from the old paper")
+            other.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100_000, help="stored topics")
+    parser.add_argument("--thresholds", default="0.5,0.6,0.65,0.7,0.75,0.8,0.85,0.9")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--show", action="store_true", help="print misses and false matches at the default threshold")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = TopicIndex()
+    start = time.perf_counter()
+    for i, topic in enumerate(synthetic_topics(args.size - len(GROUPS), rng)):
+        index.add(topic, f"synthetic-{i}")
+    for g, (topic, _, _) in enumerate(GROUPS):
+        index.add(topic, f"story-{g}")
+    build = time.perf_counter() - start
+
+    queries = [(p, f"story-{g}") for g, (_, paraphrases, _) in enumerate(GROUPS) for p in paraphrases]
+    negatives = [n for _, _, ns in GROUPS for n in ns]
+
+    # Latency: every labelled query plus a sample of stored-style topics, at the default threshold
+    probes = [q for q, _ in queries] + negatives + synthetic_topics(5000, random.Random(args.seed + 1))
+    timings = []
+    for text in probes:
+        t = time.perf_counter()
+        index.lookup(text)
+        timings.append(time.perf_counter() - t)
+
+    print(f"index: {len(index):,} topics, {index.stats()['vocabulary']:,} tokens, built in {build:.1f}s")
+    print(f"lookup latency over {len(probes):,} queries: p50 {percentile(timings, 0.5) * 1e6:.0f} µs, "
+          f"p99 {percentile(timings, 0.99) * 1e6:.0f} µs, max {max(timings) * 1e6:.0f} µs\n")
+
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'TP':>4} {'FP(para)':>8} {'FP(neg)':>7} {'missed':>6}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        tp = fp = fn = fp_neg = 0
+        for text, expected in queries:
+            match = index.lookup(text, threshold)
+            if match is None:
+                fn += 1
+            elif match.key == expected:
+                tp += 1
+            else:
+                fp += 1
+        for text in negatives:
+            if index.lookup(text, threshold) is not None:
+                fp_neg += 1
+        matched = tp + fp + fp_neg
+        precision = tp / matched if matched else 1.0
+        marker = "  ← default" if abs(threshold - DEFAULT_THRESHOLD) < 1e-9 else ""
+        print(f"{threshold:9.2f} {precision:9.1%} {tp / len(queries):7.1%} {tp:4d} {fp:8d} {fp_neg:7d} {fn:6d}{marker}")
+
+    print(f"\n{len(queries)} paraphrases, {len(negatives)} hard negatives")
+
+    if args.show:
+        print()
+        for text, expected in queries:
+            match = index.lookup(text, 0.0)
+            if match is None or match.key != expected or match.score < DEFAULT_THRESHOLD:
+                print(f"  miss  {text!r} → {match and match.topic!r} ({match.score if match else 0:.2f})")
+        for text in negatives:
+            match = index.lookup(text)
+            if match is not None:
+                print(f"  false {text!r} → {match.topic!r} ({match.score:.2f})")
+
+    failures = check_setups()
+    print(f"\nsetup change (model, max_tokens) on one cache file: "
+          f"{'no cross-setup matches' if not failures else len(failures)}")
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+BENCHMARK — what telemetry costs a request
+==========================================
+emit() is on every request's path, so it has to stay in the microseconds
+whatever the disk is doing. Measures:
+
+- emit() latency, p50 / p99, with no sink (metrics only) and with the JSONL
+  writer running
+- how fast the background writer drains, and whether a burst bigger than
+  the queue drops events instead of blocking
+- rotation: a small max size, many events — file count and that no line
+  is lost or torn
+- /metrics rendering time
+
+    python -m benchmarks.bench_telemetry [--events 200000]
+"""
+
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+
+from predictor.core import GenerationResult, _timings
+from predictor.telemetry import Telemetry
+from predictor.usage import UsageRecord
+
+USAGE = UsageRecord("claude-sonnet-4-20250514", 1890, 5120, 0, 3900, "end_turn")
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def results(n: int) -> list:
+    paid = GenerationResult(text="…", usage=USAGE, timings=_timings(21.4, 1.8, streamed=True, queue_wait=0.2))
+    hit = GenerationResult(text="…", timings=_timings(0.0004, cached=True))
+    return [paid if i % 3 == 0 else hit for i in range(n)]
+
+
+def emit_latency(telemetry: Telemetry, batch: list) -> list:
+    latencies = []
+    for i, result in enumerate(batch):
+        started = time.perf_counter()
+        telemetry.generation(result, request_id=f"r{i}", session_id="bench", model=USAGE.model, mode="stream")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+    batch = results(args.events)
+
+    memory_only = Telemetry(None)
+    latencies = emit_latency(memory_only, batch[:20_000])
+    print(f"emit, metrics only: p50 {percentile(latencies, 0.5) * 1e6:.1f} µs, "
+          f"p99 {percentile(latencies, 0.99) * 1e6:.1f} µs")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.jsonl")
+        telemetry = Telemetry(path, max_bytes=4 * 1024 * 1024, backups=100)
+        started = time.perf_counter()
+        latencies = emit_latency(telemetry, batch)
+        emitted = time.perf_counter() - started
+        telemetry.flush(timeout=120)
+        drained = time.perf_counter() - started
+        stats = telemetry.stats()
+        print(f"emit, with JSONL writer: p50 {percentile(latencies, 0.5) * 1e6:.1f} µs, "
+              f"p99 {percentile(latencies, 0.99) * 1e6:.1f} µs ({args.events:,} events emitted in {emitted:.2f}s, "
+              f"on disk after {drained:.2f}s, {stats['dropped']:,} dropped by the full queue)")
+
+        files = glob.glob(path + "*")
+        lines = torn = 0
+        for name in files:
+            with open(name, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        torn += 1
+        size = sum(os.path.getsize(f) for f in files)
+        print(f"rotation: {len(files)} files ({size / 1e6:.1f} MB, max 4 MB each), {lines:,} lines "
+              f"= written {stats['written']:,}: {'ok' if lines == stats['written'] and not torn else 'MISMATCH'}, "
+              f"{torn} torn")
+
+        renders = []
+        for _ in range(200):
+            started = time.perf_counter()
+            text = telemetry.metrics_text()
+            renders.append(time.perf_counter() - started)
+        print(f"/metrics: {len(text.splitlines())} lines, render p50 {percentile(renders, 0.5) * 1e6:.0f} µs")
+        telemetry.close()
+
+
+if __name__ == "__main__":
+    main()
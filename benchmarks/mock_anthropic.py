@@ -0,0 +1,383 @@
+"""
+MOCK ANTHROPIC MESSAGES SERVER
+==============================
+A tiny local stand-in for POST /v1/messages so benchmarks (and the real app,
+via ANTHROPIC_BASE_URL) can run without network or API spend.
+
+    python -m benchmarks.mock_anthropic --port 8765 --latency 0.5
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=x streamlit run streamlit_app.py
+
+Supports plain JSON and SSE streaming responses, keep-alive, and a fixed
+"time to first token" plus per-chunk delay. Output is counted at ~4
+characters per token and cut off at the request's max_tokens (stop_reason
+"max_tokens"), like the real API. Faults can be injected: a share
+of requests answered with an error status (529 by default), and a share
+that stall before their first byte — the slow tail hedging is for.
+
+    python -m benchmarks.mock_anthropic --error-rate 0.05 --stall-rate 0.05 --stall 8
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =============================================================================
+# CANNED OUTPUT — follows the format in the app's system prompt
+# =============================================================================
+
+RULE = "═" * 79
+
+
+def sample_output(topic: str = "RBI keeps repo rate unchanged", mcqs: int = 5, mains: int = 5) -> str:
+    """
+    A well-formed paper in the exact format the app asks the model for.
+    """
+    lines = [
+        RULE, "TOPIC DETECTION", RULE,
+        f"Primary Topic: {topic}",
+        "Subject: Economy",
+        "Paper: GS-III",
+        "",
+        "Cross-Subject Angles Identified:",
+        "1. Federal finances - Polity - GST compensation and state borrowing",
+        "2. Inflation targeting history - History - 2016 MPC framework",
+        "3. Ethics of central bank independence - Ethics - Autonomy vs accountability",
+        "",
+        RULE, "SECTION A: MCQs (5 Questions)", RULE, "",
+    ]
+    traps = ["T-01: Absolute words", "T-02: Institution swap", "T-06: Constitutional claims",
+             "T-20: May vs Shall", "T-29: AND connector trap"]
+    for n in range(1, mcqs + 1):
+        lines += [
+            f"MCQ {n}: [Archetype: P-0{n}]",
+            f"Consider the following statements about {topic} (question {n}):",
+            "1. The Monetary Policy Committee has six members.",
+            "2. The Governor has a casting vote.",
+            "Which of the statements given above is/are correct?",
+            "(a) 1 only  (b) 2 only  (c) Both 1 and 2  (d) Neither 1 nor 2",
+            "",
+            "✅ Answer: (c)",
+            f"⚠️ Trap Applied: [{traps[(n - 1) % len(traps)]}] — statement 2 tempts elimination",
+            "📖 Explanation: Section 45ZB of the RBI Act constitutes the MPC.",
+            "",
+        ]
+    lines += [RULE, "SECTION B: MAINS QUESTIONS (5 Questions)", RULE, ""]
+    for n in range(1, mains + 1):
+        lines += [
+            f"MAINS {n}:",
+            "📋 Archetype: EVAL-PC-3D-H",
+            f"📝 Question: Critically examine {topic} in the light of growth-inflation trade-offs. (15 marks, 250 words)",
+            "",
+            "📝 Answer Framework:",
+            "┌─ Introduction (30 words): Define the policy stance",
+            "├─ Body Para 1 (50 words): Inflation trajectory",
+            "├─ Body Para 2 (50 words): Growth concerns",
+            "├─ Body Para 3 (50 words): Transmission issues",
+            "├─ Body Para 4 (40 words): Global factors",
+            "└─ Conclusion (30 words): Balanced way forward",
+            "",
+            "📌 Must-Include:",
+            "• RBI Act Section 45ZA",
+            "• Urjit Patel Committee (2014)",
+            "• Flexible inflation targeting",
+            "",
+            "❌ Traps to Avoid:",
+            "• Don't ignore supply-side inflation",
+            "• Don't treat growth and inflation as a zero-sum choice",
+            "✓ Conclude with: Calibrated, data-dependent policy",
+            "",
+        ]
+    lines.append(RULE)
+    return "\n".join(lines)
+
+
+def sample_section(topic: str, instruction: str) -> str:
+    """
+    The slice of sample_output() a sectional-pipeline instruction asks for.
+    """
+    paper = sample_output(topic)
+    a = paper.index(f"{RULE}\nSECTION A")
+    b = paper.index(f"{RULE}\nSECTION B")
+    if "ONLY the TOPIC DETECTION" in instruction:
+        return paper[:a].strip()
+    if "ONLY SECTION A" in instruction:
+        return paper[a:b].strip()
+    if "ONLY SECTION B" in instruction:
+        return paper[b:].strip()
+    return paper
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class MockConfig:
+    """
+    Knobs shared by every handler thread. Change them between runs freely.
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_delay: float = 0.0, chunk_size: int = 64,
+                 output: str = None, tokens_per_sec: float = None, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 529, stall_rate: float = 0.0, stall: float = 0.0):
+        self.latency = latency          # seconds before the first byte / first token
+        self.chunk_delay = chunk_delay  # seconds between streamed chunks
+        self.chunk_size = chunk_size    # characters per streamed text delta
+        self.output = output            # fixed text, or None for sample_output(topic)
+        self.tokens_per_sec = tokens_per_sec    # simulated generation speed (None = instant)
+        self.jitter = jitter            # each response takes up to (1 + jitter)x longer, at random
+        self.error_rate = error_rate    # share of messages requests answered with error_status
+        self.error_status = error_status
+        self.stall_rate = stall_rate    # share of messages requests that wait `stall` extra seconds first
+        self.stall = stall
+        self.errors = 0
+        self.stalls = 0
+        self.requests = 0
+        self.cached_prefixes = set()    # system prompts seen with cache_control
+        self.batches = {}               # Message Batches: id -> (batch object, result lines)
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    disable_nagle_algorithm = True
+    config: MockConfig = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[:3] == ["v1", "messages", "batches"] and len(parts) >= 4:
+            entry = self.config.batches.get(parts[3])
+            if entry is None:
+                self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            elif len(parts) == 5 and parts[4] == "results":
+                data = "".join(json.dumps(line) + "\n" for line in entry[1]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/binary")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._send_json(200, entry[0])
+            return
+        self._send_json(200, {"status": "ok"})
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.config.count()
+
+        if not self.path.startswith("/v1/messages"):
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        if self.path.startswith("/v1/messages/batches"):
+            self._create_batch(body)
+            return
+
+        if random.random() < self.config.error_rate:
+            with self.config._lock:
+                self.config.errors += 1
+            kind = {429: "rate_limit_error", 529: "overloaded_error"}.get(self.config.error_status, "api_error")
+            self._send_json(self.config.error_status, {"type": "error", "error": {"type": kind, "message": "injected"}})
+            return
+        stall = 0.0
+        if random.random() < self.config.stall_rate:
+            with self.config._lock:
+                self.config.stalls += 1
+            stall = self.config.stall
+
+        text = self.config.output or sample_section(_topic_of(body), _instruction_of(body))
+        slowdown = 1.0 + random.uniform(0.0, self.config.jitter)
+        time.sleep(self.config.latency * slowdown + stall)
+        message = _message(body, text)
+        text = message["content"][0]["text"]
+        self._apply_prompt_cache(body, message["usage"])
+        if body.get("stream"):
+            try:
+                self._stream(message, text, slowdown)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True    # the client hung up mid-stream (e.g. a cancelled hedge)
+        else:
+            time.sleep(self._generation_time(len(text)) * slowdown)
+            self._send_json(200, message)
+
+    def _create_batch(self, body: dict):
+        # Processed on the spot: the batch is "ended" by the time anyone polls it
+        lines = []
+        for request in body.get("requests", []):
+            params = request["params"]
+            text = self.config.output or sample_section(_topic_of(params), _instruction_of(params))
+            message = _message(params, text)
+            self._apply_prompt_cache(params, message["usage"])
+            lines.append({"custom_id": request["custom_id"], "result": {"type": "succeeded", "message": message}})
+        batch_id = f"msgbatch_mock{len(self.config.batches) + 1:06d}"
+        now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        batch = {
+            "id": batch_id, "type": "message_batch", "processing_status": "ended",
+            "request_counts": {"processing": 0, "succeeded": len(lines), "errored": 0,
+                               "canceled": 0, "expired": 0},
+            "created_at": now, "ended_at": now, "expires_at": now,
+            "archived_at": None, "cancel_initiated_at": None,
+            "results_url": f"http://{self.headers.get('Host')}/v1/messages/batches/{batch_id}/results",
+        }
+        self.config.batches[batch_id] = (batch, lines)
+        self._send_json(200, batch)
+
+    def _generation_time(self, chars: int) -> float:
+        if not self.config.tokens_per_sec:
+            return 0.0
+        return chars / 4 / self.config.tokens_per_sec
+
+    def _apply_prompt_cache(self, body: dict, usage: dict):
+        # Mimic prompt caching: a system prompt with a cache_control block is
+        # "written" the first time and "read" afterwards
+        system = body.get("system")
+        if not isinstance(system, list) or not any("cache_control" in block for block in system):
+            return
+        prefix = json.dumps(system, sort_keys=True)
+        prefix_tokens = len(prefix) // 4
+        with self.config._lock:
+            seen = prefix in self.config.cached_prefixes
+            self.config.cached_prefixes.add(prefix)
+        usage["input_tokens"] = max(usage["input_tokens"] - prefix_tokens, 0)
+        usage["cache_read_input_tokens" if seen else "cache_creation_input_tokens"] = prefix_tokens
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, message: dict, text: str, slowdown: float = 1.0):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        start = dict(message, content=[], stop_reason=None,
+                     usage=dict(message["usage"], output_tokens=1))
+        self._event("message_start", {"type": "message_start", "message": start})
+        self._event("content_block_start", {"type": "content_block_start", "index": 0,
+                                            "content_block": {"type": "text", "text": ""}})
+        step = self.config.chunk_size
+        for i in range(0, len(text), step):
+            self._event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                "delta": {"type": "text_delta", "text": text[i:i + step]}})
+            delay = self.config.chunk_delay or self._generation_time(step)
+            if delay:
+                time.sleep(delay * slowdown)
+        self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._event("message_delta", {"type": "message_delta",
+                                      "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                                      "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+        self._event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _event(self, name: str, payload: dict):
+        data = f"event: {name}\ndata: {json.dumps(payload)}\n\n".encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _instruction_of(body: dict) -> str:
+    content = body.get("messages", [{}])[-1].get("content", "")
+    if isinstance(content, list):
+        content = "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return content
+
+
+def _topic_of(body: dict) -> str:
+    lines = [line for line in _instruction_of(body).splitlines() if line.strip()]
+    return lines[1].strip() if len(lines) > 2 else "News screenshot"
+
+
+def _message(body: dict, text: str) -> dict:
+    stop_reason = "end_turn"
+    max_tokens = body.get("max_tokens")
+    if max_tokens and len(text) // 4 > max_tokens:
+        text, stop_reason = text[:max_tokens * 4], "max_tokens"
+    return {
+        "id": "msg_mock",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(json.dumps(body)) // 4, "output_tokens": len(text) // 4},
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # 100 simultaneous fresh clients overflow the default backlog of 5
+
+
+class MockServer:
+    """
+    Run the mock in a background thread:
+
+        with MockServer(latency=0.2) as server:
+            client = anthropic.Anthropic(api_key="x", base_url=server.url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **config):
+        self.config = MockConfig(**config)
+        handler = type("BoundMockHandler", (MockHandler,), {"config": self.config})
+        self.httpd = _Server((host, port), handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to first token")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--tokens-per-sec", type=float, default=None, help="simulated generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=529)
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests that stall first")
+    parser.add_argument("--stall", type=float, default=0.0, help="seconds a stalled request waits")
+    args = parser.parse_args()
+
+    server = MockServer(args.host, args.port, latency=args.latency, chunk_delay=args.chunk_delay,
+                        tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate,
+                        error_status=args.error_status, stall_rate=args.stall_rate, stall=args.stall)
+    print(f"Mock Anthropic API on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+UPSC MULTI-ANGLE PREDICTOR — BUILD THE PYQ INDEX
+================================================
+Turn a JSONL file of previous-year questions into the memory-mapped BM25
+index the generator reads (predictor.pyq), and try a few searches on it.
+
+    python build_pyq_index.py pyqs.jsonl                    # → .cache/pyq.idx
+    python build_pyq_index.py pyqs.jsonl --out /srv/pyq.idx --query "Governor assent to state bills"
+
+Each line: {"question": "...", "year": 2019, "paper": "Prelims", "subject": "Polity",
+"options": [...], "answer": "b"} — only "question" is required.
+
+Running processes keep the index they opened; restart the app (or point
+UPSC_PYQ_INDEX at the new file) to pick up a rebuild. Rebuilding changes
+the response cache keys of text topics, so nothing generated against the
+old examples is served as if it used the new ones.
+"""
+
+import argparse
+import os
+import sys
+
+from predictor.pyq import DEFAULT_K, DEFAULT_PATH, PYQIndex, build_index, read_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the previous-year-question index")
+    parser.add_argument("corpus", help="JSONL file, one question per line")
+    parser.add_argument("--out", default=os.environ.get("UPSC_PYQ_INDEX", DEFAULT_PATH), help="index file to write")
+    parser.add_argument("--query", action="append", default=[], help="topic to try against the new index")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="results per --query")
+    args = parser.parse_args()
+
+    try:
+        questions = read_corpus(args.corpus)
+    except (OSError, ValueError) as e:
+        sys.exit(f"error: {e}")
+    if not questions:
+        sys.exit(f"error: no questions in {args.corpus}")
+
+    stats = build_index(questions, args.out)
+    print(f"{stats['questions']:,} questions, {stats['terms']:,} terms, {stats['postings']:,} postings "
+          f"→ {args.out} ({stats['bytes'] / 1024:.0f} KB) in {stats['seconds']:.2f}s")
+
+    index = PYQIndex(args.out)
+    for query in args.query:
+        print(f"\n{query}")
+        for score, pyq in index.search(query, args.k):
+            print(f"  {score:5.2f}  {pyq.brief(120)}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
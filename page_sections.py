@@ -0,0 +1,318 @@
+"""
+PAGE SECTIONS — the static parts of the Streamlit page
+======================================================
+Everything on the page that doesn't depend on the visitor: styles, hero,
+How It Works, Why This is Different, sample output, pricing, footer.
+
+Streamlit re-executes streamlit_app.py on every interaction but imports
+this module once per process, so these strings are built once and each
+rerun only hands them over. Each section is one HTML block (a CSS grid
+instead of st.columns with a markdown call per column), so a rerun sends
+one element per section rather than a dozen.
+"""
+
+STYLES = """
+<style>
+    /* Main container */
+    .main {
+        padding: 1rem 2rem;
+    }
+
+    /* Header styling */
+    .hero-title {
+        font-size: 2.5rem;
+        font-weight: 700;
+        color: #1a365d;
+        text-align: center;
+        margin-bottom: 0;
+    }
+
+    .hero-subtitle {
+        font-size: 1.3rem;
+        color: #e53e3e;
+        text-align: center;
+        margin-top: 0.5rem;
+    }
+
+    .chai-tagline {
+        background: linear-gradient(135deg, #f6e05e 0%, #ed8936 100%);
+        padding: 1rem 2rem;
+        border-radius: 10px;
+        text-align: center;
+        margin: 1.5rem 0;
+    }
+
+    .chai-tagline h2 {
+        color: #744210;
+        margin: 0;
+        font-size: 1.5rem;
+    }
+
+    /* Question cards */
+    .question-card {
+        background: #f7fafc;
+        border-left: 4px solid #3182ce;
+        padding: 1rem;
+        margin: 1rem 0;
+        border-radius: 0 8px 8px 0;
+    }
+
+    .mcq-card {
+        border-left-color: #38a169;
+    }
+
+    .mains-card {
+        border-left-color: #805ad5;
+    }
+
+    .card-text {
+        white-space: pre-wrap;
+        margin-top: 0.5rem;
+    }
+
+    .trap-alert {
+        background: #fff5f5;
+        border: 1px solid #fc8181;
+        padding: 0.5rem 1rem;
+        border-radius: 5px;
+        margin: 0.5rem 0;
+        font-size: 0.9rem;
+    }
+
+    /* Section grids (in place of st.columns; stack on phones like columns do) */
+    .section-grid {
+        display: grid;
+        gap: 1rem;
+    }
+
+    .section-grid.four {
+        grid-template-columns: repeat(4, 1fr);
+    }
+
+    .section-grid.two {
+        grid-template-columns: repeat(2, 1fr);
+    }
+
+    @media (max-width: 640px) {
+        .section-grid.four, .section-grid.two {
+            grid-template-columns: 1fr;
+        }
+    }
+
+    /* Pricing cards */
+    .pricing-card {
+        background: white;
+        border: 2px solid #e2e8f0;
+        border-radius: 10px;
+        padding: 1.5rem;
+        text-align: center;
+        transition: transform 0.2s;
+    }
+
+    .pricing-card:hover {
+        transform: translateY(-5px);
+        border-color: #3182ce;
+    }
+
+    .pricing-card.featured {
+        border-color: #ed8936;
+        background: #fffaf0;
+    }
+
+    .price-tag {
+        font-size: 2rem;
+        font-weight: 700;
+        color: #2d3748;
+    }
+
+    /* Footer */
+    .footer {
+        text-align: center;
+        padding: 2rem;
+        color: #718096;
+        font-size: 0.9rem;
+    }
+
+    /* Hide Streamlit branding */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+</style>
+"""
+
+HERO = STYLES + """
+<h1 class="hero-title">UPSC Multi-Angle Predictor</h1>
+<p class="hero-subtitle">One Topic → 10 Questions → 5 GS Papers</p>
+<div class="chai-tagline">
+    <h2>☕ ₹15 = Price of One Chai = 10 UPSC Questions</h2>
+    <p style="margin:0.5rem 0 0 0; color:#744210;">Skip the chai. Crack the exam.</p>
+</div>
+"""
+
+# =============================================================================
+# SIDEBAR
+# =============================================================================
+
+SIDEBAR_PLANS = """
+---
+## 💰 Add Credits
+
+| Plan | Price | Credits |
+|------|-------|---------|
+| ☕ **Try** | ₹15 | 1 |
+| 📚 Starter | ₹149 | 10 |
+| 🎯 Pro | ₹499 | 40 |
+| 🏆 Premium | ₹899 | 80 |
+"""
+
+SIDEBAR_LINKS = """
+---
+### 🔗 Quick Links
+- [Sample Output (PDF)](#)
+- [How it Works](#how-it-works)
+- [Contact Us](#)
+"""
+
+# =============================================================================
+# BELOW THE GENERATOR
+# =============================================================================
+
+HOW_IT_WORKS = """
+<hr>
+<a name="how-it-works"></a>
+<h2>🎯 How It Works</h2>
+<div class="section-grid four">
+    <div><h3>1️⃣ Input</h3><p>Type topic or upload news screenshot</p></div>
+    <div><h3>2️⃣ Analysis</h3><p>AI detects subject + 3 cross-angles</p></div>
+    <div><h3>3️⃣ Generation</h3><p>10 questions with traps &amp; frameworks</p></div>
+    <div><h3>4️⃣ Practice</h3><p>MCQs + Mains with answer guidance</p></div>
+</div>
+"""
+
+WHY_DIFFERENT = """
+<hr>
+<h2>✨ Why This is Different</h2>
+<div class="section-grid two">
+    <div>
+        <h3>❌ Generic AI (ChatGPT/Gemini)</h3>
+        <ul>
+            <li>Single subject questions only</li>
+            <li>No exam trap awareness</li>
+            <li>Generic answer formats</li>
+            <li>Missing key elements</li>
+            <li>One-sided conclusions</li>
+        </ul>
+    </div>
+    <div>
+        <h3>✅ UPSC Predictor</h3>
+        <ul>
+            <li><strong>Multi-angle</strong>: 5 GS papers from 1 topic</li>
+            <li><strong>32 traps</strong>: Real UPSC patterns embedded</li>
+            <li><strong>4D Archetypes</strong>: Proper answer structure</li>
+            <li><strong>Must-includes</strong>: Cases, committees, articles</li>
+            <li><strong>Constitutional balance</strong>: Examiner-approved framing</li>
+        </ul>
+    </div>
+</div>
+<hr>
+<h2>📄 Sample Output Preview</h2>
+"""
+
+SAMPLE_OUTPUT_LABEL = "Click to see sample output for 'CEC Impeachment' topic"
+
+SAMPLE_OUTPUT = """
+═══════════════════════════════════════════════════════════════
+TOPIC DETECTION
+═══════════════════════════════════════════════════════════════
+Primary Topic: Election Commission / CEC Removal
+Subject: Polity & Governance
+Paper: GS-II
+
+Cross-Subject Angles Identified:
+1. Historical Evolution - GS-I - T.N. Seshan era reforms
+2. Federalism - GS-II - Centre-State in EC appointments
+3. Institutional Ethics - GS-IV - Independence vs accountability
+
+═══════════════════════════════════════════════════════════════
+SECTION A: MCQs
+═══════════════════════════════════════════════════════════════
+
+MCQ 1: [Archetype: P-01]
+Consider the following statements about CEC removal:
+1. CEC can be removed only through impeachment
+2. Removal procedure is same as Supreme Court judge
+3. Grounds are incapacity and proved misbehavior
+
+Which is/are correct?
+(a) 1 and 2 only  (b) 2 and 3 only
+(c) 1 and 3 only  (d) 1, 2 and 3
+
+✅ Answer: (b) 2 and 3 only
+⚠️ Trap: T-01 (Absolute Words) — "only through impeachment" is
+   imprecise. Constitution says "in like manner" as SC judge.
+
+[... 4 more MCQs ...]
+
+═══════════════════════════════════════════════════════════════
+SECTION B: MAINS
+═══════════════════════════════════════════════════════════════
+
+MAINS 1:
+📋 Archetype: EVAL-PC-3D-H
+📝 Question: Critically examine the appointment and removal
+   process of CEC. Has the 2023 Act addressed SC's concerns?
+
+📝 Answer Framework:
+┌─ Introduction (30 words): Recent controversy context
+├─ Constitutional Framework (40 words): Article 324
+├─ SC Judgment Analysis (50 words): Anoop Baranwal case
+├─ 2023 Act Evaluation (50 words): New process
+├─ Critical Assessment (50 words): Both sides
+└─ Way Forward (30 words): Balanced reforms
+
+📌 Must-Include:
+• Article 324(2) and 324(5)
+• Anoop Baranwal vs UOI (2023)
+• T.N. Seshan tenure reference
+
+[... 4 more Mains questions ...]
+""".strip("\n")
+
+PRICING = """
+<hr>
+<h2>💰 Simple Pricing</h2>
+<div class="section-grid four">
+    <div class="pricing-card featured">
+        <h3>☕ Try</h3>
+        <p class="price-tag">₹15</p>
+        <p>1 Query</p>
+        <p><small>Price of one chai!</small></p>
+    </div>
+    <div class="pricing-card">
+        <h3>📚 Starter</h3>
+        <p class="price-tag">₹149</p>
+        <p>10 Queries</p>
+        <p><small>₹14.90 each</small></p>
+    </div>
+    <div class="pricing-card">
+        <h3>🎯 Pro</h3>
+        <p class="price-tag">₹499</p>
+        <p>40 Queries</p>
+        <p><small>₹12.48 each</small></p>
+    </div>
+    <div class="pricing-card">
+        <h3>🏆 Premium</h3>
+        <p class="price-tag">₹899</p>
+        <p>80 Queries</p>
+        <p><small>₹11.24 each</small></p>
+    </div>
+</div>
+<hr>
+<div class="footer">
+    <p><strong>UPSC Multi-Angle Predictor</strong></p>
+    <p>Built for serious aspirants who want an edge.</p>
+    <p>Questions? Email: support@upscpredictor.com</p>
+    <p style="margin-top: 1rem; font-size: 0.8rem;">
+        ☕ Skip the chai. Crack the exam.
+    </p>
+</div>
+"""
@@ -0,0 +1,143 @@
+"""
+PAPER CARDS — a generated paper as escaped, paginated question cards
+====================================================================
+The model's text is parsed (predictor.parser) into its topic detection and
+one record per question, and each record becomes a small HTML card with
+every piece of model text escaped, so a stray "<" in an answer shows up as
+a "<" instead of breaking the page.
+
+    paper = build(output)           # cached per distinct output
+    paper.summary                   # topic detection card ("" if none)
+    paper.page_labels()             # ["MCQ 1–5", "Mains 1–5"]
+    for card in paper.page(0):
+        card.body                   # question, always visible
+        card.details_label          # expander title
+        card.details                # answer + trap / framework, collapsed
+
+Only one page of cards is sent to the browser at a time. Output that
+doesn't parse into questions falls back to the whole text as one escaped
+<pre> block (paper.fallback).
+"""
+
+import html
+from dataclasses import dataclass
+from functools import lru_cache
+
+from predictor.parser import MCQ, parse
+
+PAGE_SIZE = 5       # cards per page: one section of the standard paper
+
+
+@dataclass(frozen=True)
+class Card:
+    kind: str           # "MCQ" or "Mains"
+    number: int
+    body: str
+    details_label: str
+    details: str
+
+
+@dataclass(frozen=True)
+class Paper:
+    summary: str
+    cards: tuple
+    fallback: str = ""
+
+    def pages(self) -> int:
+        return -(-len(self.cards) // PAGE_SIZE)
+
+    def page(self, index: int) -> tuple:
+        return self.cards[index * PAGE_SIZE:(index + 1) * PAGE_SIZE]
+
+    def page_labels(self) -> list:
+        """
+        "MCQ 1–5", "Mains 1–5" — what each page holds, for the pager.
+        """
+        labels = []
+        for index in range(self.pages()):
+            cards = self.page(index)
+            first, last = cards[0], cards[-1]
+            if first.kind != last.kind:
+                labels.append(f"{first.kind} {first.number} – {last.kind} {last.number}")
+            elif first.number == last.number:
+                labels.append(f"{first.kind} {first.number}")
+            else:
+                labels.append(f"{first.kind} {first.number}–{last.number}")
+        return labels
+
+
+def _text(value: str) -> str:
+    return html.escape(value or "")
+
+
+def _items(values: tuple) -> str:
+    return "".join(f"<li>{_text(v)}</li>" for v in values)
+
+
+def _summary(detection) -> str:
+    if detection is None:
+        return ""
+    facts = " · ".join(_text(v) for v in (detection.subject, detection.paper) if v)
+    parts = [f'<div class="question-card"><strong>🎯 {_text(detection.primary_topic or "Topic")}</strong>']
+    if facts:
+        parts.append(f"<br><small>{facts}</small>")
+    if detection.angles:
+        parts.append(f"<ol>{_items(detection.angles)}</ol>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def _body(kind: str, css: str, record) -> str:
+    archetype = f" <small>· {_text(record.archetype)}</small>" if record.archetype else ""
+    return (f'<div class="question-card {css}"><strong>{kind} {record.number}</strong>{archetype}'
+            f'<div class="card-text">{_text(record.question)}</div></div>')
+
+
+def _mcq(record: MCQ) -> Card:
+    details = [f"<p><strong>✅ Answer:</strong> {_text(record.answer) or '—'}</p>"]
+    if record.trap:
+        details.append(f'<div class="trap-alert">⚠️ <strong>Trap:</strong> {_text(record.trap)}</div>')
+    if record.explanation:
+        details.append(f'<p class="card-text"><strong>📖 Explanation:</strong> {_text(record.explanation)}</p>')
+    return Card("MCQ", record.number, _body("MCQ", "mcq-card", record),
+                "✅ Answer & trap", "".join(details))
+
+
+def _mains(record) -> Card:
+    details = []
+    if record.framework:
+        details.append(f"<p><strong>📝 Answer Framework</strong></p><ol>{_items(record.framework)}</ol>")
+    if record.must_include:
+        details.append(f"<p><strong>📌 Must-Include</strong></p><ul>{_items(record.must_include)}</ul>")
+    if record.traps_to_avoid:
+        details.append(f'<div class="trap-alert">❌ <strong>Traps to Avoid</strong>'
+                       f'<ul>{_items(record.traps_to_avoid)}</ul></div>')
+    if record.conclude_with:
+        details.append(f"<p><strong>✓ Conclude with:</strong> {_text(record.conclude_with)}</p>")
+    return Card("Mains", record.number, _body("Mains", "mains-card", record),
+                "📝 Answer framework", "".join(details) or "<p>—</p>")
+
+
+def fallback_html(output: str) -> str:
+    """
+    The whole text as one escaped, boxed <pre> — for output with no
+    recognisable questions, and for the live preview while streaming.
+    """
+    return f"""
+    <div style="background: #f7fafc; padding: 1.5rem; border-radius: 10px; border: 1px solid #e2e8f0;">
+        <pre style="white-space: pre-wrap; font-family: 'Segoe UI', sans-serif; font-size: 0.95rem; line-height: 1.6;">{html.escape(output)}</pre>
+    </div>
+    """
+
+
+@lru_cache(maxsize=64)
+def build(output: str) -> Paper:
+    """
+    Cards for a complete output. Reruns redraw the same paper many times
+    (page turns, expanders, other widgets); it is parsed once.
+    """
+    parsed = parse(output)
+    cards = tuple([_mcq(r) for r in parsed.mcqs] + [_mains(r) for r in parsed.mains])
+    if not cards:
+        return Paper("", (), fallback_html(output))
+    return Paper(_summary(parsed.detection), cards)
@@ -0,0 +1,6 @@
+"""
+UPSC PREDICTOR — SUPPORT PACKAGE
+=================================
+UI-free building blocks used by streamlit_app.py (caching, clients, etc.).
+Nothing in here imports streamlit.
+"""
@@ -0,0 +1,235 @@
+"""
+BATCH PRE-GENERATION — warm the response cache before the day starts
+====================================================================
+Every morning's 30-50 headline topics are known in advance. Generating
+them off-peak means the first aspirant to type one gets a cache hit
+instead of a 30 s wait at peak load.
+
+Two ways to run a list:
+
+- run_concurrent: through Generator.submit with bounded concurrency,
+  under its own admission session so it never crowds out live users
+- run_message_batch: one Message Batches API job (half price, results
+  within 24 h); the batch id is kept in a small state file so a crashed
+  run re-attaches to the same batch instead of paying twice
+
+Both are resumable by construction: anything already in the response cache
+is skipped, and results are written to the cache as they arrive.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+from predictor.cache import normalize_topic
+from predictor.core import Generator
+from predictor.prompts import SYSTEM_BLOCKS
+from predictor.usage import UsageRecord
+
+SESSION_ID = "pregenerate"      # one fair-queueing session for the whole batch
+BATCH_BETAS = ["message-batches-2024-09-24", "prompt-caching-2024-07-31"]
+DEFAULT_POLL_INTERVAL = 30.0
+
+
+def read_topics(path: str) -> list:
+    """
+    Topics from a file: one per line, or JSONL with {"topic": ...} objects
+    (or bare JSON strings). Blank lines and # comments are skipped;
+    duplicates (after normalization) are dropped, first one wins.
+    """
+    topics, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            topic = line
+            if line[0] in "{\"":
+                try:
+                    value = json.loads(line)
+                except ValueError:
+                    raise ValueError(f"{path}:{number}: not valid JSON") from None
+                topic = value.get("topic") if isinstance(value, dict) else value
+                if not isinstance(topic, str):
+                    raise ValueError(f"{path}:{number}: no \"topic\" string")
+            key = normalize_topic(topic)
+            if key and key not in seen:
+                seen.add(key)
+                topics.append(topic.strip())
+    return topics
+
+
+@dataclass
+class BatchReport:
+    topics: int = 0
+    skipped: int = 0                # already cached
+    generated: int = 0
+    repaired: int = 0               # questions fixed by targeted repair
+    failed: list = field(default_factory=list)      # (topic, error)
+    usage: list = field(default_factory=list)       # UsageRecord per paid call
+    elapsed: float = 0.0
+
+    @property
+    def total_usage(self) -> UsageRecord:
+        return UsageRecord.combine(self.usage)
+
+    def summary(self) -> str:
+        usage = self.total_usage
+        rate = self.generated / self.elapsed if self.elapsed else 0.0
+        lines = [
+            f"topics: {self.topics}  already cached: {self.skipped}  generated: {self.generated}  "
+            f"failed: {len(self.failed)}  repaired questions: {self.repaired}",
+            f"elapsed: {self.elapsed:.1f}s  throughput: {rate * 60:.1f} topics/min",
+            f"tokens: {usage.total_input_tokens:,} in ({usage.cache_read_input_tokens:,} from prompt cache), "
+            f"{usage.output_tokens:,} out",
+        ]
+        lines += [f"  FAILED {topic!r}: {error}" for topic, error in self.failed]
+        return "\n".join(lines)
+
+
+def pending(generator: Generator, topics: list) -> list:
+    """
+    The topics that still need generating.
+    """
+    return [t for t in topics if generator.key(t) not in generator.cache]
+
+
+def _record(report: BatchReport, topic: str, result):
+    if result.usage is not None:
+        report.usage.append(result.usage)
+    if result.ok:
+        report.generated += 1
+        report.repaired += result.timings.get("repaired", 0)
+    else:
+        report.failed.append((topic, result.error))
+
+
+def run_concurrent(generator: Generator, topics: list, *, concurrency: int = 4,
+                   pipeline: bool = False, on_result=None) -> BatchReport:
+    """
+    Generate every uncached topic, at most `concurrency` at a time.
+    `on_result(topic, result)` is called as each one finishes.
+    """
+    started = time.perf_counter()
+    todo = pending(generator, topics)
+    report = BatchReport(topics=len(topics), skipped=len(topics) - len(todo))
+
+    in_flight = {}
+    remaining = iter(todo)
+
+    def top_up():
+        for topic in remaining:
+            in_flight[generator.submit(topic, pipeline=pipeline, session_id=SESSION_ID)] = topic
+            if len(in_flight) >= concurrency:
+                return
+
+    top_up()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            topic = in_flight.pop(future)
+            result = future.result()
+            _record(report, topic, result)
+            if on_result:
+                on_result(topic, result)
+        top_up()
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+# =============================================================================
+# MESSAGE BATCHES API
+# =============================================================================
+
+def _load_state(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_state(path: str, state: dict):
+    # Write-then-rename so a crash never leaves half a state file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def run_message_batch(generator: Generator, topics: list, *, state_path: str,
+                      poll_interval: float = DEFAULT_POLL_INTERVAL, on_status=None,
+                      on_result=None) -> BatchReport:
+    """
+    Submit every uncached topic as one Message Batches job, wait for it, and
+    ingest the results. If `state_path` names an unfinished job from an
+    earlier run, that job is picked up instead of submitting a new one.
+
+    `on_status(batch)` is called after each poll.
+    """
+    started = time.perf_counter()
+    client = generator.client()
+    batches = client.beta.messages.batches
+
+    state = _load_state(state_path)
+    if state is None:
+        todo = pending(generator, topics)
+        report = BatchReport(topics=len(topics), skipped=len(topics) - len(todo))
+        if not todo:
+            report.elapsed = time.perf_counter() - started
+            return report
+        # The same route and budget generator.key() hashes, so results land under the keys they're cached by
+        model = generator.router.model(generator.router.route(None).paper)
+        requests, by_id = [], {}
+        for topic in todo:
+            custom_id = generator.key(topic)   # sha256 hex: exactly the 64 characters allowed
+            by_id[custom_id] = topic
+            requests.append({"custom_id": custom_id, "params": {
+                "model": model,
+                "max_tokens": generator.max_tokens,
+                "system": SYSTEM_BLOCKS,
+                "messages": generator.request(topic)[1],
+            }})
+        batch = batches.create(requests=requests, betas=BATCH_BETAS)
+        state = {"batch_id": batch.id, "topics": by_id, "submitted": time.time()}
+        _save_state(state_path, state)
+    else:
+        # Resuming: everything in the earlier job counts as this run's work
+        report = BatchReport(topics=len(topics), skipped=len(topics) - len(state["topics"]))
+        batch = batches.retrieve(state["batch_id"], betas=BATCH_BETAS)
+
+    while batch.processing_status != "ended":
+        if on_status:
+            on_status(batch)
+        time.sleep(poll_interval)
+        batch = batches.retrieve(batch.id, betas=BATCH_BETAS)
+    if on_status:
+        on_status(batch)
+
+    seen = set()
+    for item in batches.results(batch.id, betas=BATCH_BETAS):
+        topic = state["topics"].get(item.custom_id)
+        if topic is None:
+            continue
+        seen.add(item.custom_id)
+        if generator.key(topic) in generator.cache:
+            report.generated += 1       # ingested before a crash
+            continue
+        if item.result.type != "succeeded":
+            error = getattr(getattr(item.result, "error", None), "error", None)
+            report.failed.append((topic, f"{item.result.type}: {getattr(error, 'message', '')}".rstrip(": ")))
+            continue
+        result = generator.ingest(topic, item.result.message)
+        _record(report, topic, result)
+        if on_result:
+            on_result(topic, result)
+    report.failed += [(topic, "missing from batch results")
+                      for custom_id, topic in state["topics"].items() if custom_id not in seen]
+
+    os.remove(state_path)
+    report.elapsed = time.perf_counter() - started
+    return report
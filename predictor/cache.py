@@ -0,0 +1,239 @@
+"""
+RESPONSE CACHE — content-addressed, on-disk
+============================================
+Same topic + same prompt + same model = same 10 questions. We keep finished
+generations in a small SQLite file so a repeat topic comes back in
+milliseconds instead of another 20-40 s, 6000-token call.
+
+- Keys are SHA-256 over the normalized topic (or the screenshot's perceptual
+  hash, or raw image bytes), the full system prompt, model and max_tokens. Editing the prompt changes every key,
+  so stale answers are never served; they just age out.
+- Every entry carries its own expiry (news goes stale).
+- Total stored bytes are bounded; least-recently-used entries go first.
+- Text entries also keep the topic as typed, so other processes can find
+  them by similarity (predictor.similarity), not only by exact key — and
+  the fingerprint of the prompt, model, max_tokens and context that made
+  them, so a match never crosses into answers another setup produced.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+DEFAULT_PATH = os.path.join(".cache", "responses.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024   # 256 MB of compressed output
+DEFAULT_TTL = 12 * 60 * 60              # 12 hours — today's news, not last week's
+
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+def normalize_topic(topic: str) -> str:
+    """
+    Fold the cosmetic differences users introduce when pasting a headline:
+    unicode forms, case, and runs of whitespace / newlines.
+    """
+    topic = unicodedata.normalize("NFKC", topic)
+    return " ".join(topic.casefold().split())
+
+
+def _digest(fields: list) -> str:
+    h = hashlib.sha256()
+    for label, data in fields:
+        # Length-prefix every field so ("ab", "c") != ("a", "bc")
+        h.update(label.encode())
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def _config_fields(system_prompt: str, model: str, max_tokens: int, context: str = None) -> list:
+    fields = [("system", system_prompt.encode("utf-8")), ("model", model.encode("utf-8")),
+              ("max_tokens", str(max_tokens).encode())]
+    if context:
+        fields.append(("context", context.encode("utf-8")))
+    return fields
+
+
+def cache_key(topic: str = None, image_data: bytes = None, *, image_hash: str = None,
+              system_prompt: str, model: str, max_tokens: int, context: str = None) -> str:
+    """
+    Build the content address for one generation request.
+
+    Pass `image_hash` (see predictor.images.perceptual_hash) rather than
+    `image_data` so re-encoded copies of one screenshot share a key.
+    `context` names anything else the request was built from (e.g. the
+    PYQ index version), so changing it changes the key.
+    """
+    if image_hash:
+        source = ("image-phash", image_hash.encode("ascii"))
+    elif image_data:
+        source = ("image", image_data)
+    else:
+        source = ("topic", normalize_topic(topic or "").encode("utf-8"))
+    return _digest([source, *_config_fields(system_prompt, model, max_tokens, context)])
+
+
+def config_fingerprint(*, system_prompt: str, model: str, max_tokens: int, context: str = None) -> str:
+    """
+    Everything in a cache key except the topic: entries with the same
+    fingerprint were produced by the same setup.
+    """
+    return _digest(_config_fields(system_prompt, model, max_tokens, context))
+
+
+# =============================================================================
+# STORE
+# =============================================================================
+
+class ResponseCache:
+    """
+    SQLite-backed LRU + TTL cache of generated outputs.
+
+    Safe to share across Streamlit sessions (one instance per process) and
+    across processes pointing at the same file (WAL mode).
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 default_ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key         TEXT PRIMARY KEY,
+                value       BLOB NOT NULL,
+                size        INTEGER NOT NULL,
+                created     REAL NOT NULL,
+                expires     REAL NOT NULL,
+                last_access REAL NOT NULL,
+                topic       TEXT,
+                config      TEXT
+            )
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        if "topic" not in columns:     # cache files written before topics were stored
+            self._db.execute("ALTER TABLE responses ADD COLUMN topic TEXT")
+        if "config" not in columns:    # ... or their config fingerprints (those topics are never matched)
+            self._db.execute("ALTER TABLE responses ADD COLUMN config TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses(last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_config ON responses(config, created)")
+        self._db.commit()
+
+    def get(self, key: str):
+        """
+        Return the cached text for `key`, or None on a miss / expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires = row
+            if expires <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return zlib.decompress(value).decode("utf-8")
+
+    def set(self, key: str, text: str, ttl: float = None, topic: str = None, config: str = None):
+        """
+        Store `text` under `key` for `ttl` seconds, then trim back under max_bytes.
+        `topic` and its `config` fingerprint make the entry findable by topics().
+        """
+        now = time.time()
+        value = zlib.compress(text.encode("utf-8"), 6)
+        expires = now + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, expires, last_access, topic, config) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, value, len(value), now, expires, now, topic, config),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM responses WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return row is not None
+
+    def topics(self, config: str, since: float = 0.0) -> list:
+        """
+        (key, topic, created) for live text entries made under the `config`
+        fingerprint and created after `since`, oldest first.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT key, topic, created FROM responses "
+                "WHERE config = ? AND created > ? AND expires > ? AND topic IS NOT NULL ORDER BY created",
+                (config, since, time.time()),
+            ).fetchall()
+
+    def _evict(self, now: float):
+        # Expired entries go first — they cost nothing to lose
+        cur = self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        self.expirations += max(cur.rowcount, 0)
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Counters plus current size — cheap enough to call on every page load.
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
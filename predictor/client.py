@@ -0,0 +1,111 @@
+"""
+POOLED ANTHROPIC CLIENT
+=======================
+One client per process instead of one per button click. Reusing the same
+httpx connection pool means the TCP + TLS handshake is paid once and later
+requests ride on kept-alive connections.
+
+HTTP/2 is switched on automatically when the optional `h2` package is
+installed (pip install "httpx[http2]").
+"""
+
+import importlib.util
+import threading
+import time
+
+import anthropic
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# A Streamlit replica rarely has more than a few dozen generations in flight
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=64,
+    max_keepalive_connections=16,
+    keepalive_expiry=60.0,
+)
+
+# Connect fast or fail fast; reads are long because a full paper takes a while
+DEFAULT_TIMEOUT = httpx.Timeout(connect=5.0, read=180.0, write=30.0, pool=10.0)
+
+HEALTH_PROBE_INTERVAL = 60.0    # seconds between network probes of a cached client
+HEALTH_PROBE_TIMEOUT = 3.0
+
+# What a broken pool or an unreachable host looks like to a caller: the SDK
+# wraps request errors, a stream that dies mid-read raises httpx's own
+TRANSPORT_ERRORS = (anthropic.APIConnectionError, httpx.TransportError)
+
+
+def build_http_client(limits: httpx.Limits = DEFAULT_LIMITS,
+                      timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+                      http2: bool = None, on_response=None) -> httpx.Client:
+    """
+    The shared transport: bounded pool, keep-alive, explicit timeouts.
+
+    `on_response(response)` sees every HTTP response, including the ones the
+    SDK goes on to retry — used to feed 429s back to admission control.
+    """
+    return httpx.Client(
+        limits=limits,
+        timeout=timeout,
+        http2=HTTP2_AVAILABLE if http2 is None else http2,
+        follow_redirects=True,
+        event_hooks={"response": [on_response]} if on_response else None,
+    )
+
+
+def build_client(api_key: str, base_url: str = None, http_client: httpx.Client = None,
+                 max_retries: int = 2, on_response=None) -> anthropic.Anthropic:
+    """
+    An Anthropic client on top of a pooled httpx client.
+    """
+    return anthropic.Anthropic(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client or build_http_client(on_response=on_response),
+        timeout=DEFAULT_TIMEOUT,
+        max_retries=max_retries,
+    )
+
+
+# =============================================================================
+# HEALTH CHECKS
+# =============================================================================
+
+_last_probe = {}
+_probe_lock = threading.Lock()
+
+
+def is_open(client: anthropic.Anthropic) -> bool:
+    """
+    The client's pool hasn't been closed. No network; safe on the request path.
+    """
+    return not client._client.is_closed     # the SDK keeps its httpx.Client here
+
+
+def is_healthy(client: anthropic.Anthropic, probe_interval: float = HEALTH_PROBE_INTERVAL) -> bool:
+    """
+    Liveness check for a cached client — blocking, so not for the request path.
+
+    Always checks the pool hasn't been closed; at most once per
+    `probe_interval` it also makes a HEAD request to the API host. Any HTTP
+    answer (even 404) counts as healthy — we only care that the host is
+    reachable over this pool.
+    """
+    if not is_open(client):
+        return False
+    http = client._client
+
+    now = time.monotonic()
+    with _probe_lock:
+        if now - _last_probe.get(id(client), 0.0) < probe_interval:
+            return True
+        _last_probe[id(client)] = now
+
+    try:
+        http.head(str(client.base_url), timeout=HEALTH_PROBE_TIMEOUT)
+    except httpx.TransportError:
+        with _probe_lock:
+            _last_probe.pop(id(client), None)
+        return False
+    return True
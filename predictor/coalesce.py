@@ -0,0 +1,64 @@
+"""
+SINGLE-FLIGHT — coalesce identical in-flight requests
+=====================================================
+When a big story breaks, dozens of sessions submit the same topic within
+seconds. The first caller for a key makes the upstream call; everyone who
+arrives while it is still running waits on the same Future and gets the
+same result (or the same exception). Nothing is remembered after the call
+finishes — that's the response cache's job.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0     # calls that actually went upstream
+        self.coalesced = 0   # calls that piggy-backed on someone else's
+
+    def do(self, key: str, fn, timeout: float = None):
+        """
+        Run `fn()` once per `key` at a time.
+
+        Returns (result, shared) where `shared` is True if this caller waited
+        on another caller's run instead of executing `fn` itself.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(timeout=timeout), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,713 @@
+"""
+GENERATION CORE — no Streamlit in here
+======================================
+Everything between "here is a topic (or screenshot)" and "here are the 10
+questions": response cache (exact and near-duplicate topics), single-flight,
+admission control, previous-year-question grounding, the upstream call
+(plain, streamed or sectional — with a deadline, retries, optional hedging
+and a circuit breaker), model tier and max_tokens routing, validation +
+repair, usage accounting and per-request telemetry. The Streamlit page, a worker pool or an HTTP
+service are all just callers.
+
+    generator = Generator.from_env(api_key)
+    result = generator.generate("RBI keeps repo rate unchanged")
+    future = generator.submit("Great Nicobar project")      # concurrent.futures
+    result = await generator.agenerate("DPDP rules")        # asyncio
+
+Nothing raises for expected failures — the GenerationResult says what went
+wrong in `error_kind` / `error`, so callers decide how to show it.
+
+UI hooks (all optional, called on the generating thread):
+- on_wait(position, estimated_seconds) while queued behind other sessions
+- on_progress(text_so_far) each time a streamed block is complete
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import anthropic
+
+from predictor.cache import DEFAULT_MAX_BYTES, DEFAULT_PATH, DEFAULT_TTL, ResponseCache, cache_key, config_fingerprint
+from predictor.client import TRANSPORT_ERRORS, build_client, is_healthy, is_open
+from predictor.coalesce import SingleFlight
+from predictor.images import HashIndex, ImageStats, PreparedImage
+from predictor.parser import OutputParser
+from predictor.pipeline import generate_sectional
+from predictor.prompts import SYSTEM_BLOCKS, SYSTEM_PROMPT
+from predictor.pyq import DEFAULT_K as PYQ_EXAMPLES, DEFAULT_PATH as PYQ_PATH, PYQIndex, few_shot, open_index
+from predictor.resilience import (OPEN, UPSTREAM_DEADLINE, CircuitBreaker, CircuitOpen, Deadline, DeadlineExceeded,
+                                  Hedger, RetryPolicy, call_with_retries, hedged)
+from predictor.routing import (CEILINGS, DETECTION, IMAGE, MAINS, MAX_TOKENS, MCQS, STANDARD, TEXT, TIERS, Route,
+                               Router, TokenBudget)
+from predictor.scheduler import AdmissionController, QueueTimeout
+from predictor.similarity import DEFAULT_THRESHOLD as SIMILAR_THRESHOLD, TopicIndex
+from predictor.telemetry import Telemetry
+from predictor.usage import UsageRecord, UsageTotals
+from predictor.validation import RepairStats, repair, repair_budget, validate
+
+MODEL = TIERS[STANDARD]
+
+# Reserved with admission control: the prompt (~4 chars/token) plus the
+# request's output budget; settled against real usage afterwards
+PROMPT_TOKENS = len(SYSTEM_PROMPT) // 4
+ESTIMATED_TOKENS = PROMPT_TOKENS + MAX_TOKENS     # with the fixed budget
+
+QUEUE_TIMEOUT = 180     # seconds in line before we give up (and keep the credit)
+DEFAULT_WORKERS = 32    # generations running at once in submit() / agenerate()
+DEFAULT_PENDING = 256   # waiting for a worker before submit() blocks
+TOPIC_SYNC_INTERVAL = 30    # seconds between picking up topics other processes cached
+DEGRADED_THRESHOLD = 0.5    # how loosely a topic may match a cached one while upstream is down
+
+IMAGE_INSTRUCTION = ("Read this news screenshot and generate 10 UPSC practice questions based on the "
+                     "topic/content shown. Follow the exact output format specified.")
+TOPIC_INSTRUCTION = "Generate 10 UPSC practice questions for this topic:\n\n{topic}\n\nFollow the exact output format specified."
+
+# error_kind values
+CAPACITY = "capacity"       # our own queue timed out
+OVERLOADED = "overloaded"   # upstream 429 / 529, or the circuit is open
+API_ERROR = "api"
+CONFIG = "config"           # no API key, client could not be built
+INTERNAL = "internal"
+
+
+class PoolFull(RuntimeError):
+    """
+    submit() could not get a slot in time — every worker busy and the queue full.
+    """
+
+
+@dataclass
+class GenerationResult:
+    text: str = None
+    usage: UsageRecord = None       # None for cache hits and coalesced followers (nothing was paid)
+    timings: dict = field(default_factory=dict)
+    error: str = None
+    error_kind: str = None
+
+    @property
+    def ok(self) -> bool:
+        return self.text is not None
+
+
+def build_request(topic: str = None, image: PreparedImage = None, examples: str = None) -> tuple:
+    """
+    (source, messages): the user content describing the topic — reused by the
+    sectional pipeline and repair calls — and the full single-call messages.
+    `examples` is a few-shot block of related past questions (predictor.pyq).
+    """
+    if image:
+        # Image input — already downscaled / recompressed by predictor.images.prepare
+        image_block = image.block()
+        source = [image_block, {"type": "text", "text": "The topic is the news shown in this screenshot."}]
+        messages = [{"role": "user", "content": [image_block, {"type": "text", "text": IMAGE_INSTRUCTION}]}]
+    else:
+        source = [{"type": "text", "text": f"Topic:\n\n{topic}"}]
+        instruction = TOPIC_INSTRUCTION.format(topic=topic)
+        if examples:
+            source.append({"type": "text", "text": examples})
+            instruction = f"{examples}\n\n{instruction}"
+        messages = [{"role": "user", "content": instruction}]
+    return source, messages
+
+
+def _timings(total: float, ttft: float = None, *, cached: bool = False, similar_to: str = None,
+             coalesced: bool = False, streamed: bool = False, queue_wait: float = 0.0,
+             repaired: int = 0, attempts: int = 0, hedged: bool = False, degraded: bool = False) -> dict:
+    return {
+        "ttft": total if ttft is None else ttft,
+        "total": total,
+        "cached": cached,
+        "similar_to": similar_to,       # the earlier topic a paraphrase was matched to
+        "coalesced": coalesced,
+        "streamed": streamed,
+        "queue_wait": queue_wait,
+        "repaired": repaired,
+        "attempts": attempts,           # upstream calls made, retries included (0: none)
+        "hedged": hedged,               # a duplicate request was raced against a slow one
+        "degraded": degraded,           # upstream was down; the closest cached paper was served instead
+    }
+
+
+class Generator:
+    """
+    One per process. Thread-safe; every shared structure inside is too.
+    """
+
+    def __init__(self, api_key: str = None, *, base_url: str = None, model: str = MODEL,
+                 max_tokens: int = MAX_TOKENS, cache: ResponseCache = None,
+                 controller: AdmissionController = None, queue_timeout: float = QUEUE_TIMEOUT,
+                 max_workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_PENDING,
+                 similar_threshold: float = SIMILAR_THRESHOLD, pyq: PYQIndex = None,
+                 pyq_examples: int = PYQ_EXAMPLES, telemetry: Telemetry = None,
+                 deadline: float = UPSTREAM_DEADLINE, retry_policy: RetryPolicy = None,
+                 breaker: CircuitBreaker = None, hedger: Hedger = None,
+                 degraded_threshold: float = DEGRADED_THRESHOLD, router: Router = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model                  # the standard tier; plans may route elsewhere (self.router)
+        self.max_tokens = max_tokens        # the ceiling; actual budgets adapt (self.router.budget)
+        self.router = router or Router(tiers=dict(TIERS, **{STANDARD: model}),
+                                       budget=TokenBudget(dict(CEILINGS, **{TEXT: max_tokens, IMAGE: max_tokens})))
+        self.queue_timeout = queue_timeout
+        self.pyq = pyq                      # None: no grounding, requests as before
+        self.pyq_examples = pyq_examples
+        self.deadline = deadline            # seconds for every attempt of one generation together
+        self.degraded_threshold = degraded_threshold
+
+        self.cache = cache or ResponseCache(":memory:")
+        self.controller = controller or AdmissionController()
+        self.single_flight = SingleFlight()
+        self.image_index = HashIndex(self.cache.path)     # shared with every process on this cache file
+        self.similar_threshold = similar_threshold          # above 1.0 turns matching off
+        self.topic_indexes = {}         # config fingerprint → TopicIndex of the topics answered under it
+        self._topics_synced = {}        # config fingerprint → (newest row seen, last checked)
+        self._topics_lock = threading.Lock()
+        self.image_stats = ImageStats()
+        self.repair_stats = RepairStats()
+        self.usage_totals = UsageTotals()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedger = hedger or Hedger()    # off unless asked for: a duplicate costs input tokens
+        self.telemetry = telemetry or Telemetry(None)      # default: metrics only, no event file
+        self.telemetry.add_gauges(self._gauges)
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._retired = []              # (replaced client, when) — closed once nothing can still be using them
+        self._probing = False
+
+        # Bounded: max_workers run, up to max_pending more wait, then submit() pushes back
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generate")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    @classmethod
+    def from_env(cls, api_key: str = None, **overrides) -> "Generator":
+        """
+        Configure from UPSC_* environment variables (same names the app has always used).
+        """
+        env = os.environ.get
+        options = dict(
+            api_key=api_key or env("ANTHROPIC_API_KEY"),
+            cache=ResponseCache(
+                path=env("UPSC_CACHE_PATH", DEFAULT_PATH),
+                max_bytes=int(env("UPSC_CACHE_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+                default_ttl=float(env("UPSC_CACHE_TTL_HOURS", DEFAULT_TTL / 3600)) * 3600,
+            ),
+            controller=AdmissionController(
+                max_concurrency=int(env("UPSC_MAX_CONCURRENCY", 8)),
+                requests_per_min=float(env("UPSC_REQUESTS_PER_MIN", 50)),
+                tokens_per_min=float(env("UPSC_TOKENS_PER_MIN", 200_000)),
+            ),
+            max_workers=int(env("UPSC_WORKERS", DEFAULT_WORKERS)),
+            similar_threshold=float(env("UPSC_SIMILAR_THRESHOLD", SIMILAR_THRESHOLD)),
+            pyq=open_index(env("UPSC_PYQ_INDEX", PYQ_PATH)),
+            pyq_examples=int(env("UPSC_PYQ_EXAMPLES", PYQ_EXAMPLES)),
+            telemetry=Telemetry.from_env(),
+            deadline=float(env("UPSC_DEADLINE", UPSTREAM_DEADLINE)),
+            retry_policy=RetryPolicy(max_attempts=int(env("UPSC_RETRY_ATTEMPTS", RetryPolicy().max_attempts))),
+            breaker=CircuitBreaker(
+                failure_threshold=int(env("UPSC_BREAKER_FAILURES", CircuitBreaker().failure_threshold)),
+                reset_timeout=float(env("UPSC_BREAKER_RESET", CircuitBreaker().reset_timeout)),
+            ),
+            hedger=Hedger(enabled=env("UPSC_HEDGE", "off").lower() in ("1", "on", "true", "yes")),
+            router=Router.from_env(),
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    # -------------------------------------------------------------------------
+    # CLIENT
+    # -------------------------------------------------------------------------
+
+    def client(self) -> anthropic.Anthropic:
+        """
+        The pooled client, rebuilt if its pool was closed. No network here:
+        after a transport error, check_client() probes it in the background.
+        """
+        with self._client_lock:
+            self._close_retired()
+            if self._client is None or not is_open(self._client):
+                self._client = self._build_client()
+            return self._client
+
+    def _build_client(self) -> anthropic.Anthropic:
+        controller = self.controller
+        # Retries happen in predictor.resilience, inside the generation's deadline
+        return build_client(
+            self.api_key, base_url=self.base_url, max_retries=0,
+            on_response=lambda response: controller.observe_response(response.status_code, response.headers),
+        )
+
+    def check_client(self, client: anthropic.Anthropic):
+        """
+        A call through `client` failed in transport: probe it on a background
+        thread (one probe at a time) and swap in a new client if it is dead.
+        """
+        with self._client_lock:
+            if self._probing or client is not self._client:
+                return
+            self._probing = True
+        threading.Thread(target=self._probe_client, args=(client,), name="client-probe", daemon=True).start()
+
+    def _probe_client(self, client: anthropic.Anthropic):
+        healthy = False
+        try:
+            healthy = is_healthy(client)
+        finally:
+            with self._client_lock:
+                self._probing = False
+                if not healthy and client is self._client:
+                    # Requests other threads started on the old pool finish there
+                    self._client = self._build_client()
+                    self._retired.append((client, time.monotonic()))
+
+    def _close_retired(self):
+        # A generation holds its client from before admission to its deadline at most
+        grace = self.queue_timeout + self.deadline
+        now = time.monotonic()
+        while self._retired and now - self._retired[0][1] > grace:
+            self._retired.pop(0)[0].close()
+
+    # -------------------------------------------------------------------------
+    # SYNC API
+    # -------------------------------------------------------------------------
+
+    def _setup(self, topic: str = None, image: PreparedImage = None, plan: str = None) -> dict:
+        # The questions' model is part of the key, the adaptive budget isn't (it only trims unused room)
+        return dict(system_prompt=SYSTEM_PROMPT, model=self.router.model(self.router.route(plan).paper),
+                    max_tokens=self.max_tokens,
+                    context=self._grounded(topic, image) and f"pyq:{self.pyq.fingerprint}:{self.pyq_examples}")
+
+    def key(self, topic: str = None, image: PreparedImage = None, plan: str = None) -> str:
+        image_hash = image and self.image_index.canonical(image.phash, image.detail_hash)
+        return cache_key(topic, image_hash=image_hash, **self._setup(topic, image, plan))
+
+    def config(self, topic: str = None, image: PreparedImage = None, plan: str = None) -> str:
+        """
+        The fingerprint a cached topic must share with this request to stand
+        in for it by similarity; None for screenshots (exact hash only).
+        """
+        if image is not None or not topic:
+            return None
+        return config_fingerprint(**self._setup(topic, image, plan))
+
+    def _grounded(self, topic: str = None, image: PreparedImage = None) -> bool:
+        # Screenshots aren't grounded: their topic is only known once the model has read them
+        return self.pyq is not None and self.pyq_examples > 0 and bool(topic) and image is None
+
+    def request(self, topic: str = None, image: PreparedImage = None) -> tuple:
+        """
+        build_request() with the related past questions filled in, when there is a PYQ index.
+        """
+        examples = None
+        if self._grounded(topic, image):
+            examples = few_shot(self.pyq.search(topic, self.pyq_examples))
+        return build_request(topic, image, examples)
+
+    def cached(self, topic: str = None, image: PreparedImage = None, *, request_id: str = None,
+               session_id: str = "", plan: str = None) -> GenerationResult:
+        """
+        The cached answer as a result, or None. Cheap enough to call from an event loop.
+        """
+        started = time.perf_counter()
+        text, similar_to = self._lookup(self.key(topic, image, plan), topic, self.config(topic, image, plan))
+        if text is None:
+            return None
+        result = GenerationResult(text=text, timings=_timings(time.perf_counter() - started, cached=True,
+                                                              similar_to=similar_to))
+        self.telemetry.generation(result, request_id=request_id, session_id=session_id, image=image, plan=plan,
+                                  model=self.router.model(self.router.route(plan).paper))
+        return result
+
+    def _lookup(self, key: str, topic: str = None, config: str = None) -> tuple:
+        """
+        (text, matched earlier topic or None) from the cache — by exact key,
+        then, for text topics, by similarity to a topic already answered
+        under the same `config` (prompt, model, max_tokens, PYQ context).
+        """
+        text = self.cache.get(key)
+        if text is not None or not topic or config is None:
+            return text, None
+        index = self._topic_index(config)
+        match = index.lookup(topic)
+        if match is None or match.key == key:
+            return None, None
+        text = self.cache.get(match.key)
+        if text is None:
+            index.remove(match.key)         # expired or evicted since it was indexed
+            return None, None
+        return text, match.topic
+
+    def _topic_index(self, config: str) -> TopicIndex:
+        # Picks up topics cached under `config` by other processes (pregenerate.py,
+        # other replicas). Throttled: the SELECT is cheap but not per-keystroke cheap.
+        now = time.monotonic()
+        with self._topics_lock:
+            index = self.topic_indexes.get(config)
+            if index is None:
+                index = self.topic_indexes[config] = TopicIndex(self.similar_threshold)
+            since, checked = self._topics_synced.get(config, (0.0, None))
+            if checked is None or now - checked >= TOPIC_SYNC_INTERVAL:
+                for key, topic, created in self.cache.topics(config, since):
+                    index.add(topic, key)
+                    since = created
+                self._topics_synced[config] = (since, now)
+            return index
+
+    def _store(self, key: str, text: str, topic: str = None, config: str = None):
+        self.cache.set(key, text, topic=topic, config=config)
+        if topic and config:
+            self._topic_index(config).add(topic, key)
+
+    def generate(self, topic: str = None, image: PreparedImage = None, *, stream: bool = False,
+                 pipeline: bool = False, session_id: str = "", request_id: str = None, plan: str = None,
+                 on_wait=None, on_progress=None) -> GenerationResult:
+        """
+        Generate (or fetch from cache) the 10 questions for a topic or a screenshot.
+
+        With stream=True the answer is read as a stream and on_progress sees
+        each completed block. With pipeline=True it is generated as
+        detection → (MCQs ∥ MAINS) instead of one long call (not streamed).
+        `request_id` tags the telemetry event (the page uses the click's
+        idempotency key, so the credit outcome can be joined to it).
+        `plan` picks the model tiers (predictor.routing); None is the default plan.
+        """
+        route = self.router.route(plan)
+        result = self._generate(topic, image, stream=stream, pipeline=pipeline, session_id=session_id,
+                                plan=plan, route=route, on_wait=on_wait, on_progress=on_progress)
+        self.telemetry.generation(result, request_id=request_id, session_id=session_id, image=image, plan=plan,
+                                  model=self.router.model(route.paper),
+                                  mode="pipeline" if pipeline else "stream" if stream else "plain")
+        return result
+
+    def _generate(self, topic: str, image: PreparedImage, *, stream: bool, pipeline: bool,
+                  session_id: str, plan: str, route: Route, on_wait, on_progress) -> GenerationResult:
+        started = time.perf_counter()
+
+        # Repeat (or reworded) topics are served from the on-disk cache — no API call at all
+        key, config = self.key(topic, image, plan), self.config(topic, image, plan)
+        cached, similar_to = self._lookup(key, topic, config)
+        if cached is not None:
+            return GenerationResult(text=cached, timings=_timings(time.perf_counter() - started, cached=True,
+                                                                  similar_to=similar_to))
+
+        if not self.api_key:
+            return GenerationResult(error="API key not configured. Please add ANTHROPIC_API_KEY to secrets.",
+                                    error_kind=CONFIG)
+        # Fail fast while upstream is known to be down, rather than queue for a call that won't work
+        if self.breaker.state == OPEN:
+            return self._degraded(topic, config, started)
+        try:
+            client = self.client()
+        except Exception as e:
+            return GenerationResult(error=f"Error initializing API: {str(e)}", error_kind=CONFIG)
+
+        source, messages = self.request(topic, image)
+        queue_wait = 0.0
+        trace = {"attempts": 0, "hedged": False}
+        budget = self.router.budget
+        if pipeline:
+            budgets = {task: budget.max_tokens(task) for task in (DETECTION, MCQS, MAINS)}
+        else:
+            budgets = {IMAGE if image else TEXT: budget.max_tokens(IMAGE if image else TEXT)}
+
+        def call_upstream():
+            nonlocal queue_wait
+            controller = self.controller
+            ticket = controller.acquire(
+                session_id, PROMPT_TOKENS + sum(budgets.values()), timeout=self.queue_timeout,
+                on_wait=on_wait and (lambda t: on_wait(controller.position(t), controller.estimated_wait(t))),
+            )
+            queue_wait = ticket.queue_wait
+
+            usage = None
+            deadline = Deadline(self.deadline)
+            try:
+                output, usage, ttft = self._call(client, source, messages, started, deadline, trace, route,
+                                                 budgets, session_id, stream=stream, pipeline=pipeline,
+                                                 on_progress=on_progress)
+                output, usage, repaired, complete = self._validate(client, source, output, usage, deadline, trace,
+                                                                   route, session_id)
+            finally:
+                controller.release(ticket, usage and usage.total_input_tokens + usage.output_tokens)
+
+            self.usage_totals.add(usage)
+            # Only cache complete answers — a truncated paper shouldn't be replayed
+            # (written before followers are released, so late arrivals hit the cache)
+            if complete:
+                self._store(key, output, None if image else topic, config)
+            return output, ttft, repaired, usage
+
+        # Call Claude API — or join an identical call another session already started
+        try:
+            (output, ttft, repaired, usage), shared = self.single_flight.do(key, call_upstream)
+        except QueueTimeout:
+            return GenerationResult(error="We're at full capacity right now.", error_kind=CAPACITY)
+        except CircuitOpen:
+            return self._degraded(topic, config, started)
+        except DeadlineExceeded:
+            return GenerationResult(error="The AI service took too long to answer.", error_kind=API_ERROR)
+        except (anthropic.RateLimitError, anthropic.InternalServerError) as e:
+            if isinstance(e, anthropic.RateLimitError) or e.status_code == 529:
+                return GenerationResult(error="The AI service is overloaded right now.", error_kind=OVERLOADED)
+            return GenerationResult(error=f"API Error: {str(e)}", error_kind=API_ERROR)
+        except TRANSPORT_ERRORS as e:
+            self.check_client(client)
+            return GenerationResult(error=f"API Error: {str(e)}", error_kind=API_ERROR)
+        except anthropic.APIError as e:
+            return GenerationResult(error=f"API Error: {str(e)}", error_kind=API_ERROR)
+        except Exception as e:
+            return GenerationResult(error=f"Error: {str(e)}", error_kind=INTERNAL)
+
+        total = time.perf_counter() - started
+        return GenerationResult(
+            text=output,
+            usage=None if shared else usage,
+            timings=_timings(
+                total, None if shared else ttft, coalesced=shared,
+                streamed=stream and not pipeline and not shared,
+                queue_wait=queue_wait, repaired=repaired,
+                attempts=0 if shared else trace["attempts"], hedged=not shared and trace["hedged"],
+            ),
+        )
+
+    def _degraded(self, topic: str, config: str, started: float) -> GenerationResult:
+        """
+        Upstream is down (circuit open): the closest paper cached under the
+        same config on a looser match than usual, or fail fast. Exact hits
+        were already tried. `config` is None for screenshots.
+        """
+        if topic and config is not None:
+            match = self._topic_index(config).lookup(topic, threshold=self.degraded_threshold)
+            text = match and self.cache.get(match.key)
+            if text is not None:
+                return GenerationResult(text=text, timings=_timings(
+                    time.perf_counter() - started, cached=True, similar_to=match.topic, degraded=True))
+        return GenerationResult(error="The AI service is unavailable right now. Please try again in a minute.",
+                                error_kind=OVERLOADED)
+
+    def ingest(self, topic: str, message) -> GenerationResult:
+        """
+        Take a paper produced outside generate() — e.g. by the Message Batches
+        API — through the same validation, repair, accounting and caching.
+        """
+        started = time.perf_counter()
+        text = message.content[0].text if message.content else ""
+        usage = UsageRecord.from_message(message)
+        self.router.budget.observe(TEXT, usage.output_tokens, usage.stop_reason)
+        try:
+            source, _ = self.request(topic)
+            text, usage, repaired, complete = self._validate(self.client(), source, text, usage)
+        except Exception as e:
+            result = GenerationResult(error=f"Error: {str(e)}", error_kind=INTERNAL, usage=usage)
+        else:
+            self.usage_totals.add(usage)
+            if complete:
+                self._store(self.key(topic), text, topic, self.config(topic))
+                result = GenerationResult(text=text, usage=usage,
+                                          timings=_timings(time.perf_counter() - started, repaired=repaired))
+            else:
+                result = GenerationResult(error=f"incomplete paper (stop reason {usage.stop_reason})",
+                                          error_kind=API_ERROR, usage=usage)
+        self.telemetry.generation(result, model=self.router.model(self.router.route(None).paper), mode="batch")
+        return result
+
+    def _resilient(self, create, deadline: Deadline, trace: dict):
+        """
+        `create` (messages.create) with retries inside the deadline, for the
+        sectional pipeline and repairs — calls that are not hedged.
+        """
+        def call(**params):
+            response, attempts = call_with_retries(lambda timeout: create(timeout=timeout, **params),
+                                                   deadline=deadline, policy=self.retry_policy, breaker=self.breaker)
+            trace["attempts"] += attempts
+            return response
+        return call
+
+    def _record(self, tier: str, task: str, seconds: float, usage: UsageRecord, max_tokens: int, session_id: str):
+        """
+        One upstream call: feeds the adaptive budget for its kind and the per-tier telemetry.
+        """
+        if task in self.router.budget.ceilings:
+            self.router.budget.observe(task, usage.output_tokens, usage.stop_reason)
+        self.telemetry.call(tier=tier, task=task, seconds=seconds, usage=usage, max_tokens=max_tokens,
+                            session_id=session_id)
+
+    def _call(self, client, source: list, messages: list, started: float, deadline: Deadline, trace: dict,
+              route: Route, budgets: dict, session_id: str, *, stream: bool, pipeline: bool, on_progress) -> tuple:
+        """
+        One paper from upstream. Returns (text, usage, seconds to first token or None).
+        `budgets` is max_tokens per kind of call (predictor.routing).
+        """
+        # Prompt caching is still a beta surface in this SDK version
+        api = client.beta.prompt_caching.messages
+        model = self.router.model(route.paper)
+        if pipeline:
+            result = generate_sectional(self._resilient(api.create, deadline, trace), source,
+                                        model=model, detection_model=self.router.model(route.detection),
+                                        system=SYSTEM_BLOCKS, detection_tokens=budgets[DETECTION],
+                                        mcq_tokens=budgets[MCQS], mains_tokens=budgets[MAINS])
+            records = [UsageRecord.from_message(r) for r in result.responses]
+            for task, tier, record in zip((DETECTION, MCQS, MAINS), (route.detection, route.paper, route.paper),
+                                          records):
+                self._record(tier, task, result.timings[task], record, budgets[task], session_id)
+            return result.text, UsageRecord.combine(records), None
+
+        kind, = budgets
+        max_tokens = budgets[kind]
+
+        def plain(lane, timeout):
+            response = api.create(model=model, max_tokens=max_tokens,
+                                  system=SYSTEM_BLOCKS, messages=messages, timeout=timeout)
+            return response.content[0].text, UsageRecord.from_message(response), None
+
+        def streamed(lane, timeout):
+            output = ""
+            ttft = None
+            parser = OutputParser()
+            with api.stream(model=model, max_tokens=max_tokens,
+                            system=SYSTEM_BLOCKS, messages=messages, timeout=timeout) as response_stream:
+                lane.on_cancel = response_stream.close
+                for chunk in response_stream.text_stream:
+                    lane.check()
+                    deadline.check()
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                        lane.first_token()
+                    output += chunk
+                    # Only report when a block (detection / an MCQ / a MAINS) has just finished
+                    completed = parser.feed(chunk)
+                    if completed:
+                        lane.progress(output[:completed[-1].end])
+                final = response_stream.get_final_message()
+            return output, UsageRecord.from_message(final), ttft
+
+        call = streamed if stream else plain
+
+        def attempt(timeout):
+            trace["attempts"] += 1
+            result, duplicate = hedged(lambda lane: call(lane, timeout), kind="stream" if stream else "plain",
+                                       hedger=self.hedger, on_progress=on_progress,
+                                       allow_hedge=lambda: self.breaker.state != OPEN)
+            if duplicate:
+                trace["hedged"] = True
+                trace["attempts"] += 1
+            return result
+
+        called = time.perf_counter()
+        result, _ = call_with_retries(attempt, deadline=deadline, policy=self.retry_policy, breaker=self.breaker)
+        self._record(route.paper, kind, time.perf_counter() - called, result[1], max_tokens, session_id)
+        return result
+
+    def _validate(self, client, source: list, output: str, usage: UsageRecord, deadline: Deadline = None,
+                  trace: dict = None, route: Route = None, session_id: str = "") -> tuple:
+        """
+        Check the paper; re-ask for just the broken questions.
+        Returns (text, usage, questions repaired, complete).
+        """
+        complete = usage.stop_reason == "end_turn"
+        report = validate(output)
+        if not report.to_repair:
+            self.repair_stats.record(False)
+            return output, usage, 0, complete
+
+        tier = route.paper if route else STANDARD
+        create = client.beta.prompt_caching.messages.create
+        if deadline is not None:
+            create = self._resilient(create, deadline, trace)
+        called = time.perf_counter()
+        try:
+            output, repaired, repair_response = repair(create, source, output, report,
+                                                       model=self.router.model(tier), system=SYSTEM_BLOCKS)
+        except (anthropic.APIError, CircuitOpen):
+            return output, usage, 0, False  # keep the partial paper rather than fail the whole request
+
+        repair_usage = UsageRecord.from_message(repair_response)
+        self._record(tier, "repair", time.perf_counter() - called, repair_usage, repair_budget(report), session_id)
+        complete = not validate(output).to_repair
+        self.repair_stats.record(True, repaired, still_broken=not complete,
+                                 repair_tokens=repair_usage.output_tokens, full_tokens=usage.output_tokens)
+        return output, UsageRecord.combine([usage, repair_usage]), repaired, complete
+
+    # -------------------------------------------------------------------------
+    # POOLED / ASYNC API
+    # -------------------------------------------------------------------------
+
+    def submit(self, topic: str = None, image: PreparedImage = None, *, timeout: float = None, **options):
+        """
+        Run generate() on the worker pool; returns a concurrent.futures.Future.
+
+        Blocks while the pool and its queue are full; raises PoolFull if
+        that lasts longer than `timeout` seconds.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolFull("generation pool is full")
+        try:
+            future = self._executor.submit(self.generate, topic, image, **options)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def agenerate(self, topic: str = None, image: PreparedImage = None, *,
+                        timeout: float = None, **options) -> GenerationResult:
+        """
+        asyncio front end to the same pool. Waiting for a slot happens off the
+        event loop, so a full pool slows callers down instead of blocking the loop.
+        """
+        future = await asyncio.to_thread(self.submit, topic, image, timeout=timeout, **options)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            "cache": self.cache.stats(),
+            "admission": self.controller.stats(),
+            "coalescing": self.single_flight.stats(),
+            "repair": self.repair_stats.snapshot(),
+            "images": self.image_stats.snapshot(),
+            "similar_topics": self._topic_stats(),
+            "pyq": self.pyq and self.pyq.stats(),
+            "usage": self.usage_totals.snapshot(),
+            "routing": self.router.stats(),
+            "telemetry": self.telemetry.stats(),
+            "resilience": {"breaker": self.breaker.stats(), "hedging": self.hedger.stats(),
+                           "deadline": self.deadline, "max_attempts": self.retry_policy.max_attempts},
+        }
+
+    def _topic_stats(self) -> dict:
+        with self._topics_lock:
+            indexes = list(self.topic_indexes.values())
+        totals = {"configs": len(indexes), "topics": 0, "lookups": 0, "matches": 0, "conflicts": 0}
+        for stats in (index.stats() for index in indexes):
+            for name in ("topics", "lookups", "matches", "conflicts"):
+                totals[name] += stats[name]
+        totals["match_rate"] = totals["matches"] / totals["lookups"] if totals["lookups"] else 0.0
+        return totals
+
+    def _gauges(self) -> dict:
+        admission = self.controller.stats()
+        return {
+            "upsc_admission_active": ("Upstream generations in flight.", admission["active"]),
+            "upsc_admission_queued": ("Generations waiting for admission.", admission["queued"]),
+            "upsc_admission_paused_seconds": ("Remaining upstream back-off pause.", round(admission["paused_for"], 3)),
+            "upsc_circuit_open": ("1 while the upstream circuit breaker is open (failing fast).",
+                                  int(self.breaker.state == OPEN)),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.telemetry.close()
+        with self._client_lock:
+            for client, _ in self._retired:
+                client.close()
+            if self._client is not None:
+                self._client.close()
+        self.image_index.close()
+        self.cache.close()
+        if self.pyq is not None:
+            self.pyq.close()
@@ -0,0 +1,554 @@
+"""
+EXPORTS — a paper as PDF, Word and flashcards, built once and kept on disk
+==========================================================================
+The page used to offer the raw text only. Printable and flashcard copies
+are built here, off the script thread and at most once per paper:
+
+    exports = ExportStore()
+    artifact = exports.get(output, "pdf", title)        # on disk already? (no work)
+    artifact = exports.request(output, "pdf", title).result()   # build in the pool
+    with artifact.open() as f: ...                      # or artifact.chunks() to stream it
+
+- Formats (FORMATS): "pdf" (A4, printable, answer key at the end), "docx"
+  (Word / Google Docs), "csv" (front, back, tags — spreadsheets, Quizlet)
+  and "anki" (tab-separated with Anki's import headers, one note per
+  question). All are written with the standard library only.
+- Artifacts are keyed by SHA-256 over the format, title and output text,
+  so a rerun, a re-opened paper or another session asking for the same
+  paper gets the file that is already there; requests for a file still
+  being built share one build.
+- Files live in one directory (UPSC_EXPORTS) whose total size is bounded
+  (UPSC_EXPORT_MAX_MB); least-recently-used files are removed first.
+- Nothing is held in memory once written: callers read the file (or
+  stream it in chunks) when they send it.
+
+The PDF uses the standard Helvetica fonts, which cover Windows-1252 only:
+emoji labels are dropped and other characters outside it print as "?".
+The Word and flashcard files keep every character.
+"""
+
+import csv
+import hashlib
+import html
+import io
+import os
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from xml.sax.saxutils import escape as xml_escape
+
+from predictor.parser import parse
+
+DEFAULT_DIR = os.path.join(".cache", "exports")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024   # 256 MB of built files
+DEFAULT_WORKERS = 2
+CHUNK_SIZE = 64 * 1024                  # bytes per chunk when streaming a file out
+
+# Outline styles, shared by the PDF and Word writers
+TITLE, SUBTITLE, SECTION, HEADING, TEXT, ITEM = "title", "subtitle", "section", "heading", "text", "item"
+
+
+# =============================================================================
+# OUTLINE — the paper as styled blocks, whatever the format
+# =============================================================================
+
+def outline(output: str, title: str = None) -> list:
+    """
+    [(style, text)] for a printable paper: questions first, then the answer
+    key and Mains frameworks, so it can be attempted before it is checked.
+    """
+    parsed = parse(output)
+    detection = parsed.detection
+    blocks = [(TITLE, title or (detection and detection.primary_topic) or "UPSC Practice Paper")]
+    if detection is not None:
+        facts = " · ".join(v for v in (detection.primary_topic if title else None, detection.subject,
+                                        detection.paper) if v)
+        if facts:
+            blocks.append((SUBTITLE, facts))
+        blocks += [(ITEM, angle) for angle in detection.angles]
+    if not parsed.mcqs and not parsed.mains:
+        # Nothing recognisable as questions: print the text as it came
+        return blocks + [(TEXT, output.strip())]
+
+    if parsed.mcqs:
+        blocks.append((SECTION, "Section A — Prelims MCQs"))
+        for mcq in parsed.mcqs:
+            blocks += [(HEADING, f"MCQ {mcq.number}"), (TEXT, mcq.question)]
+    if parsed.mains:
+        blocks.append((SECTION, "Section B — Mains"))
+        for mains in parsed.mains:
+            blocks += [(HEADING, f"Mains {mains.number}"), (TEXT, mains.question or "")]
+
+    if parsed.mcqs:
+        blocks.append((SECTION, "Answer key"))
+        for mcq in parsed.mcqs:
+            blocks.append((HEADING, f"MCQ {mcq.number} — {mcq.answer or '—'}"))
+            if mcq.explanation:
+                blocks.append((TEXT, mcq.explanation))
+            if mcq.trap:
+                blocks.append((TEXT, f"Trap: {mcq.trap}"))
+    if parsed.mains:
+        blocks.append((SECTION, "Mains answer frameworks"))
+        for mains in parsed.mains:
+            blocks.append((HEADING, f"Mains {mains.number}"))
+            blocks += [(ITEM, step) for step in mains.framework]
+            if mains.must_include:
+                blocks.append((TEXT, "Must include: " + "; ".join(mains.must_include)))
+            if mains.traps_to_avoid:
+                blocks.append((TEXT, "Avoid: " + "; ".join(mains.traps_to_avoid)))
+            if mains.conclude_with:
+                blocks.append((TEXT, f"Conclude with: {mains.conclude_with}"))
+    return blocks
+
+
+def flashcards(output: str) -> list:
+    """
+    [(front, back, tags)] — one card per question, answer and reasoning on the back.
+    """
+    parsed = parse(output)
+    detection = parsed.detection
+    common = ["upsc"] + [v for v in (detection and detection.subject, detection and detection.paper) if v]
+    cards = []
+    for mcq in parsed.mcqs:
+        back = [f"Answer: {mcq.answer or '—'}"]
+        if mcq.explanation:
+            back.append(mcq.explanation)
+        if mcq.trap:
+            back.append(f"Trap: {mcq.trap}")
+        cards.append((mcq.question, "\n".join(back), [*common, "mcq", *filter(None, [mcq.archetype])]))
+    for mains in parsed.mains:
+        back = [f"{n}. {step}" for n, step in enumerate(mains.framework, 1)]
+        if mains.must_include:
+            back.append("Must include: " + "; ".join(mains.must_include))
+        if mains.conclude_with:
+            back.append(f"Conclude with: {mains.conclude_with}")
+        cards.append((mains.question or "", "\n".join(back), [*common, "mains", *filter(None, [mains.archetype])]))
+    return cards
+
+
+# =============================================================================
+# PDF — A4, standard Helvetica, one content stream per page
+# =============================================================================
+
+PAGE_WIDTH, PAGE_HEIGHT = 595.28, 841.89        # A4 in points
+MARGIN = 56.0
+
+# style → (font, size, indent, space before)
+_PDF_STYLES = {
+    TITLE: ("F2", 17.0, 0.0, 0.0),
+    SUBTITLE: ("F1", 10.0, 0.0, 2.0),
+    SECTION: ("F2", 13.0, 0.0, 18.0),
+    HEADING: ("F2", 10.5, 0.0, 10.0),
+    TEXT: ("F1", 10.5, 0.0, 2.0),
+    ITEM: ("F1", 10.5, 14.0, 1.0),
+}
+LEADING = 1.35                  # line height, × font size
+
+# Helvetica advance widths (1/1000 em) for " " through "~"; the rest of Windows-1252 is taken as 556
+_HELVETICA = [int(w) for w in (
+    "278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+    "278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778 667 778 722 667 "
+    "611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556 556 222 222 500 222 833 "
+    "556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584"
+).split()]
+_BOLD = 1.08                    # Helvetica-Bold is a little wider; close enough for line breaking
+
+# Common characters in papers that Windows-1252 lacks
+_PDF_SUBSTITUTES = str.maketrans({
+    "₹": "Rs ", "≤": "<=", "≥": ">=", "≠": "!=", "→": "->", "←": "<-", "✓": "", "✔": "", "✅": "",
+    "⚠": "", "❌": "", "️": "", "═": "=", "─": "-", "━": "-", "┌": "", "├": "", "└": "", "│": "",
+})
+
+
+def _pdf_encode(text: str) -> bytes:
+    text = text.translate(_PDF_SUBSTITUTES)
+    return "".join(c if ord(c) < 0x2000 or c in "–—‘’“”•…€™" else "" for c in text).encode("cp1252", "replace")
+
+
+def _width(data: bytes, size: float, font: str) -> float:
+    units = sum(_HELVETICA[b - 32] if 32 <= b <= 126 else 556 for b in data)
+    return units * size / 1000 * (_BOLD if font == "F2" else 1.0)
+
+
+def _wrap(data: bytes, size: float, font: str, width: float) -> list:
+    lines, line = [], b""
+    for word in data.split(b" "):
+        candidate = line + b" " + word if line else word
+        if _width(candidate, size, font) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        # A single word wider than the line (a URL): break it wherever it fills the line
+        while _width(word, size, font) > width:
+            cut = max(next(i for i in range(1, len(word) + 1) if _width(word[:i], size, font) > width) - 1, 1)
+            lines.append(word[:cut])
+            word = word[cut:]
+        line = word
+    lines.append(line)
+    return lines
+
+
+def _pdf_string(data: bytes) -> bytes:
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def build_pdf(output: str, title: str = None) -> bytes:
+    pages, ops = [], []
+    y = PAGE_HEIGHT - MARGIN
+
+    def new_page():
+        nonlocal ops, y
+        if ops:
+            pages.append(ops)
+        ops, y = [], PAGE_HEIGHT - MARGIN
+
+    for style, text in outline(output, title):
+        font, size, indent, before = _PDF_STYLES[style]
+        leading = size * LEADING
+        y -= before
+        # A heading keeps at least one line of what follows on its page
+        if y - leading * (2 if style in (SECTION, HEADING) else 1) < MARGIN:
+            new_page()
+        grey = style == SUBTITLE
+        for paragraph in text.splitlines() or [""]:
+            data = _pdf_encode(paragraph.strip())
+            if style == ITEM:
+                data = "• ".encode("cp1252") + data
+            for line in _wrap(data, size, font, PAGE_WIDTH - 2 * MARGIN - indent):
+                if y - leading < MARGIN:
+                    new_page()
+                y -= leading
+                ops.append(b"BT %s/%s %g Tf %.2f %.2f Td %s Tj ET%s" % (
+                    b"0.35 g " if grey else b"", font.encode(), size, MARGIN + indent, y + size * 0.25,
+                    _pdf_string(line), b" 0 g" if grey else b""))
+    new_page()
+
+    # Objects: 1 catalog, 2 page tree, 3-4 fonts, 5 info, then a page and its content stream per page
+    objects = [None, None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+               b"<< /Title %s /Producer (UPSC Predictor) >>" % _pdf_string(_pdf_encode(title or "UPSC Practice Paper"))]
+    kids = []
+    for number, page_ops in enumerate(pages, 1):
+        footer = b"BT /F1 8 Tf 0.5 g %.2f %.2f Td (%d) Tj ET" % (PAGE_WIDTH / 2 - 4, MARGIN / 2, number)
+        stream = zlib.compress(b"\n".join(page_ops + [footer]), 6)
+        page_id, content_id = len(objects) + 1, len(objects) + 2
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] "
+                       b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                       % (PAGE_WIDTH, PAGE_HEIGHT, content_id))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(b"%d 0 R" % page_id)
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+# =============================================================================
+# DOCX — the three parts Word needs, direct formatting instead of a styles part
+# =============================================================================
+
+# style → (run properties, paragraph properties)
+_DOCX_STYLES = {
+    TITLE: ('<w:b/><w:sz w:val="34"/>', '<w:spacing w:after="120"/>'),
+    SUBTITLE: ('<w:color w:val="595959"/><w:sz w:val="20"/>', '<w:spacing w:after="120"/>'),
+    SECTION: ('<w:b/><w:sz w:val="26"/>', '<w:keepNext/><w:spacing w:before="360" w:after="120"/>'),
+    HEADING: ('<w:b/><w:sz w:val="21"/>', '<w:keepNext/><w:spacing w:before="200" w:after="40"/>'),
+    TEXT: ('<w:sz w:val="21"/>', '<w:spacing w:after="60"/>'),
+    ITEM: ('<w:sz w:val="21"/>', '<w:ind w:left="360" w:hanging="200"/><w:spacing w:after="20"/>'),
+}
+
+_DOCX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="word/document.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+}
+
+# Characters XML 1.0 does not allow at all
+_XML_INVALID = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+
+def _docx_paragraph(style: str, text: str) -> str:
+    run, paragraph = _DOCX_STYLES[style]
+    lines = [xml_escape(line.strip().translate(_XML_INVALID)) for line in text.splitlines() or [""]]
+    if style == ITEM:
+        lines[0] = "•\t" + lines[0]
+    body = "<w:br/>".join(f'<w:t xml:space="preserve">{line}</w:t>' for line in lines)
+    return f"<w:p><w:pPr>{paragraph}</w:pPr><w:r><w:rPr>{run}</w:rPr>{body}</w:r></w:p>"
+
+
+def build_docx(output: str, title: str = None) -> bytes:
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+        + "".join(_docx_paragraph(style, text) for style, text in outline(output, title))
+        + '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+          '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134"/></w:sectPr>'
+        + "</w:body></w:document>")
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as docx:
+        for name, data in [*_DOCX_PARTS.items(), ("word/document.xml", document)]:
+            # Fixed timestamps: the same paper always gives the same bytes
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            docx.writestr(info, data)
+    return out.getvalue()
+
+
+# =============================================================================
+# FLASHCARDS
+# =============================================================================
+
+def build_csv(output: str, title: str = None) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Front", "Back", "Tags"])
+    for front, back, tags in flashcards(output):
+        writer.writerow([front, back, " ".join(tags)])
+    return out.getvalue().encode("utf-8-sig")      # the BOM makes Excel read it as UTF-8
+
+
+def _anki_field(text: str) -> str:
+    return html.escape(text).replace("\t", " ").replace("\n", "<br>")
+
+
+def build_anki(output: str, title: str = None) -> bytes:
+    """
+    Anki's text import (File → Import) reads the header lines and files the
+    notes as "Basic" cards in a UPSC::<topic> deck.
+    """
+    detection = parse(output).detection
+    deck = " ".join((title or (detection and detection.primary_topic) or "Practice").replace("::", ":").split())
+    lines = ["#separator:tab", "#html:true", "#notetype:Basic", f"#deck:UPSC::{deck}", "#tags column:3"]
+    for front, back, tags in flashcards(output):
+        tags = " ".join(tag.replace(" ", "_") for tag in tags)
+        lines.append(f"{_anki_field(front)}\t{_anki_field(back)}\t{tags}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# =============================================================================
+# FORMATS
+# =============================================================================
+
+@dataclass(frozen=True)
+class Format:
+    name: str
+    label: str          # for buttons
+    extension: str
+    mime: str
+    build: object       # (output, title) → bytes
+
+
+FORMATS = {
+    "pdf": Format("pdf", "PDF", "pdf", "application/pdf", build_pdf),
+    "docx": Format("docx", "Word", "docx",
+                   "application/vnd.openxmlformats-officedocument.wordprocessingml.document", build_docx),
+    "csv": Format("csv", "Flashcards (CSV)", "csv", "text/csv", build_csv),
+    "anki": Format("anki", "Anki deck", "txt", "text/plain", build_anki),
+}
+
+
+def export_key(output: str, fmt: str, title: str = None) -> str:
+    digest = hashlib.sha256()
+    for part in (fmt, title or "", output):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class Artifact:
+    key: str
+    format: Format
+    path: str
+    size: int
+    seconds: float = 0.0    # build time; 0 when it was already on disk
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def chunks(self, size: int = CHUNK_SIZE):
+        """
+        The file in pieces, for sending without holding all of it.
+        """
+        with self.open() as f:
+            while chunk := f.read(size):
+                yield chunk
+
+
+# =============================================================================
+# STORE
+# =============================================================================
+
+class ExportStore:
+    """
+    Thread-safe; one per process. Several processes may share the directory.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIR, *, max_bytes: int = DEFAULT_MAX_BYTES,
+                 workers: int = DEFAULT_WORKERS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files = OrderedDict()     # file name → size, least recently used first
+        self._building = {}             # key → Future
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self.hits = 0
+        self.builds = 0
+        self.joined = 0
+        self.evictions = 0
+        self.build_seconds = 0.0
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                st = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+
+    @classmethod
+    def from_env(cls) -> "ExportStore":
+        """
+        UPSC_EXPORTS (directory), UPSC_EXPORT_MAX_MB, UPSC_EXPORT_WORKERS.
+        """
+        env = os.environ.get
+        return cls(env("UPSC_EXPORTS", DEFAULT_DIR),
+                   max_bytes=int(float(env("UPSC_EXPORT_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024),
+                   workers=int(env("UPSC_EXPORT_WORKERS", DEFAULT_WORKERS)))
+
+    def _name(self, key: str, fmt: Format) -> str:
+        return f"{key}.{fmt.extension}"
+
+    def get(self, output: str, fmt: str, title: str = None) -> Artifact:
+        """
+        The artifact if it has been built already, else None. Never builds.
+        """
+        return self._lookup(export_key(output, fmt, title), FORMATS[fmt])
+
+    def _lookup(self, key: str, fmt: Format) -> Artifact:
+        name = self._name(key, fmt)
+        path = os.path.join(self.directory, name)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(name)
+            return None
+        with self._lock:
+            self.hits += 1
+            if name not in self._files:         # built by another process
+                self._files[name] = size
+            self._files.move_to_end(name)
+        try:
+            os.utime(path)                      # recency for the next process that scans the directory
+        except OSError:
+            pass
+        return Artifact(key, fmt, path, size)
+
+    def request(self, output: str, fmt: str, title: str = None) -> Future:
+        """
+        Future → Artifact: done at once if the file exists, else built in the
+        pool (one build per key, however many ask).
+        """
+        spec = FORMATS[fmt]
+        key = export_key(output, fmt, title)
+        artifact = self._lookup(key, spec)
+        if artifact is not None:
+            future = Future()
+            future.set_result(artifact)
+            return future
+        with self._lock:
+            if key in self._building:
+                self.joined += 1
+                return self._building[key]
+            future = self._building[key] = self._executor.submit(self._build, key, spec, output, title)
+        future.add_done_callback(lambda _: self._done(key))
+        return future
+
+    def _done(self, key: str):
+        with self._lock:
+            self._building.pop(key, None)
+
+    def _build(self, key: str, fmt: Format, output: str, title: str) -> Artifact:
+        started = time.perf_counter()
+        data = fmt.build(output, title)
+        name = self._name(key, fmt)
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)                   # readers never see a half-written file
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.builds += 1
+            self.build_seconds += seconds
+            self._forget(name)
+            self._files[name] = len(data)
+            self._evict(keep=name)
+        return Artifact(key, fmt, path, len(data), seconds)
+
+    def _forget(self, name: str):
+        self._files.pop(name, None)
+
+    def _evict(self, keep: str):
+        # Caller holds the lock
+        total = sum(self._files.values())
+        for name in list(self._files):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._files.pop(name)
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": sum(self._files.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "builds": self.builds,
+                "joined": self.joined,
+                "building": len(self._building),
+                "evictions": self.evictions,
+                "build_seconds": round(self.build_seconds, 3),
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,364 @@
+"""
+SCREENSHOT INGESTION — sniff, downscale, recompress, hash
+=========================================================
+Phone screenshots arrive at 1170x2532 and several MB. The model does not
+read more than ~1568 px on the long edge (larger images are resized
+server-side and still cost the upload), so we shrink them here first:
+
+- the real format comes from the magic bytes, not the file extension
+- the long edge is capped at MAX_EDGE and the area at MAX_PIXELS
+- the result is re-encoded until it fits the byte budget
+- a perceptual hash (dHash) of the picture becomes the cache key, so the
+  same viral screenshot — re-saved, re-compressed or resized by whichever
+  app shared it — maps to one cached answer
+
+Re-encoding flips a handful of hash bits, so hashes are not compared for
+equality: HashIndex snaps each new hash to the first one already seen
+within MATCH_BITS, and that canonical hash is what goes into the key.
+A 16x16 grid blurs dense small-font text into the same grey texture, so a
+near match is only taken once a finer 64x64 hash (DETAIL_SIZE) of the two
+screenshots agrees too. "First seen" is kept in a table next to the
+response cache, so every process sharing the cache (replicas, the API
+server, pregenerate.py) snaps a screenshot to the same key.
+
+    image = prepare(uploaded.getvalue())
+    image.block()                       # Anthropic image content block
+    key_hash = index.canonical(image.phash, image.detail_hash)
+"""
+
+import base64
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+# Model-side limits (see the vision docs): bigger than this is resized anyway
+MAX_EDGE = 1568
+MAX_PIXELS = 1_150_000
+DEFAULT_BYTE_BUDGET = 600 * 1024
+
+# JPEG qualities tried in order before giving up and shrinking further
+_QUALITIES = (85, 75, 65, 50)
+
+# Anthropic's estimate: tokens ≈ width * height / 750
+PIXELS_PER_TOKEN = 750
+
+# dHash grid: HASH_SIZE x HASH_SIZE bits. 16 → 256 bits; a screenshot is mostly
+# text on a flat background, and 64 bits lets different articles collide.
+HASH_SIZE = 16
+
+# Re-encodes / resizes of one screenshot move up to ~17 of 256 bits (~28 for
+# dense small-font text); different articles in the same app layout usually
+# stay ~50 apart, but dense text pages can come within a few bits — so this
+# only picks candidates, and the detail hash decides
+MATCH_BITS = 40
+
+# The confirming hash: 64x64 = 4096 bits. Re-encodes move under 5% of them,
+# different articles — dense text included — over 20%
+DETAIL_SIZE = 64
+DETAIL_MATCH_BITS = DETAIL_SIZE * DETAIL_SIZE // 10
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+
+
+def sniff(data: bytes) -> str:
+    """
+    Media type from the file header, or None if it is not PNG / JPEG / WebP.
+    """
+    for magic, media_type in _MAGIC:
+        if data.startswith(magic):
+            return media_type
+    if len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def fit(width: int, height: int, max_edge: int = MAX_EDGE, max_pixels: int = MAX_PIXELS) -> tuple:
+    """
+    Largest size with the same aspect ratio inside both limits.
+    """
+    scale = min(1.0, max_edge / max(width, height), (max_pixels / (width * height)) ** 0.5)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def image_tokens(width: int, height: int) -> int:
+    """
+    Estimated input tokens for an image, after the server-side resize.
+    """
+    width, height = fit(width, height)
+    return -(-width * height // PIXELS_PER_TOKEN)
+
+
+def perceptual_hash(image: Image.Image, size: int = HASH_SIZE) -> str:
+    """
+    Difference hash: greyscale, shrink to (size+1) x size, one bit per
+    horizontal neighbour pair (is the left pixel brighter?). Survives
+    re-compression and resizing; any change in content moves many bits.
+    """
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+class HashIndex:
+    """
+    Maps perceptual hashes to a canonical representative: the first hash
+    seen within `max_distance` bits whose detail hash (when both have one)
+    is also within `max_detail_distance`. Bounded, oldest out.
+
+    The representatives live in an SQLite table (`path`; the response
+    cache's file) and each process mirrors it in memory, in insertion order.
+    A new one is only added inside a write transaction, after checking the
+    rows other processes committed meanwhile — so every process picks the
+    same representative for a screenshot. ":memory:" keeps it per process.
+
+    A linear scan of XOR + popcount over ints — about 1 ms at 10k entries,
+    nothing next to the upload itself.
+    """
+
+    def __init__(self, path: str = ":memory:", max_distance: int = MATCH_BITS, max_entries: int = 10_000,
+                 max_detail_distance: int = DETAIL_MATCH_BITS):
+        self.max_distance = max_distance
+        self.max_detail_distance = max_detail_distance
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hashes = OrderedDict()    # canonical hex -> (row id, int value, detail int or None), by row id
+        self._last_id = 0
+        self.matched = 0
+        self.added = 0
+        self.rejected = 0               # near on the coarse hash, different on the detail hash
+
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS image_hashes (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                canonical TEXT NOT NULL UNIQUE,
+                phash     TEXT NOT NULL,
+                detail    TEXT
+            )
+        """)
+
+    def canonical(self, phash: str, detail: str = None) -> str:
+        value = int(phash, 16)
+        detail_value = int(detail, 16) if detail else None
+        with self._lock:
+            self._sync()
+            text = self._match(value, detail_value, self._hashes)
+            if text is not None:
+                return text
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have added this screenshot since the scan above
+                newer = self._sync()
+                text = self._match(value, detail_value, newer)
+                if text is None:
+                    text = phash
+                    if text in self._hashes:
+                        # Same coarse hash, different picture: it needs a cache key of its own
+                        text = f"{phash}-{hashlib.sha256(detail.encode()).hexdigest()[:16]}"
+                    row = self._db.execute("INSERT INTO image_hashes (canonical, phash, detail) VALUES (?, ?, ?)",
+                                           (text, phash, detail)).lastrowid
+                    self._db.execute("DELETE FROM image_hashes WHERE id <= ?", (row - self.max_entries,))
+                    self._db.execute("COMMIT")
+                    self._remember(row, text, value, detail_value)
+                    self.added += 1
+                else:
+                    self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return text
+
+    def _match(self, value: int, detail_value: int, candidates: dict) -> str:
+        for text, (_, known, known_detail) in candidates.items():
+            if (known ^ value).bit_count() > self.max_distance:
+                continue
+            if (detail_value is not None and known_detail is not None
+                    and (known_detail ^ detail_value).bit_count() > self.max_detail_distance):
+                self.rejected += 1
+                continue
+            self.matched += 1
+            return text
+        return None
+
+    def _sync(self) -> dict:
+        # Rows other processes added since we last looked; returns them
+        newer = OrderedDict()
+        for row, text, phash, detail in self._db.execute(
+                "SELECT id, canonical, phash, detail FROM image_hashes WHERE id > ? ORDER BY id", (self._last_id,)):
+            newer[text] = self._remember(row, text, int(phash, 16), int(detail, 16) if detail else None)
+        return newer
+
+    def _remember(self, row: int, text: str, value: int, detail_value: int) -> tuple:
+        entry = self._hashes[text] = (row, value, detail_value)
+        self._last_id = max(self._last_id, row)
+        # Same window as the table: the newest max_entries rows
+        while self._hashes and next(iter(self._hashes.values()))[0] <= self._last_id - self.max_entries:
+            self._hashes.popitem(last=False)
+        return entry
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+    phash: str
+    detail_hash: str        # DETAIL_SIZE dHash, confirms a near match on phash
+    original_bytes: int
+    original_width: int
+    original_height: int
+    elapsed: float          # seconds spent preparing
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+    @property
+    def tokens_saved(self) -> int:
+        return image_tokens(self.original_width, self.original_height) - image_tokens(self.width, self.height)
+
+    def upload_seconds_saved(self, uplink_bytes_per_sec: float) -> float:
+        # Base64 inflates every byte on the wire by 4/3
+        return self.bytes_saved * 4 / 3 / uplink_bytes_per_sec - self.elapsed
+
+    def block(self) -> dict:
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": self.media_type,
+                "data": base64.standard_b64encode(self.data).decode("ascii"),
+            },
+        }
+
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    # JPEG has no alpha: composite transparent screenshots onto white, not black
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def prepare(data: bytes, *, max_edge: int = MAX_EDGE, max_pixels: int = MAX_PIXELS,
+            byte_budget: int = DEFAULT_BYTE_BUDGET) -> PreparedImage:
+    """
+    Turn raw upload bytes into what we actually send.
+
+    Raises ValueError if the bytes are not a PNG, JPEG or WebP image.
+    An upload that is already small enough is passed through untouched.
+    """
+    started = time.perf_counter()
+    media_type = sniff(data)
+    if media_type is None:
+        raise ValueError("Unsupported image format — please upload a PNG, JPEG or WebP screenshot.")
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Could not read the image: {e}") from None
+
+    # Phone cameras store rotation in EXIF; apply it so the hash and the model see it upright
+    image = ImageOps.exif_transpose(image)
+    original_width, original_height = image.size
+    phash = perceptual_hash(image)
+    detail_hash = perceptual_hash(image, DETAIL_SIZE)
+
+    width, height = fit(original_width, original_height, max_edge, max_pixels)
+    if (width, height) == image.size and len(data) <= byte_budget:
+        out, out_type = data, media_type
+    else:
+        image = _flatten(image)
+        while True:
+            if (width, height) != image.size:
+                image = image.resize((width, height), Image.Resampling.LANCZOS)
+            for quality in _QUALITIES:
+                out = _encode_jpeg(image, quality)
+                if len(out) <= byte_budget:
+                    break
+            if len(out) <= byte_budget or max(width, height) <= 256:
+                break
+            width, height = int(width * 0.75), int(height * 0.75)
+        out_type = "image/jpeg"
+        # Never make a small upload bigger just for the sake of re-encoding
+        if len(out) >= len(data) and image.size == (original_width, original_height):
+            out, out_type = data, media_type
+
+    return PreparedImage(
+        data=out,
+        media_type=out_type,
+        width=image.size[0],
+        height=image.size[1],
+        phash=phash,
+        detail_hash=detail_hash,
+        original_bytes=len(data),
+        original_width=original_width,
+        original_height=original_height,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+class ImageStats:
+    """
+    Running totals of what preprocessing saved across uploads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.original_bytes = 0
+        self.sent_bytes = 0
+        self.tokens_saved = 0
+        self.prepare_seconds = 0.0
+
+    def record(self, image: PreparedImage):
+        with self._lock:
+            self.uploads += 1
+            self.original_bytes += image.original_bytes
+            self.sent_bytes += len(image.data)
+            self.tokens_saved += image.tokens_saved
+            self.prepare_seconds += image.elapsed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "original_bytes": self.original_bytes,
+                "sent_bytes": self.sent_bytes,
+                "bytes_saved": self.original_bytes - self.sent_bytes,
+                "bytes_saved_ratio": 1 - self.sent_bytes / self.original_bytes if self.original_bytes else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "mean_prepare_ms": self.prepare_seconds / self.uploads * 1000 if self.uploads else 0.0,
+            }
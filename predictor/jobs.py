@@ -0,0 +1,465 @@
+"""
+GENERATION JOBS — a paper keeps being written when the page goes away
+=====================================================================
+A generation used to run inside the Streamlit script thread: a refresh, a
+mobile connection dropping or a rerun mid-call threw away a 20-40 s call
+(and, with it, the credit's worth of work already paid for upstream).
+
+Now a paid click starts a job on this store's own thread pool and the page
+only watches it:
+
+    job = jobs.start(click_id, owner=account, session=session_id, label=topic,
+                     work=lambda report: generator.generate(..., on_progress=report.progress),
+                     on_done=settle_credit)
+    while not job.finished:
+        job = jobs.wait(job.id, timeout=1.0)      # progress text, queue position; also a heartbeat
+    jobs.deliver(job.id, session_id)
+
+- The job id is the click's idempotency key: starting the same id again
+  (Streamlit reran the script mid-click) returns the running job instead
+  of a second call.
+- `on_done` runs on the worker when the job ends, whether or not anyone is
+  still watching — that is where the page settles the credit and files the
+  paper in the ledger's history. If it raises, the paper is kept and the
+  failure noted in the job's meta ("on_done_error").
+- `on_interrupted(job)` (a store option) runs for every job this store
+  fails on a dead or stalled process's behalf — where the page gives the
+  credit back, since that job's on_done will never run.
+- A session that comes back (refresh, new tab, reconnect) asks pending()
+  for its account's running or finished-but-undelivered jobs and reattaches.
+- Finished jobs stay in a small SQLite table (UPSC_JOBS) for
+  UPSC_JOB_RETENTION_HOURS and are then pruned. Rows a dead process left
+  "running" are marked failed ("interrupted") by the next prune. Each row
+  carries its process's pid and boot token: a restarted server often gets
+  the same pid (PID 1 in a container), and the token tells it apart.
+- Nobody waits forever: watchers stop after UPSC_JOB_TIMEOUT_MINUTES, and
+  wait() fails a "running" row of another process once it has been quiet
+  that long. A worker claims its row before on_done and only ever finishes
+  a row that is still running, so exactly one side settles the job.
+
+A job nobody was watching when it finished (no heartbeat for ABANDON_AFTER
+seconds) counts as abandoned; delivering a job to a session that
+reattached to it counts as recovered. Both are telemetry "job" events
+(upsc_jobs_total{outcome}).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+
+from predictor.core import INTERNAL
+
+DEFAULT_PATH = os.path.join(".cache", "jobs.sqlite3")
+DEFAULT_RETENTION = 24 * 60 * 60    # seconds a finished job stays retrievable
+DEFAULT_WORKERS = 32                # jobs running at once; admission control still paces the upstream calls
+ABANDON_AFTER = 10.0                # seconds without a heartbeat before nobody counts as watching
+PRUNE_INTERVAL = 60.0               # seconds between prune passes
+DEFAULT_TIMEOUT = 10 * 60           # seconds before a job is given up on (generations take well under 1)
+
+BOOT = uuid.uuid4().hex             # this process, as opposed to an earlier one with the same pid
+
+# Job states
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+INTERRUPTED = "The generation was interrupted by a server restart. Please try again."
+STALLED = "The generation stopped responding. Please try again."
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str              # the ledger account it was started for
+    session: str            # the session that started it
+    label: str              # the topic as typed, or "Image Upload"
+    state: str
+    created: float
+    updated: float
+    output: str = None
+    meta: dict = field(default_factory=dict)     # timings, usage, output_hash — whatever on_done adds
+    error: str = None
+    error_kind: str = None
+    progress: str = None    # answer text so far (streaming; this process only)
+    waiting: tuple = None   # (queue position, estimated seconds) while waiting for admission
+    delivered: bool = False
+    abandoned: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.state != RUNNING
+
+
+def _alive(pid: int, boot: str) -> bool:
+    if pid == os.getpid():
+        return boot == BOOT
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Report:
+    """
+    Handed to a job's `work`: what it has written so far and where it is in
+    the admission queue, for whoever is watching.
+    """
+
+    def __init__(self, store: "JobStore", job: Job):
+        self._store = store
+        self._job = job
+
+    def progress(self, text: str):
+        self._store._update(self._job, progress=text, waiting=None)
+
+    def waiting(self, position: int, wait: float):
+        self._store._update(self._job, waiting=(position, wait))
+
+
+class JobStore:
+    """
+    Thread-safe; one per process. `path=":memory:"` keeps nothing across restarts.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, *, retention: float = DEFAULT_RETENTION,
+                 workers: int = DEFAULT_WORKERS, abandon_after: float = ABANDON_AFTER,
+                 timeout: float = DEFAULT_TIMEOUT, on_interrupted=None, telemetry=None):
+        self.path = path
+        self.retention = retention
+        self.timeout = timeout
+        self.on_interrupted = on_interrupted
+        self.abandon_after = abandon_after
+        self.telemetry = telemetry
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id         TEXT PRIMARY KEY,
+                owner      TEXT NOT NULL,
+                session    TEXT NOT NULL,
+                label      TEXT NOT NULL,
+                state      TEXT NOT NULL,
+                pid        INTEGER NOT NULL,
+                boot       TEXT,
+                created    REAL NOT NULL,
+                updated    REAL NOT NULL,
+                output     BLOB,
+                meta       TEXT,
+                error      TEXT,
+                error_kind TEXT,
+                delivered  INTEGER NOT NULL DEFAULT 0,
+                abandoned  INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, delivered, created);
+            CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs(updated);
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "boot" not in columns:      # job tables written before boot tokens were stored
+            self._db.execute("ALTER TABLE jobs ADD COLUMN boot TEXT")
+            self._db.commit()
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._live = {}             # id → Job, while running in this process
+        self._seen = {}             # id → last heartbeat (monotonic)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._pruned = 0.0
+        self.counts = dict.fromkeys(("started", "completed", "failed", "abandoned", "recovered",
+                                     "abandoned_recovered", "interrupted", "expired"), 0)
+        self.prune()
+
+    @classmethod
+    def from_env(cls, telemetry=None, on_interrupted=None) -> "JobStore":
+        """
+        UPSC_JOBS (path), UPSC_JOB_RETENTION_HOURS, UPSC_JOB_WORKERS,
+        UPSC_JOB_TIMEOUT_MINUTES.
+        """
+        env = os.environ.get
+        return cls(env("UPSC_JOBS", DEFAULT_PATH),
+                   retention=float(env("UPSC_JOB_RETENTION_HOURS", DEFAULT_RETENTION / 3600)) * 3600,
+                   workers=int(env("UPSC_JOB_WORKERS", DEFAULT_WORKERS)),
+                   timeout=float(env("UPSC_JOB_TIMEOUT_MINUTES", DEFAULT_TIMEOUT / 60)) * 60,
+                   on_interrupted=on_interrupted, telemetry=telemetry)
+
+    # -------------------------------------------------------------------------
+    # RUNNING
+    # -------------------------------------------------------------------------
+
+    def start(self, job_id: str, *, owner: str, session: str, label: str, work, on_done=None) -> Job:
+        """
+        Run `work(report)` → GenerationResult in the background, unless a job
+        with this id already exists (then that one is returned, running or not).
+        `on_done(job, result)` → dict of extra meta, or None; called on the
+        worker before the job is marked finished, so a watcher that sees it
+        finished also sees what on_done did.
+        """
+        now = time.time()
+        with self._lock:
+            if job_id in self._live:
+                return self._snapshot(self._live[job_id])
+            existing = self._load(job_id)
+            if existing is not None:
+                return existing
+            job = Job(job_id, owner, session, label, RUNNING, now, now)
+            self._live[job_id] = job
+            self._seen[job_id] = time.monotonic()
+            self.counts["started"] += 1
+        self._execute("INSERT INTO jobs (id, owner, session, label, state, pid, boot, created, updated) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                      (job_id, owner, session, label, RUNNING, os.getpid(), BOOT, now, now))
+        self._event("started", job)
+        self._executor.submit(self._run, job, work, on_done)
+        self._maybe_prune()
+        return self._snapshot(job)
+
+    def _run(self, job: Job, work, on_done):
+        try:
+            result = work(Report(self, job))
+        except Exception as e:     # a job must always finish, or the page would wait for it forever
+            result = None
+            job.error, job.error_kind = f"Unexpected error: {e}", INTERNAL
+        if result is not None:
+            job.output, job.error, job.error_kind = result.text, result.error, result.error_kind
+            job.meta = {"timings": result.timings or None, "usage": result.usage and result.usage.to_dict()}
+        # Claim the row: another process may have failed it as stalled (and
+        # settled its credit) meanwhile. The bumped `updated` keeps it from
+        # being taken for stalled while on_done runs.
+        if not self._execute("UPDATE jobs SET updated = ? WHERE id = ? AND state = ?", (time.time(), job.id, RUNNING)):
+            stored = self._load(job.id)
+            job.output, job.meta = None, {}
+            job.error, job.error_kind = (stored.error, stored.error_kind) if stored else (STALLED, INTERNAL)
+            on_done = None
+        if on_done is not None:
+            try:
+                job.meta.update(on_done(job, result) or {})
+            except Exception as e:
+                # The work's outcome stands: a paper that was produced is kept, not thrown away
+                job.meta["on_done_error"] = f"{type(e).__name__}: {e}"
+        state = DONE if job.output else FAILED
+        with self._lock:
+            abandoned = time.monotonic() - self._seen.get(job.id, 0.0) > self.abandon_after
+        now = time.time()
+        self._execute("UPDATE jobs SET state = ?, updated = ?, output = ?, meta = ?, error = ?, error_kind = ?, "
+                      "abandoned = ? WHERE id = ? AND state = ?",
+                      (state, now, job.output and zlib.compress(job.output.encode(), 6), json.dumps(job.meta),
+                       job.error, job.error_kind, int(abandoned), job.id, RUNNING))
+        with self._changed:
+            job.state, job.updated, job.abandoned = state, now, abandoned
+            job.progress = job.waiting = None
+            del self._live[job.id]
+            self._seen.pop(job.id, None)
+            self.counts["completed" if state == DONE else "failed"] += 1
+            self.counts["abandoned"] += abandoned
+            self._changed.notify_all()
+        self._event("completed" if state == DONE else "failed", job)
+        if abandoned:
+            self._event("abandoned", job)
+
+    def _update(self, job: Job, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            self._changed.notify_all()
+
+    # -------------------------------------------------------------------------
+    # WATCHING
+    # -------------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Job:
+        """
+        A snapshot of the job, or None if it is unknown (or pruned).
+        """
+        with self._lock:
+            if job_id in self._live:
+                return self._snapshot(self._live[job_id])
+        return self._load(job_id)
+
+    def heartbeat(self, job_id: str):
+        """
+        Somebody is still watching. Jobs that finish without one count as abandoned.
+        """
+        with self._lock:
+            if job_id in self._live:
+                self._seen[job_id] = time.monotonic()
+
+    def wait(self, job_id: str, timeout: float = 1.0) -> Job:
+        """
+        Heartbeat, then block until the job reports progress or finishes, or
+        `timeout` passes; returns the job as it is then. A job running in
+        another process that has been quiet longer than the store's timeout
+        is failed here (and handed to on_interrupted) rather than waited on.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            job = self._live.get(job_id)
+            if job is not None:
+                self._seen[job_id] = time.monotonic()
+                seen = (job.progress, job.waiting)
+                while job.state == RUNNING and (job.progress, job.waiting) == seen:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                if job.state == RUNNING:
+                    return self._snapshot(job)
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            # Running in another process: no progress to wait on, just poll the table
+            time.sleep(max(deadline - time.monotonic(), 0.0))
+            job = self.get(job_id)
+        if job is not None and not job.finished and time.time() - job.updated > self.timeout:
+            now = time.time()
+            # Conditional on the row still being quiet: its worker may claim it first
+            if self._execute("UPDATE jobs SET state = ?, error = ?, error_kind = ?, updated = ? "
+                             "WHERE id = ? AND state = ? AND updated < ?",
+                             (FAILED, STALLED, INTERNAL, now, job_id, RUNNING, now - self.timeout)):
+                self._interrupted([job_id])
+            job = self.get(job_id)
+        return job
+
+    def pending(self, owner: str) -> list:
+        """
+        The account's jobs a page should show: still running, or finished and
+        not yet delivered to any session. Newest first.
+        """
+        with self._lock:
+            live = {job.id: self._snapshot(job) for job in self._live.values() if job.owner == owner}
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT {self._COLUMNS} FROM jobs WHERE owner = ? AND delivered = 0 AND updated >= ? "
+                "ORDER BY created DESC", (owner, time.time() - self.retention)).fetchall()
+        jobs = [live.pop(row[0], None) or self._row(row) for row in rows]
+        return sorted(jobs + list(live.values()), key=lambda job: job.created, reverse=True)
+
+    def deliver(self, job_id: str, session: str, *, reattached: bool = False) -> Job:
+        """
+        The finished job is on a page now. `reattached`: that page found it
+        through pending() rather than watching it from the click.
+        """
+        job = self.get(job_id)
+        if job is None or not job.finished:
+            return job
+        self._execute("UPDATE jobs SET delivered = 1 WHERE id = ?", (job_id,))
+        if reattached and not job.delivered:
+            with self._lock:
+                self.counts["recovered"] += 1
+                self.counts["abandoned_recovered"] += job.abandoned
+            self._event("recovered", job, session=session, abandoned=job.abandoned)
+        job.delivered = True
+        return job
+
+    # -------------------------------------------------------------------------
+    # STORAGE
+    # -------------------------------------------------------------------------
+
+    _COLUMNS = ("id, owner, session, label, state, created, updated, output, meta, error, error_kind, "
+                "delivered, abandoned")
+
+    def _load(self, job_id: str) -> Job:
+        with self._db_lock:
+            row = self._db.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row and self._row(row)
+
+    @staticmethod
+    def _row(row) -> Job:
+        (job_id, owner, session, label, state, created, updated, output, meta, error, error_kind,
+         delivered, abandoned) = row
+        return Job(job_id, owner, session, label, state, created, updated,
+                   output=output and zlib.decompress(output).decode(), meta=json.loads(meta or "{}"),
+                   error=error, error_kind=error_kind, delivered=bool(delivered), abandoned=bool(abandoned))
+
+    @staticmethod
+    def _snapshot(job: Job) -> Job:
+        return replace(job, meta=dict(job.meta))
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> int:
+        with self._db_lock:
+            changed = self._db.execute(sql, parameters).rowcount
+            self._db.commit()
+        return changed
+
+    def _maybe_prune(self):
+        if time.monotonic() - self._pruned >= PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        """
+        Drop jobs finished longer than `retention` ago, and fail "running" rows
+        whose process is gone (on_done never ran for them; on_interrupted
+        settles them instead).
+        """
+        self._pruned = time.monotonic()
+        now = time.time()
+        with self._db_lock:
+            rows = self._db.execute("SELECT id, pid, boot FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+            alive = {}
+            interrupted = []
+            for job_id, pid, boot in rows:
+                if (pid, boot) not in alive:
+                    alive[pid, boot] = _alive(pid, boot)
+                if not alive[pid, boot] and self._db.execute(
+                        "UPDATE jobs SET state = ?, error = ?, error_kind = ?, updated = ? WHERE id = ? AND state = ?",
+                        (FAILED, INTERRUPTED, INTERNAL, now, job_id, RUNNING)).rowcount:
+                    interrupted.append(job_id)
+            expired = self._db.execute("SELECT COUNT(*) FROM jobs WHERE state != ? AND delivered = 0 AND updated < ?",
+                                       (RUNNING, now - self.retention)).fetchone()[0]
+            self._db.execute("DELETE FROM jobs WHERE state != ? AND updated < ?", (RUNNING, now - self.retention))
+            self._db.commit()
+        self._interrupted(interrupted)
+        with self._lock:
+            self.counts["expired"] += expired
+        for _ in range(expired):
+            self._event("expired", None)
+
+    def _interrupted(self, job_ids: list):
+        with self._lock:
+            self.counts["interrupted"] += len(job_ids)
+        for job_id in job_ids:
+            job = self._load(job_id)
+            self._event("interrupted", job)
+            if self.on_interrupted is None:
+                continue
+            try:
+                self.on_interrupted(job)
+            except Exception as e:     # not retried; the ledger's refund_stale() is the backstop
+                self._event("interrupted_unsettled", job, error=f"{type(e).__name__}: {e}")
+
+    def _event(self, outcome: str, job: Job, **fields):
+        if self.telemetry is None:
+            return
+        if job is not None:
+            fields = {"request_id": job.id, "session": job.session, **fields}
+        self.telemetry.job(outcome, **fields)
+
+    # -------------------------------------------------------------------------
+    # STATS
+    # -------------------------------------------------------------------------
+
+    def running(self) -> int:
+        with self._lock:
+            return len(self._live)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"running": len(self._live), **self.counts}
+
+    def gauges(self) -> dict:
+        return {"upsc_jobs_running": ("Generation jobs running in the background.", self.running())}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._db_lock:
+            self._db.close()
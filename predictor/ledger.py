@@ -0,0 +1,508 @@
+"""
+CREDIT LEDGER — durable, shared across replicas, safe under double-clicks
+=========================================================================
+Credits used to live in st.session_state: gone on refresh, invisible to a
+second replica, and decremented only after the 30 s call returned, so two
+quick clicks could both start on the last credit.
+
+Every paid action is now three steps against the ledger:
+
+    reservation = ledger.reserve(account, key)     # credit held, or InsufficientCredits
+    ... generate ...
+    ledger.commit(key)  /  ledger.refund(key)      # spent, or given back
+
+- reserve is one atomic "debit if balance allows" — concurrent reservations
+  for the last credit cannot both succeed, across threads or processes.
+- `key` is an idempotency key, one per click: replaying a reserve, commit or
+  refund with the same key returns the original outcome and never charges
+  twice (a Streamlit rerun mid-generation re-sends the same click).
+- Holds that are never settled (process killed mid-call) are refunded by
+  refund_stale() after HOLD_TIMEOUT, unless the caller says the work behind
+  them is still running. A commit that arrives after such a refund is a
+  no-op, counted as a late commit.
+- History entries are buffered and written in batches by a background
+  thread — one transaction per batch instead of one per entry. The full
+  paper is kept with each entry, zlib-compressed and stored once per
+  distinct text (a cache hit replays the same paper, so it costs nothing
+  extra); entries are read back a page at a time and papers only when
+  re-opened. Each account keeps its latest HISTORY_LIMIT entries.
+- An account's pricing plan is the largest credit pack it has been granted
+  (PLAN_CREDITS; "trial" before any purchase) — predictor.routing picks
+  model tiers by it.
+
+Backends are pluggable: open_ledger("sqlite:///path") or a bare path gives
+the SQLite one (WAL mode, fine for several processes on one host); other
+schemes can be added with register_backend().
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+DEFAULT_PATH = os.path.join(".cache", "ledger.sqlite3")
+TRIAL_CREDITS = 2
+# Seconds a reservation may stay unsettled: well past a background job's
+# timeout (predictor.jobs, 10 min), which already covers its queue wait and
+# every attempt's deadline. Jobs that die earlier are refunded by the job store.
+HOLD_TIMEOUT = 60 * 60
+FLUSH_INTERVAL = 1.0        # seconds between history batch writes
+FLUSH_BATCH = 64            # ... or sooner, once this many are waiting
+LOCK_TIMEOUT = 30.0         # seconds to wait for the database write lock
+HISTORY_LIMIT = 2000        # entries kept per account; older ones (and papers nobody else has) go
+
+# Credit packs on sale, smallest first; an account's plan is the largest pack it has bought
+PLAN_CREDITS = {"try": 1, "starter": 10, "pro": 40, "premium": 80}
+TRIAL_PLAN = "trial"        # never bought credits
+
+# Reservation states
+HELD = "held"
+COMMITTED = "committed"
+REFUNDED = "refunded"
+GRANTED = "granted"
+
+
+def plan_for(credits: int) -> str:
+    """
+    The plan a grant of `credits` belongs to: the largest pack it covers.
+    """
+    plan = TRIAL_PLAN
+    for name, size in PLAN_CREDITS.items():
+        if credits and credits >= size:
+            plan = name
+    return plan
+
+
+class InsufficientCredits(RuntimeError):
+    """
+    reserve() found fewer credits than the action costs.
+    """
+
+
+class UnknownReservation(KeyError):
+    """
+    commit() / refund() for a key that was never reserved.
+    """
+
+
+@dataclass
+class Reservation:
+    key: str
+    account: str
+    amount: int
+    state: str
+    replayed: bool = False      # this key had been seen before; nothing new was charged
+
+
+class Ledger(ABC):
+    """
+    The interface every backend implements. All methods are thread-safe
+    and every balance change is atomic. A backend missing one of them fails
+    when it is created, not halfway through a paid generation.
+    """
+
+    @abstractmethod
+    def open_account(self, account: str, credits: int = TRIAL_CREDITS) -> bool:
+        """
+        Create `account` with `credits` if it doesn't exist yet. True if it was created.
+        """
+
+    @abstractmethod
+    def balance(self, account: str) -> tuple:
+        """
+        (credits, total committed actions) — (0, 0) for an unknown account.
+        """
+
+    @abstractmethod
+    def reserve(self, account: str, key: str, amount: int = 1) -> Reservation:
+        ...
+
+    @abstractmethod
+    def commit(self, key: str) -> Reservation:
+        ...
+
+    @abstractmethod
+    def refund(self, key: str) -> Reservation:
+        ...
+
+    @abstractmethod
+    def grant(self, account: str, credits: int, key: str) -> Reservation:
+        """
+        Add purchased credits, once per `key` (e.g. the payment id).
+        """
+
+    @abstractmethod
+    def refund_stale(self, max_age: float = HOLD_TIMEOUT, keep=None) -> int:
+        """
+        Refund holds older than `max_age` seconds, except those `keep(key)`
+        says are still backed by running work. Returns how many.
+        """
+
+    @abstractmethod
+    def plan(self, account: str) -> str:
+        """
+        The account's pricing plan (PLAN_CREDITS), from the largest grant it has had.
+        """
+
+    @abstractmethod
+    def record(self, account: str, entry: dict, output: str = None) -> str:
+        """
+        Queue a history entry (and the paper it produced); written with the
+        next batch. Returns the paper's content hash, for output().
+        """
+
+    @abstractmethod
+    def history(self, account: str, limit: int = 50, offset: int = 0) -> list:
+        """
+        One page of the account's entries, newest first (queued ones
+        included). Each carries "output_hash" when a paper was kept.
+        """
+
+    @abstractmethod
+    def history_count(self, account: str) -> int:
+        ...
+
+    @abstractmethod
+    def output(self, output_hash: str) -> str:
+        """
+        A kept paper by content hash, or None.
+        """
+
+    def flush(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+class SQLiteLedger(Ledger):
+
+    def __init__(self, path: str = DEFAULT_PATH, *, flush_interval: float = FLUSH_INTERVAL,
+                 flush_batch: int = FLUSH_BATCH):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode: every write below opens its own BEGIN IMMEDIATE, so
+        # the "check balance, then debit" pair holds the database write lock
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=LOCK_TIMEOUT, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                account       TEXT PRIMARY KEY,
+                credits       INTEGER NOT NULL CHECK (credits >= 0),
+                total_queries INTEGER NOT NULL DEFAULT 0,
+                created       REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS reservations (
+                key     TEXT PRIMARY KEY,
+                account TEXT NOT NULL,
+                amount  INTEGER NOT NULL,
+                state   TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_reservations_held ON reservations(state, created);
+            CREATE INDEX IF NOT EXISTS idx_reservations_account ON reservations(account, state);
+            CREATE TABLE IF NOT EXISTS history (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                account     TEXT NOT NULL,
+                created     REAL NOT NULL,
+                entry       TEXT NOT NULL,
+                output_hash TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_history_account ON history(account, id);
+            CREATE TABLE IF NOT EXISTS outputs (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(history)")}
+        if "output_hash" not in columns:   # ledgers written before papers were kept
+            self._db.execute("ALTER TABLE history ADD COLUMN output_hash TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_output ON history(output_hash)")
+
+        self.reservations = 0
+        self.insufficient = 0
+        self.replays = 0
+        self.late_commits = 0
+        self.history_batches = 0
+
+        self._pending = []                      # (account, created, json, hash, zlib data, size) for the next batch
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="ledger-history", daemon=True)
+        self._flusher.start()
+
+    # -------------------------------------------------------------------------
+    # CREDITS
+    # -------------------------------------------------------------------------
+
+    def _transaction(self, work):
+        # One BEGIN IMMEDIATE ... COMMIT around `work(db)`; rolled back if it raises
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def open_account(self, account: str, credits: int = TRIAL_CREDITS) -> bool:
+        def work(db):
+            cur = db.execute("INSERT OR IGNORE INTO accounts (account, credits, created) VALUES (?, ?, ?)",
+                             (account, credits, time.time()))
+            return cur.rowcount == 1
+        return self._transaction(work)
+
+    def balance(self, account: str) -> tuple:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT credits, total_queries FROM accounts WHERE account = ?", (account,)
+            ).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    @staticmethod
+    def _existing(db, key: str) -> Reservation:
+        row = db.execute("SELECT account, amount, state FROM reservations WHERE key = ?", (key,)).fetchone()
+        return row and Reservation(key, row[0], row[1], row[2], replayed=True)
+
+    def reserve(self, account: str, key: str, amount: int = 1) -> Reservation:
+        def work(db):
+            existing = self._existing(db, key)
+            if existing is not None:
+                return existing
+            cur = db.execute("UPDATE accounts SET credits = credits - ? WHERE account = ? AND credits >= ?",
+                             (amount, account, amount))
+            if cur.rowcount != 1:
+                raise InsufficientCredits(f"{account} has fewer than {amount} credit(s)")
+            now = time.time()
+            db.execute("INSERT INTO reservations (key, account, amount, state, created, updated) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", (key, account, amount, HELD, now, now))
+            return Reservation(key, account, amount, HELD)
+
+        try:
+            reservation = self._transaction(work)
+        except InsufficientCredits:
+            self.insufficient += 1
+            raise
+        if reservation.replayed:
+            self.replays += 1
+        else:
+            self.reservations += 1
+        return reservation
+
+    def _settle(self, key: str, state: str) -> Reservation:
+        def work(db):
+            reservation = self._existing(db, key)
+            if reservation is None:
+                raise UnknownReservation(key)
+            if reservation.state != HELD:
+                if state == COMMITTED and reservation.state == REFUNDED:
+                    self.late_commits += 1  # refund_stale() gave it back first; the paper went free
+                return reservation          # already settled: same answer as the first time
+            now = time.time()
+            db.execute("UPDATE reservations SET state = ?, updated = ? WHERE key = ?", (state, now, key))
+            if state == COMMITTED:
+                db.execute("UPDATE accounts SET total_queries = total_queries + 1 WHERE account = ?",
+                           (reservation.account,))
+            else:
+                db.execute("UPDATE accounts SET credits = credits + ? WHERE account = ?",
+                           (reservation.amount, reservation.account))
+            return Reservation(key, reservation.account, reservation.amount, state)
+        return self._transaction(work)
+
+    def commit(self, key: str) -> Reservation:
+        return self._settle(key, COMMITTED)
+
+    def refund(self, key: str) -> Reservation:
+        return self._settle(key, REFUNDED)
+
+    def grant(self, account: str, credits: int, key: str) -> Reservation:
+        def work(db):
+            existing = self._existing(db, key)
+            if existing is not None:
+                return existing
+            now = time.time()
+            db.execute("INSERT OR IGNORE INTO accounts (account, credits, created) VALUES (?, 0, ?)", (account, now))
+            db.execute("UPDATE accounts SET credits = credits + ? WHERE account = ?", (credits, account))
+            db.execute("INSERT INTO reservations (key, account, amount, state, created, updated) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", (key, account, -credits, GRANTED, now, now))
+            return Reservation(key, account, -credits, GRANTED)
+        return self._transaction(work)
+
+    def plan(self, account: str) -> str:
+        with self._lock:
+            largest, = self._db.execute("SELECT MAX(-amount) FROM reservations WHERE account = ? AND state = ?",
+                                        (account, GRANTED)).fetchone()
+        return plan_for(largest)
+
+    def refund_stale(self, max_age: float = HOLD_TIMEOUT, keep=None) -> int:
+        with self._lock:
+            held = self._db.execute("SELECT key FROM reservations WHERE state = ? AND created < ?",
+                                    (HELD, time.time() - max_age)).fetchall()
+        # Asked outside the write transaction: `keep` may look things up elsewhere
+        kept = {key for key, in held if keep is not None and keep(key)}
+
+        def work(db):
+            now = time.time()
+            stale = [row for row in db.execute(
+                "SELECT key, account, amount FROM reservations WHERE state = ? AND created < ?",
+                (HELD, now - max_age)).fetchall() if row[0] not in kept]
+            for key, account, amount in stale:
+                db.execute("UPDATE reservations SET state = ?, updated = ? WHERE key = ?", (REFUNDED, now, key))
+                db.execute("UPDATE accounts SET credits = credits + ? WHERE account = ?", (amount, account))
+            return len(stale)
+        return self._transaction(work)
+
+    # -------------------------------------------------------------------------
+    # HISTORY (batched)
+    # -------------------------------------------------------------------------
+
+    def record(self, account: str, entry: dict, output: str = None) -> str:
+        output_hash = data = size = None
+        if output:
+            raw = output.encode("utf-8")
+            output_hash = hashlib.sha256(raw).hexdigest()
+            data, size = zlib.compress(raw, 6), len(raw)
+        item = (account, time.time(), json.dumps(entry, default=str), output_hash, data, size)
+        with self._pending_lock:
+            self._pending.append(item)
+            full = len(self._pending) >= self.flush_batch
+        if full:
+            self._wake.set()
+        return output_hash
+
+    def flush(self):
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            def work(db):
+                db.executemany("INSERT OR IGNORE INTO outputs (hash, data, size) VALUES (?, ?, ?)",
+                               [(h, data, size) for _, _, _, h, data, size in batch if h])
+                db.executemany("INSERT INTO history (account, created, entry, output_hash) VALUES (?, ?, ?, ?)",
+                               [(account, created, entry, h) for account, created, entry, h, _, _ in batch])
+                self._trim(db, {item[0] for item in batch})
+            try:
+                self._transaction(work)
+            except sqlite3.Error:
+                with self._pending_lock:
+                    self._pending[:0] = batch       # back in front, for the next attempt
+                raise
+            self.history_batches += 1
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass        # flush() put the batch back; try again next round
+
+    def _trim(self, db, accounts: set):
+        trimmed = 0
+        for account in accounts:
+            cur = db.execute(
+                "DELETE FROM history WHERE account = ? AND id <= "
+                "(SELECT id FROM history WHERE account = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (account, account, HISTORY_LIMIT),
+            )
+            trimmed += max(cur.rowcount, 0)
+        if trimmed:
+            db.execute("DELETE FROM outputs WHERE NOT EXISTS "
+                       "(SELECT 1 FROM history WHERE history.output_hash = outputs.hash)")
+
+    def _has_pending(self, account: str) -> bool:
+        with self._pending_lock:
+            return any(item[0] == account for item in self._pending)
+
+    def history(self, account: str, limit: int = 50, offset: int = 0) -> list:
+        if self._has_pending(account):
+            self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, entry, output_hash FROM history WHERE account = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (account, limit, offset),
+            ).fetchall()
+        return [dict(json.loads(entry), id=row_id, output_hash=output_hash) for row_id, entry, output_hash in rows]
+
+    def history_count(self, account: str) -> int:
+        if self._has_pending(account):
+            self.flush()
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history WHERE account = ?", (account,)).fetchone()[0]
+
+    def output(self, output_hash: str) -> str:
+        if self._has_pending_output(output_hash):
+            self.flush()
+        with self._lock:
+            row = self._db.execute("SELECT data FROM outputs WHERE hash = ?", (output_hash,)).fetchone()
+        return row and zlib.decompress(row[0]).decode("utf-8")
+
+    def _has_pending_output(self, output_hash: str) -> bool:
+        with self._pending_lock:
+            return any(item[3] == output_hash for item in self._pending)
+
+    def stats(self) -> dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "reservations": self.reservations,
+            "replays": self.replays,
+            "late_commits": self.late_commits,
+            "insufficient": self.insufficient,
+            "history_batches": self.history_batches,
+            "history_pending": pending,
+        }
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+
+_BACKENDS = {"sqlite": SQLiteLedger}
+
+
+def register_backend(scheme: str, factory):
+    """
+    Make open_ledger("<scheme>://...") build `factory(location)`.
+    """
+    _BACKENDS[scheme] = factory
+
+
+def open_ledger(url: str = DEFAULT_PATH) -> Ledger:
+    """
+    "sqlite:///abs/path.sqlite3", "sqlite://relative/path.sqlite3", "sqlite://:memory:",
+    or a bare path (SQLite).
+    """
+    scheme, sep, location = url.partition("://")
+    if not sep:
+        return SQLiteLedger(url)
+    if scheme not in _BACKENDS:
+        raise ValueError(f"no ledger backend for {scheme!r} (have: {', '.join(sorted(_BACKENDS))})")
+    return _BACKENDS[scheme](location)
@@ -0,0 +1,290 @@
+"""
+OUTPUT PARSER — typed records from the model's fixed format
+===========================================================
+Single pass, line by line, over text that may arrive in arbitrary chunks
+(streaming). Each block is emitted the moment the next header (or a ═ rule)
+shows it is finished:
+
+    parser = OutputParser()
+    for chunk in stream.text_stream:
+        for record in parser.feed(chunk):
+            ...                         # TopicDetection / MCQ / MainsQuestion
+    for record in parser.close():
+        ...
+
+Every record carries `start` / `end` character offsets into the full output,
+so a block can be cut out or replaced without re-scanning the text.
+
+Deliberately forgiving: markdown bold / heading marks, missing emoji
+variation selectors, missing rule lines and truncated output all parse to
+whatever fields were present — never an exception.
+"""
+
+import re
+from dataclasses import dataclass
+
+# =============================================================================
+# PATTERNS — compiled once; tried only on complete, stripped lines
+# =============================================================================
+
+_RULE = re.compile(r"^[═=━─-]{10,}$")
+_HEADER = re.compile(
+    r"^[#*\s]*(?:"
+    r"(?P<detection>TOPIC\s+DETECTION)"
+    r"|SECTION\s+(?P<section>[AB])\b"
+    r"|(?P<kind>MCQ|MAINS)\s*(?P<number>\d+)\s*\**\s*[:.]"
+    r")\**\s*(?P<rest>.*)$",
+    re.IGNORECASE,
+)
+_FIELD = re.compile(
+    r"^(?:"
+    r"(?P<answer>✅\s*Answer)"
+    r"|(?P<trap>⚠️?\s*Traps?(?:\s+Applied)?)"
+    r"|(?P<explanation>📖\s*Explanation)"
+    r"|(?P<archetype>📋\s*Archetype)"
+    r"|(?P<framework>📝\s*Answer\s+Framework)"
+    r"|(?P<question>📝\s*Question)"
+    r"|(?P<must_include>📌\s*Must[- ]Include)"
+    r"|(?P<avoid>❌\s*Traps\s+to\s+Avoid)"
+    r"|(?P<conclude>✓\s*Conclude\s+with)"
+    r"|(?P<topic>Primary\s+Topic)"
+    r"|(?P<subject>Subject)"
+    r"|(?P<paper>Paper)"
+    r"|(?P<angles>Cross-Subject\s+Angles(?:\s+Identified)?)"
+    r")\s*:\s*",
+    re.IGNORECASE,
+)
+_FRAMEWORK_LINE = re.compile(r"^[┌├└│|+`]?[─\-]*\s*(.+)$")
+_BULLET = re.compile(r"^[•\-*·]\s*(.+)$")
+_NUMBERED = re.compile(r"^\d+[.)]\s+(.+)$")
+_ARCHETYPE = re.compile(r"Archetype\s*:\s*([^\]\n]+)", re.IGNORECASE)
+TRAP_CODE = re.compile(r"\bT-(\d{2})\b")
+
+# List-valued fields and how to strip their item markers
+_LIST_ITEM = {
+    "framework": _FRAMEWORK_LINE,
+    "must_include": _BULLET,
+    "avoid": _BULLET,
+    "angles": _NUMBERED,
+}
+
+
+# =============================================================================
+# RECORDS
+# =============================================================================
+
+@dataclass(slots=True)
+class TopicDetection:
+    primary_topic: str = None
+    subject: str = None
+    paper: str = None
+    angles: tuple = ()
+    start: int = 0
+    end: int = 0
+
+
+@dataclass(slots=True)
+class MCQ:
+    number: int
+    archetype: str = None
+    question: str = ""
+    answer: str = None
+    trap: str = None
+    explanation: str = None
+    start: int = 0
+    end: int = 0
+
+    @property
+    def trap_code(self) -> str:
+        match = TRAP_CODE.search(self.trap or "")
+        return f"T-{match.group(1)}" if match else None
+
+
+@dataclass(slots=True)
+class MainsQuestion:
+    number: int
+    archetype: str = None
+    question: str = None
+    framework: tuple = ()
+    must_include: tuple = ()
+    traps_to_avoid: tuple = ()
+    conclude_with: str = None
+    start: int = 0
+    end: int = 0
+
+
+@dataclass(slots=True)
+class ParsedOutput:
+    detection: TopicDetection = None
+    mcqs: list = None
+    mains: list = None
+
+    def __post_init__(self):
+        self.mcqs = [] if self.mcqs is None else self.mcqs
+        self.mains = [] if self.mains is None else self.mains
+
+
+# =============================================================================
+# PARSER
+# =============================================================================
+
+class _Block:
+    """
+    A block under construction: the record kind plus raw pieces per field.
+    Joining happens once, at emit time.
+    """
+
+    __slots__ = ("kind", "number", "start", "fields", "current", "dirty")
+
+    def __init__(self, kind: str, number: int, start: int):
+        self.kind = kind
+        self.number = number
+        self.start = start
+        self.fields = {}
+        self.current = None     # field that continuation lines append to
+        self.dirty = False      # seen anything beyond the header line
+
+    def add(self, name: str, value: str):
+        if value:
+            self.fields.setdefault(name, []).append(value)
+        self.current = name
+        self.dirty = True
+
+
+class OutputParser:
+
+    __slots__ = ("_tail", "_base", "_block", "_count")
+
+    def __init__(self):
+        self._tail = ""
+        self._base = 0          # absolute offset of _tail[0]
+        self._block = None
+        self._count = 0         # characters consumed so far
+
+    def feed(self, chunk: str) -> list:
+        """
+        Consume the next piece of text; return records completed by it.
+        """
+        emitted = []
+        data = self._tail + chunk if self._tail else chunk
+        self._count += len(chunk)
+        pos = 0
+        find = data.find
+        while True:
+            nl = find("\n", pos)
+            if nl < 0:
+                break
+            self._line(data[pos:nl], self._base + pos, emitted)
+            pos = nl + 1
+        self._tail = data[pos:]
+        self._base += pos
+        return emitted
+
+    def close(self) -> list:
+        """
+        End of input: flush the last (possibly unterminated) line and block.
+        """
+        emitted = []
+        if self._tail:
+            self._line(self._tail, self._base, emitted)
+            self._base += len(self._tail)
+            self._tail = ""
+        self._emit(self._count, emitted)
+        return emitted
+
+    # -------------------------------------------------------------------------
+
+    def _line(self, raw: str, offset: int, out: list):
+        line = raw.strip()
+        if not line:
+            return
+        if "**" in line:
+            line = line.replace("**", "").strip()
+            if not line:
+                return
+
+        if _RULE.match(line):
+            # A rule right under a header is decoration; after content it ends the block
+            if self._block is not None and self._block.dirty:
+                self._emit(offset, out)
+            return
+
+        header = _HEADER.match(line) if line[0] in "#*TtSsMm" else None
+        if header:
+            self._emit(offset, out)
+            if header.group("detection"):
+                self._block = _Block("detection", 0, offset)
+            elif header.group("kind"):
+                block = self._block = _Block(header.group("kind").upper(), int(header.group("number")), offset)
+                archetype = _ARCHETYPE.search(header.group("rest"))
+                if archetype:
+                    block.fields["archetype"] = [archetype.group(1).strip()]
+                block.current = "body"
+            return
+
+        block = self._block
+        if block is None:
+            return
+
+        field = _FIELD.match(line)
+        if field:
+            # Exactly one label group matches, so lastgroup names the field
+            block.add(field.lastgroup, line[field.end():].strip())
+            return
+
+        block.dirty = True
+        current = block.current
+        pattern = _LIST_ITEM.get(current)
+        if pattern is not None:
+            item = pattern.match(line)
+            block.fields.setdefault(current, []).append(item.group(1).strip() if item else line)
+        elif current is not None:
+            # Continuation of a free-text field (question body, wrapped explanation, ...)
+            block.fields.setdefault(current, []).append(line)
+
+    def _emit(self, end: int, out: list):
+        block = self._block
+        self._block = None
+        if block is None or not block.dirty:
+            return
+        f = block.fields
+
+        def text(name):
+            parts = f.get(name)
+            return "\n".join(parts) if parts else None
+
+        if block.kind == "detection":
+            record = TopicDetection(
+                primary_topic=text("topic"), subject=text("subject"), paper=text("paper"),
+                angles=tuple(f.get("angles", ())), start=block.start, end=end,
+            )
+        elif block.kind == "MCQ":
+            record = MCQ(
+                number=block.number, archetype=text("archetype"), question=text("body") or "",
+                answer=text("answer"), trap=text("trap"), explanation=text("explanation"),
+                start=block.start, end=end,
+            )
+        else:
+            record = MainsQuestion(
+                number=block.number, archetype=text("archetype"), question=text("question"),
+                framework=tuple(f.get("framework", ())), must_include=tuple(f.get("must_include", ())),
+                traps_to_avoid=tuple(f.get("avoid", ())), conclude_with=text("conclude"),
+                start=block.start, end=end,
+            )
+        out.append(record)
+
+
+def parse(text: str) -> ParsedOutput:
+    """
+    Parse a complete output in one go.
+    """
+    parser = OutputParser()
+    result = ParsedOutput()
+    for record in parser.feed(text) + parser.close():
+        if isinstance(record, TopicDetection):
+            result.detection = record
+        elif isinstance(record, MCQ):
+            result.mcqs.append(record)
+        else:
+            result.mains.append(record)
+    return result
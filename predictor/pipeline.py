@@ -0,0 +1,106 @@
+"""
+SECTIONAL PIPELINE — detect first, then MCQs and MAINS in parallel
+==================================================================
+A single call writes ~6000 tokens one after another, so latency grows with
+the whole paper. Here a short first call produces the TOPIC DETECTION block,
+then SECTION A and SECTION B are generated concurrently, both conditioned on
+that detection. Wall-clock ≈ detection + the slower of the two sections.
+
+All three calls send the same cached system prompt; only the final user
+instruction differs. The merged text is in exactly the single-call format.
+Detection is short, structured work and can go to a faster model
+(`detection_model`, see predictor.routing).
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from predictor.prompts import (
+    DETECTION_INSTRUCTION,
+    RULE,
+    SECTION_A_HEADER,
+    SECTION_B_HEADER,
+    SECTION_INSTRUCTION,
+)
+
+# Output budgets per step — together they match the single-call MAX_TOKENS
+DETECTION_TOKENS = 600
+MCQ_TOKENS = 2400
+MAINS_TOKENS = 3600
+
+# Both section calls run side by side; shared so we don't spin threads per request
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="sections")
+
+
+@dataclass
+class SectionalResult:
+    text: str
+    stop_reason: str
+    responses: list = field(default_factory=list)   # detection, MCQs, MAINS
+    timings: dict = field(default_factory=dict)     # detection, mcqs, mains, sections, total
+
+
+def _ask(create, source: list, instruction: str, *, model: str, system, max_tokens: int):
+    messages = [{"role": "user", "content": source + [{"type": "text", "text": instruction}]}]
+    return create(model=model, max_tokens=max_tokens, system=system, messages=messages)
+
+
+def _with_header(text: str, header: str) -> str:
+    text = text.strip()
+    # The model sometimes drops the ═ lines; put them back so the merge is exact
+    return text if text.startswith(RULE) else f"{header}\n\n{text}"
+
+
+def generate_sectional(create, source: list, *, model: str, system, detection_model: str = None,
+                       detection_tokens: int = DETECTION_TOKENS,
+                       mcq_tokens: int = MCQ_TOKENS,
+                       mains_tokens: int = MAINS_TOKENS) -> SectionalResult:
+    """
+    Run the three-step pipeline.
+
+    `create` is `client.beta.prompt_caching.messages.create` (or anything with
+    that signature); `source` is the user content describing the topic — a
+    text block, or an image block plus a text block.
+    """
+    started = time.perf_counter()
+
+    detection = _ask(create, source, DETECTION_INSTRUCTION,
+                     model=detection_model or model, system=system, max_tokens=detection_tokens)
+    detection_text = detection.content[0].text.strip()
+    detected = time.perf_counter()
+
+    def section(name: str, header: str, max_tokens: int):
+        instruction = SECTION_INSTRUCTION.format(detection=detection_text, section=name, header=header)
+        response = _ask(create, source, instruction, model=model, system=system, max_tokens=max_tokens)
+        return response, time.perf_counter() - detected
+
+    mcq_future = _executor.submit(section, "SECTION A (the 5 MCQs)", SECTION_A_HEADER, mcq_tokens)
+    mains_future = _executor.submit(section, "SECTION B (the 5 MAINS questions)", SECTION_B_HEADER, mains_tokens)
+    (mcqs, mcq_seconds), (mains, mains_seconds) = mcq_future.result(), mains_future.result()
+    finished = time.perf_counter()
+
+    mains_text = _with_header(mains.content[0].text, SECTION_B_HEADER)
+    if mains_text.endswith(RULE):
+        mains_text = mains_text[:-len(RULE)].rstrip()
+    text = "\n\n".join([
+        detection_text,
+        _with_header(mcqs.content[0].text, SECTION_A_HEADER),
+        mains_text,
+        RULE,
+    ])
+
+    responses = [detection, mcqs, mains]
+    stop_reason = next((r.stop_reason for r in responses if r.stop_reason != "end_turn"), "end_turn")
+    return SectionalResult(
+        text=text,
+        stop_reason=stop_reason,
+        responses=responses,
+        timings={
+            "detection": detected - started,
+            "mcqs": mcq_seconds,
+            "mains": mains_seconds,
+            "sections": finished - detected,
+            "total": finished - started,
+        },
+    )
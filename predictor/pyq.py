@@ -0,0 +1,292 @@
+"""
+PREVIOUS-YEAR QUESTIONS — BM25 retrieval for few-shot grounding
+===============================================================
+The prompt says the model knows UPSC's past papers; this makes it true for
+the topic at hand. The few PYQs closest to a topic are put in front of the
+request so the model sees the real level, framing and option style instead
+of reconstructing them from memory.
+
+Corpus: JSONL, one question per line —
+
+    {"question": "...", "year": 2019, "paper": "Prelims", "subject": "Polity",
+     "options": ["...", "...", "...", "..."], "answer": "b"}
+
+(only "question" is required). build_index() turns it into one compact
+file, which PYQIndex memory-maps:
+
+    header   magic, counts, section offsets
+    terms    sorted vocabulary (utf-8 blob + uint32 offsets)
+    postings per term: uint32 doc ids + float32 BM25 impacts, precomputed
+             at build time (k1, b and document lengths are fixed then)
+    docs     one compact JSON record per question (+ uint32 offsets)
+
+A search is a dictionary lookup per query term, one bincount over their
+postings and a partial sort of the best few — no per-document Python work. Nothing is
+copied out of the map except the k records returned, so every worker
+process shares one page-cached copy.
+
+    python build_pyq_index.py pyqs.jsonl            # → .cache/pyq.idx
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from predictor.similarity import terms
+
+DEFAULT_PATH = os.path.join(".cache", "pyq.idx")
+DEFAULT_K = 4
+K1, B = 1.2, 0.75
+MAX_EXAMPLE_CHARS = 320     # per question in the few-shot block — style, not the full text
+
+MAGIC = b"UPSCPYQ1"
+# magic, docs, terms, postings, then byte offsets of the seven sections
+_HEADER = struct.Struct("<8s3I4x7Q")
+
+EXAMPLES_HEADER = ("Previous-year UPSC questions on related themes — match their level and framing, "
+                   "do not repeat them:")
+
+
+@dataclass
+class PYQ:
+    question: str
+    year: int = None
+    paper: str = None
+    subject: str = None
+    options: list = field(default_factory=list)
+    answer: str = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PYQ":
+        question = data.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise ValueError("no \"question\" string")
+        options = data.get("options") or []
+        if isinstance(options, dict):
+            options = [f"({k}) {v}" for k, v in options.items()]
+        return cls(question=question.strip(), year=data.get("year"), paper=data.get("paper"),
+                   subject=data.get("subject"), options=[str(o) for o in options], answer=data.get("answer"))
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if v not in (None, [], "")}
+
+    def index_text(self) -> str:
+        return " ".join([self.question, *self.options, self.subject or ""])
+
+    def brief(self, max_chars: int = MAX_EXAMPLE_CHARS) -> str:
+        """
+        One line for the few-shot block: [2019 Prelims · Polity] question (a) … (b) …
+        """
+        label = " · ".join(str(x) for x in (self.year, self.paper, self.subject) if x)
+        text = " ".join(self.question.split())
+        if self.options:
+            text += " " + " ".join(" ".join(o.split()) for o in self.options)
+        if len(text) > max_chars:
+            text = text[:max_chars - 1].rstrip() + "…"
+        return f"[{label}] {text}" if label else text
+
+
+def read_corpus(path: str) -> list:
+    """
+    PYQs from a JSONL file; blank lines and # comments are skipped.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                questions.append(PYQ.from_dict(json.loads(line)))
+            except (ValueError, AttributeError) as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+    return questions
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
+    return f.tell()
+
+
+def build_index(questions: list, path: str, *, k1: float = K1, b: float = B) -> dict:
+    """
+    Write the on-disk index for `questions` to `path` (atomically). Returns build stats.
+    """
+    started = time.perf_counter()
+    counts = [Counter(terms(q.index_text())) for q in questions]
+    lengths = np.array([sum(c.values()) for c in counts], dtype=np.float64)
+    avgdl = float(lengths.mean()) if len(lengths) else 1.0
+
+    postings = {}
+    for doc, counter in enumerate(counts):
+        for term, tf in counter.items():
+            postings.setdefault(term, []).append((doc, tf))
+    vocabulary = sorted(postings)
+
+    n = len(questions)
+    term_offsets, term_blob = [0], bytearray()
+    posting_offsets, doc_ids, impacts = [0], [], []
+    for term in vocabulary:
+        term_blob += term.encode("utf-8")
+        term_offsets.append(len(term_blob))
+        entries = postings[term]
+        idf = np.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+        docs = np.array([d for d, _ in entries], dtype=np.uint32)
+        tf = np.array([t for _, t in entries], dtype=np.float64)
+        norm = k1 * (1 - b + b * lengths[docs] / avgdl)
+        doc_ids.append(docs)
+        impacts.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+        posting_offsets.append(posting_offsets[-1] + len(entries))
+
+    doc_offsets, doc_blob = [0], bytearray()
+    for q in questions:
+        doc_blob += json.dumps(q.to_dict(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        doc_offsets.append(len(doc_blob))
+
+    sections = [
+        np.array(term_offsets, dtype=np.uint32).tobytes(),
+        bytes(term_blob),
+        np.array(posting_offsets, dtype=np.uint32).tobytes(),
+        (np.concatenate(doc_ids) if doc_ids else np.zeros(0, np.uint32)).tobytes(),
+        (np.concatenate(impacts) if impacts else np.zeros(0, np.float32)).tobytes(),
+        np.array(doc_offsets, dtype=np.uint32).tobytes(),
+        bytes(doc_blob),
+    ]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        offsets = []
+        for section in sections:
+            offsets.append(_pad(f))
+            f.write(section)
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, n, len(vocabulary), posting_offsets[-1], *offsets))
+    os.replace(tmp, path)
+    return {
+        "questions": n,
+        "terms": len(vocabulary),
+        "postings": posting_offsets[-1],
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+# =============================================================================
+# SEARCH
+# =============================================================================
+
+class PYQIndex:
+    """
+    Read-only, memory-mapped. Thread-safe: searches share nothing mutable
+    except the counters.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path}: not a PYQ index")
+        magic, self.size, n_terms, n_postings, *offsets = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a PYQ index")
+
+        def view(dtype, count, offset):
+            return np.frombuffer(self._map, dtype=dtype, count=count, offset=offset)
+
+        term_offsets = view(np.uint32, n_terms + 1, offsets[0])
+        blob = self._map[offsets[1]:offsets[1] + int(term_offsets[-1])].decode("utf-8")
+        bounds = term_offsets.tolist()
+        # The one thing built in memory: vocabulary → term id (a few ms, once per process)
+        self._vocab = {blob[bounds[i]:bounds[i + 1]]: i for i in range(n_terms)}
+        self._posting_offsets = view(np.uint32, n_terms + 1, offsets[2])
+        self._doc_ids = view(np.uint32, n_postings, offsets[3])
+        self._impacts = view(np.float32, n_postings, offsets[4])
+        self._doc_offsets = view(np.uint32, self.size + 1, offsets[5])
+        self._docs_at = offsets[6]
+
+        # Identifies this exact corpus + parameters; part of the response cache key
+        self.fingerprint = hashlib.sha256(self._map[_HEADER.size:]).hexdigest()[:16]
+
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def document(self, doc: int) -> PYQ:
+        start, end = int(self._doc_offsets[doc]), int(self._doc_offsets[doc + 1])
+        return PYQ.from_dict(json.loads(self._map[self._docs_at + start:self._docs_at + end]))
+
+    def search(self, text: str, k: int = DEFAULT_K) -> list:
+        """
+        The top-k (score, PYQ) by BM25 for `text`, best first. Empty if nothing shares a term.
+        """
+        started = time.perf_counter()
+        ids = {self._vocab[t] for t in terms(text) if t in self._vocab}
+        hits = []
+        if ids and k > 0:
+            bounds = self._posting_offsets
+            spans = [(int(bounds[i]), int(bounds[i + 1])) for i in ids]
+            docs = np.concatenate([self._doc_ids[s:e] for s, e in spans])
+            scores = np.bincount(docs, np.concatenate([self._impacts[s:e] for s, e in spans]), minlength=self.size)
+            # Partitioning every score is the slow part on big corpora; the
+            # top k almost always sit within a fraction of the best one
+            best = scores.max()
+            for cutoff in (0.5 * best, 0.2 * best, 0.0):
+                candidates = np.flatnonzero(scores > cutoff)
+                if len(candidates) >= k or not cutoff:
+                    break
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = candidates[np.argsort(-scores[candidates], kind="stable")]
+            hits = [(float(scores[doc]), self.document(int(doc))) for doc in top]
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - started
+        return hits
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "questions": self.size,
+                "terms": len(self._vocab),
+                "bytes": len(self._map),
+                "searches": self.searches,
+                "mean_search_ms": self.search_seconds / self.searches * 1000 if self.searches else 0.0,
+            }
+
+    def close(self):
+        # Views into the map must be gone before it can close
+        self._posting_offsets = self._doc_ids = self._impacts = self._doc_offsets = None
+        self._map.close()
+
+
+def few_shot(hits: list) -> str:
+    """
+    The compact context block for a search result, or "" for no hits.
+    """
+    if not hits:
+        return ""
+    return "\n".join([EXAMPLES_HEADER, *(f"- {pyq.brief()}" for _, pyq in hits)])
+
+
+def open_index(path: str):
+    """
+    PYQIndex for `path`, or None when no index has been built there.
+    """
+    return PYQIndex(path) if os.path.exists(path) else None
@@ -0,0 +1,395 @@
+"""
+RESILIENCE — deadlines, retries, hedged requests, circuit breaker
+=================================================================
+What stands between one upstream call and the user:
+
+- Deadline: each generation gets one time budget for all its attempts;
+  every attempt's HTTP timeout is what is left of it, so a retry can never
+  push the user past the budget. httpx only bounds each phase (one read
+  between chunks), so a stream that keeps trickling tokens also checks
+  the deadline itself and is cut off when it runs out.
+- Retries: only on errors worth retrying (connection problems, timeouts,
+  429, 5xx / 529), with full-jitter exponential backoff that honours
+  retry-after, and only while the deadline leaves room for another try.
+  The SDK's own retries are off so there is exactly one retry loop.
+- Hedging: if no first token has arrived after the recent p95 time to
+  first token, a duplicate request is sent. For streams, the first lane to
+  produce a token leads and the other is closed at once, so at most one
+  paper's output is paid for. For plain calls, the first lane to finish
+  wins. Capped to a fraction of requests (HEDGE_BUDGET) so an overloaded
+  upstream isn't sent twice the load.
+- Circuit breaker: after FAILURE_THRESHOLD consecutive failed attempts the
+  circuit opens and generations fail fast (the generator then serves the
+  closest cached paper it has) until a probe after RESET_TIMEOUT succeeds.
+"""
+
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import anthropic
+import httpx
+
+from predictor.client import DEFAULT_TIMEOUT
+
+UPSTREAM_DEADLINE = DEFAULT_TIMEOUT.read   # seconds for all attempts of one generation
+MIN_ATTEMPT = 5.0           # don't start an attempt with less budget than this left
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.5          # seconds; full jitter over base · 2^attempt
+BACKOFF_CAP = 8.0
+
+HEDGE_DELAY = 10.0          # before enough samples for a p95
+MIN_HEDGE_DELAY = 0.5
+HEDGE_SAMPLES = 200         # recent first-token times the p95 is taken over
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET = 0.1          # at most this share of calls get a duplicate
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(RuntimeError):
+    """
+    The upstream is considered down; the call was not attempted.
+    """
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    The generation's time budget ran out mid-call. Not retried.
+    """
+
+
+class Cancelled(Exception):
+    """
+    Raised inside a hedged lane that lost the race.
+    """
+
+
+def retryable(error: Exception) -> bool:
+    if isinstance(error, (anthropic.APIConnectionError, httpx.TransportError)):
+        return True     # includes APITimeoutError
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+class Deadline:
+
+    __slots__ = ("expires",)
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def check(self):
+        if not self.remaining():
+            raise DeadlineExceeded("the generation ran out of time")
+
+    def timeout(self) -> httpx.Timeout:
+        """
+        The client's usual timeouts, none longer than what is left.
+        """
+        left = self.remaining()
+        return httpx.Timeout(connect=min(DEFAULT_TIMEOUT.connect, left), read=min(DEFAULT_TIMEOUT.read, left),
+                             write=min(DEFAULT_TIMEOUT.write, left), pool=min(DEFAULT_TIMEOUT.pool, left))
+
+
+class RetryPolicy:
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP,
+                 min_attempt: float = MIN_ATTEMPT):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.min_attempt = min_attempt
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Seconds to wait before attempt number `attempt + 1` (0-based `attempt` just failed).
+        """
+        delay = random.uniform(0.0, min(self.cap, self.base * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response is not None and response.headers.get("retry-after")
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. Thread-safe. In HALF_OPEN exactly one
+    probe is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current()
+
+    def _current(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self._current(), "consecutive_failures": self._failures,
+                    "opened": self.opened, "rejected": self.rejected}
+
+
+class Hedger:
+    """
+    When to send a duplicate: the recent p95 of first-token (streams) or
+    completion (plain calls) times, within a budget.
+    """
+
+    def __init__(self, enabled: bool = False, budget: float = HEDGE_BUDGET, default_delay: float = HEDGE_DELAY):
+        self.enabled = enabled
+        self.budget = budget
+        self.default_delay = default_delay
+        self._lock = threading.Lock()
+        self._samples = {}      # "stream" / "plain" → deque of seconds
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def observe(self, kind: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=HEDGE_SAMPLES)).append(seconds)
+
+    def delay(self, kind: str) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return self.default_delay
+        return max(MIN_HEDGE_DELAY, samples[int(len(samples) * 0.95)])
+
+    def start(self):
+        with self._lock:
+            self.calls += 1
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > max(1.0, self.budget * self.calls):
+                return False
+            self.hedges += 1
+            return True
+
+    def won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "calls": self.calls, "hedges": self.hedges,
+                    "hedge_wins": self.hedge_wins,
+                    **{f"{kind}_samples": len(s) for kind, s in self._samples.items()}}
+
+
+class Lane:
+    """
+    One attempt inside a (possibly) hedged race. The attempt calls
+    first_token() when output starts, progress(text) instead of the caller's
+    on_progress, and check() as it goes; on_cancel, when set, is called from
+    the racing thread to abandon the attempt (e.g. close its HTTP stream).
+    """
+
+    def __init__(self, race: "_Race", index: int):
+        self.race = race
+        self.index = index
+        self.cancelled = threading.Event()
+        self.on_cancel = None
+
+    def first_token(self):
+        self.race.lead(self)
+
+    def progress(self, text: str):
+        self.race.progress(self, text)
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise Cancelled()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.on_cancel is not None:
+            try:
+                self.on_cancel()
+            except Exception:
+                pass
+
+
+class _Race:
+
+    def __init__(self, on_progress=None, threaded: bool = False):
+        self.on_progress = on_progress
+        self.threaded = threaded
+        self.lanes = []
+        self.leader = None
+        self.events = queue.Queue()     # (event, lane, payload, error); only used when threaded
+        self._lock = threading.Lock()
+
+    def lead(self, lane: Lane):
+        with self._lock:
+            if self.leader is not None:
+                return
+            self.leader = lane
+        if self.threaded:
+            self.events.put(("lead", lane, None, None))
+
+    def progress(self, lane: Lane, text: str):
+        if not self.on_progress or self.leader not in (None, lane):
+            return
+        if self.threaded:
+            self.events.put(("progress", lane, text, None))     # UI hooks run on the caller's thread
+        else:
+            self.on_progress(text)
+
+
+def hedged(attempt, *, kind: str, hedger: Hedger, on_progress=None, allow_hedge=lambda: True) -> tuple:
+    """
+    Run `attempt(lane)`; if it hasn't produced a first token (kind "stream")
+    or finished (kind "plain") within the hedge delay, start one duplicate.
+    A stream lane that produces the first token wins and the other is
+    cancelled; for plain calls the first to finish wins. Returns (result,
+    hedged). If every lane fails, raises the first real (not cancelled) error.
+    """
+    if not hedger.enabled:
+        return attempt(Lane(_Race(on_progress), 0)), False
+
+    race = _Race(on_progress, threaded=True)
+    started = time.monotonic()
+    hedger.start()
+
+    def run(lane):
+        try:
+            result, error = attempt(lane), None
+        except BaseException as e:      # handed to the waiting thread
+            result, error = None, Cancelled() if lane.cancelled.is_set() else e
+        race.events.put(("done", lane, result, error))
+
+    def launch():
+        lane = Lane(race, len(race.lanes))
+        race.lanes.append(lane)
+        threading.Thread(target=run, args=(lane,), name=f"hedge-{lane.index}", daemon=True).start()
+
+    def cancel_others(winner):
+        for lane in race.lanes:
+            if lane is not winner:
+                lane.cancel()
+
+    launch()
+    running, failure = 1, None
+    hedge_at = started + hedger.delay(kind)
+    while True:
+        waiting = hedge_at is not None and race.leader is None
+        try:
+            event, lane, payload, error = race.events.get(
+                timeout=max(hedge_at - time.monotonic(), 0.0) if waiting else None)
+        except queue.Empty:
+            if allow_hedge() and hedger.take():
+                launch()
+                running += 1
+            hedge_at = None     # one duplicate at most
+            continue
+        if event == "progress":
+            if race.leader in (None, lane):
+                on_progress(payload)
+        elif event == "lead":
+            if lane.index == 0:
+                hedger.observe(kind, time.monotonic() - started)
+            cancel_others(lane)
+        elif error is None:
+            if kind == "plain" and lane.index == 0:
+                hedger.observe(kind, time.monotonic() - started)
+            if lane.index > 0:
+                hedger.won()
+            cancel_others(lane)
+            return payload, len(race.lanes) > 1
+        else:
+            running -= 1
+            if not isinstance(error, Cancelled):
+                failure = failure or error
+            if running == 0:
+                raise failure or error
+
+
+def call_with_retries(attempt, *, deadline: Deadline, policy: RetryPolicy, breaker: CircuitBreaker,
+                      on_retry=None):
+    """
+    `attempt(timeout)` — an httpx.Timeout inside the deadline — until it succeeds, fails with something not worth
+    retrying, runs out of attempts or would overrun the deadline. Feeds the
+    breaker; raises CircuitOpen without calling when the circuit is open.
+    Returns (result, attempts made).
+    """
+    for number in itertools.count():
+        if not breaker.allow():
+            raise CircuitOpen("upstream circuit is open")
+        try:
+            result = attempt(deadline.timeout())
+        except Exception as e:
+            if not retryable(e):
+                if isinstance(e, anthropic.APIStatusError):
+                    breaker.success()   # the upstream answered; the request itself was bad
+                raise                   # anything else says nothing about the upstream
+            breaker.failure()
+            delay = policy.backoff(number, e)
+            if number + 1 >= policy.max_attempts or deadline.remaining() - delay < policy.min_attempt:
+                raise
+            if on_retry:
+                on_retry(number + 1, delay, e)
+            time.sleep(delay)
+            continue
+        breaker.success()
+        return result, number + 1
@@ -0,0 +1,193 @@
+"""
+ROUTING — which model, and how many output tokens, per request
+==============================================================
+Two decisions that used to be constants (one model, max_tokens=6000):
+
+- Model tier per pricing plan. A route names the tier for lightweight
+  sub-tasks (the sectional pipeline's topic detection) and the tier for the
+  questions themselves. Tiers map to models (TIERS); plans map to routes
+  (ROUTES). Both can be overridden from the environment:
+
+      UPSC_TIERS="fast=claude-3-5-haiku-20241022,standard=claude-sonnet-4-20250514"
+      UPSC_ROUTES="trial=fast:standard,premium=standard:standard"
+
+- max_tokens per kind of call (a text topic, a screenshot, each pipeline
+  step), set from the output lengths actually observed: p99 of recent
+  complete answers plus HEADROOM, never above the old fixed budget. Until
+  MIN_SAMPLES answers have been seen, and for a while after any answer is
+  cut off at max_tokens, the fixed budget is used. A tighter budget is what
+  admission control reserves against the tokens-per-minute limit, so more
+  generations fit in the same minute.
+
+Latency and tokens of every upstream call are recorded per tier through
+predictor.telemetry ("call" events, upsc_tier_* metrics); telemetry_report.py
+summarises them.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+from predictor.pipeline import DETECTION_TOKENS, MAINS_TOKENS, MCQ_TOKENS
+
+FAST, STANDARD, PREMIUM = "fast", "standard", "premium"
+
+TIERS = {
+    FAST: "claude-3-5-haiku-20241022",
+    STANDARD: "claude-sonnet-4-20250514",
+    PREMIUM: "claude-opus-4-20250514",
+}
+
+# Kinds of call with their own output budget; values are the fixed budgets (the ceilings)
+TEXT, IMAGE, DETECTION, MCQS, MAINS = "text", "image", "detection", "mcqs", "mains"
+MAX_TOKENS = 6000
+CEILINGS = {TEXT: MAX_TOKENS, IMAGE: MAX_TOKENS, DETECTION: DETECTION_TOKENS, MCQS: MCQ_TOKENS, MAINS: MAINS_TOKENS}
+
+HEADROOM = 1.25         # budget = p99 of observed output × this
+MIN_SAMPLES = 30        # complete answers of a kind before its budget adapts
+WINDOW = 500            # recent answers the p99 is taken over
+FLOOR = 0.25            # never below this share of the ceiling
+
+
+@dataclass(frozen=True)
+class Route:
+    detection: str      # tier for topic detection (pipeline step 1)
+    paper: str          # tier for the questions: the single call, both sections and repairs
+
+
+DEFAULT_PLAN = "trial"
+
+# Plan names follow the credit packs on the page (predictor.ledger.PLAN_CREDITS)
+ROUTES = {
+    "trial": Route(FAST, STANDARD),
+    "try": Route(FAST, STANDARD),
+    "starter": Route(FAST, STANDARD),
+    "pro": Route(FAST, STANDARD),
+    "premium": Route(STANDARD, STANDARD),
+}
+
+
+def parse_tiers(spec: str) -> dict:
+    """
+    "fast=model-a,standard=model-b" → {"fast": "model-a", ...}
+    """
+    tiers = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        tier, _, model = item.partition("=")
+        if not model:
+            raise ValueError(f"expected tier=model, got {item!r}")
+        tiers[tier.strip()] = model.strip()
+    return tiers
+
+
+def parse_routes(spec: str) -> dict:
+    """
+    "trial=fast:standard,premium=standard:standard" → {"trial": Route("fast", "standard"), ...}
+    """
+    routes = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        plan, _, tiers = item.partition("=")
+        detection, _, paper = tiers.partition(":")
+        if not detection or not paper:
+            raise ValueError(f"expected plan=detection_tier:paper_tier, got {item!r}")
+        routes[plan.strip()] = Route(detection.strip(), paper.strip())
+    return routes
+
+
+class TokenBudget:
+    """
+    Adaptive max_tokens per kind of call. Thread-safe.
+    """
+
+    def __init__(self, ceilings: dict = None, *, headroom: float = HEADROOM, min_samples: int = MIN_SAMPLES,
+                 window: int = WINDOW, floor: float = FLOOR):
+        self.ceilings = dict(CEILINGS if ceilings is None else ceilings)
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.window = window
+        self.floor = floor
+        self._lock = threading.Lock()
+        self._samples = {kind: deque(maxlen=window) for kind in self.ceilings}
+        self._relaxed = dict.fromkeys(self.ceilings, 0)     # answers left at the ceiling after a cut-off
+        self._budgets = dict(self.ceilings)
+        self.truncated = dict.fromkeys(self.ceilings, 0)
+
+    def max_tokens(self, kind: str) -> int:
+        with self._lock:
+            return self._budgets[kind]
+
+    def observe(self, kind: str, output_tokens: int, stop_reason: str):
+        with self._lock:
+            if stop_reason == "max_tokens":
+                # The answer wanted more than we gave it: back to the full budget for a while
+                self.truncated[kind] += 1
+                self._relaxed[kind] = self.min_samples
+            elif stop_reason == "end_turn":
+                self._samples[kind].append(output_tokens)
+                self._relaxed[kind] = max(self._relaxed[kind] - 1, 0)
+            self._budgets[kind] = self._budget(kind)
+
+    def _budget(self, kind: str) -> int:
+        ceiling = self.ceilings[kind]
+        samples = self._samples[kind]
+        if self._relaxed[kind] or len(samples) < self.min_samples:
+            return ceiling
+        p99 = sorted(samples)[min(int(len(samples) * 0.99), len(samples) - 1)]
+        return min(ceiling, max(int(ceiling * self.floor), math.ceil(p99 * self.headroom)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {kind: {"max_tokens": self._budgets[kind], "ceiling": self.ceilings[kind],
+                           "samples": len(self._samples[kind]), "truncated": self.truncated[kind]}
+                    for kind in self.ceilings}
+
+
+class Router:
+    """
+    Plan → models, and the token budgets. One per Generator.
+    """
+
+    def __init__(self, tiers: dict = None, routes: dict = None, default_plan: str = DEFAULT_PLAN,
+                 budget: TokenBudget = None):
+        self.tiers = dict(TIERS if tiers is None else tiers)
+        self.routes = dict(ROUTES if routes is None else routes)
+        self.default_plan = default_plan
+        self.budget = budget or TokenBudget()
+        for plan, route in self.routes.items():
+            for tier in (route.detection, route.paper):
+                if tier not in self.tiers:
+                    raise ValueError(f"plan {plan!r} routes to unknown tier {tier!r}")
+        if default_plan not in self.routes:
+            raise ValueError(f"default plan {default_plan!r} has no route")
+
+    @classmethod
+    def from_env(cls, env=None) -> "Router":
+        """
+        UPSC_TIERS and UPSC_ROUTES (see the module docstring) on top of the defaults.
+        """
+        env = env or os.environ.get
+        return cls(tiers={**TIERS, **parse_tiers(env("UPSC_TIERS", ""))},
+                   routes={**ROUTES, **parse_routes(env("UPSC_ROUTES", ""))},
+                   default_plan=env("UPSC_DEFAULT_PLAN", DEFAULT_PLAN))
+
+    @classmethod
+    def single(cls, model: str, max_tokens: int = MAX_TOKENS) -> "Router":
+        """
+        Everything on one model with the fixed budgets — the behaviour before routing.
+        """
+        ceilings = dict(CEILINGS, **{TEXT: max_tokens, IMAGE: max_tokens})
+        return cls(tiers={STANDARD: model}, routes={DEFAULT_PLAN: Route(STANDARD, STANDARD)},
+                   budget=TokenBudget(ceilings, min_samples=10 ** 9))
+
+    def route(self, plan: str = None) -> Route:
+        return self.routes.get(plan or self.default_plan) or self.routes[self.default_plan]
+
+    def model(self, tier: str) -> str:
+        return self.tiers[tier]
+
+    def stats(self) -> dict:
+        return {"tiers": self.tiers,
+                "routes": {plan: [route.detection, route.paper] for plan, route in self.routes.items()},
+                "default_plan": self.default_plan, "budgets": self.budget.stats()}
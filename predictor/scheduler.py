@@ -0,0 +1,291 @@
+"""
+ADMISSION CONTROL — one queue in front of the API for the whole process
+=======================================================================
+Every Streamlit session runs its own script thread, so without this nothing
+stops 40 sessions from calling the API at once and all getting 429s.
+
+- Token buckets for requests/min and tokens/min (estimates up front,
+  reconciled with real usage when the request finishes)
+- At most `max_concurrency` generations in flight
+- FIFO per session, round-robin across sessions — one user mashing the
+  button can't starve everyone else
+- A global pause when the API says 429 / 529, honouring `retry-after`
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Statuses the API uses for "slow down": rate limited, overloaded
+BACKOFF_STATUSES = (429, 529)
+DEFAULT_BACKOFF = 10.0      # seconds, when the response carries no retry-after
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `per_minute / 60` per second.
+    Balance may go negative when actual usage exceeds the estimate (debt).
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute if capacity is None else capacity
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_take(self, amount: float, now: float) -> bool:
+        self._refill(now)
+        # Requests bigger than the whole bucket would never fit — let them through on a full bucket
+        if self.tokens >= min(amount, self.capacity):
+            self.tokens -= amount
+            return True
+        return False
+
+    def adjust(self, delta: float, now: float):
+        self._refill(now)
+        self.tokens -= delta
+
+    def time_until(self, amount: float, now: float) -> float:
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0.0) / self.rate
+
+
+class Ticket:
+    """
+    One queued generation. Opaque to callers apart from the timestamps.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, session_id: str, est_tokens: int):
+        self.id = next(self._ids)
+        self.session_id = session_id
+        self.est_tokens = est_tokens
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+        self.cancelled = False
+
+    @property
+    def queue_wait(self) -> float:
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+class QueueTimeout(Exception):
+    """
+    Waited longer than allowed for a slot.
+    """
+
+
+class AdmissionController:
+
+    def __init__(self, max_concurrency: int = 8, requests_per_min: float = 50,
+                 tokens_per_min: float = 200_000, expected_service_time: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min)
+
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()    # session_id -> deque[Ticket], in round-robin order
+        self._active = 0
+        self._paused_until = 0.0
+        self._service_time = expected_service_time   # EWMA of admitted -> released
+
+        self.admitted = 0
+        self.rejected = 0
+        self.backoffs = 0
+
+    # -------------------------------------------------------------------------
+    # Queue
+    # -------------------------------------------------------------------------
+
+    def submit(self, session_id: str, est_tokens: int) -> Ticket:
+        ticket = Ticket(session_id, est_tokens)
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    def wait(self, ticket: Ticket, timeout: float) -> bool:
+        """
+        Block up to `timeout` seconds for `ticket` to be admitted.
+        Returns False on timeout so the caller can refresh its UI and wait again.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._dispatch()
+                if ticket.admitted_at is not None:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # Wake on release/submit, or when a bucket / pause may have opened up
+                self._cond.wait(min(remaining, max(self._next_opening(), 0.05)))
+
+    def cancel(self, ticket: Ticket) -> bool:
+        """
+        Withdraw a queued ticket. False if it was admitted in the meantime.
+        """
+        with self._cond:
+            queue = self._queues.get(ticket.session_id)
+            if not queue or ticket not in queue:
+                return False
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session_id]
+            ticket.cancelled = True
+            self.rejected += 1
+            self._cond.notify_all()
+            return True
+
+    def release(self, ticket: Ticket, actual_tokens: int = None):
+        """
+        Free the slot. Pass the real token count to settle the estimate.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._active -= 1
+            if actual_tokens is not None:
+                self.tokens.adjust(actual_tokens - ticket.est_tokens, now)
+            self._service_time = 0.8 * self._service_time + 0.2 * (now - ticket.admitted_at)
+            self._dispatch()
+            self._cond.notify_all()
+
+    def acquire(self, session_id: str, est_tokens: int, timeout: float, on_wait=None) -> Ticket:
+        """
+        Submit and block until admitted. `on_wait(ticket)` is called about
+        twice a second while queued (to show position / ETA).
+        """
+        ticket = self.submit(session_id, est_tokens)
+        deadline = time.monotonic() + timeout
+        while not self.wait(ticket, 0.5):
+            if time.monotonic() >= deadline and self.cancel(ticket):
+                raise QueueTimeout(f"no slot within {timeout:.0f}s")
+            if on_wait:
+                on_wait(ticket)
+        return ticket
+
+    # -------------------------------------------------------------------------
+    # Upstream feedback
+    # -------------------------------------------------------------------------
+
+    def backoff(self, seconds: float):
+        """
+        Stop admitting anything new for `seconds`.
+        """
+        with self._cond:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self.backoffs += 1
+
+    def observe_response(self, status: int, headers) -> None:
+        """
+        Feed every upstream HTTP response through here (see httpx event hooks);
+        429 / 529 pause admission for `retry-after` seconds.
+        """
+        if status not in BACKOFF_STATUSES:
+            return
+        try:
+            seconds = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            seconds = DEFAULT_BACKOFF
+        self.backoff(seconds)
+
+    # -------------------------------------------------------------------------
+    # Introspection for the UI
+    # -------------------------------------------------------------------------
+
+    def position(self, ticket: Ticket) -> int:
+        """
+        1-based place in the dispatch order (0 once admitted / cancelled).
+        """
+        with self._cond:
+            for i, queued in enumerate(self._dispatch_order(), start=1):
+                if queued is ticket:
+                    return i
+        return 0
+
+    def estimated_wait(self, ticket: Ticket) -> float:
+        """
+        Rough seconds until admission: queue waves ahead of us, rate limits, pause.
+        """
+        position = self.position(ticket)
+        if position == 0:
+            return 0.0
+        now = time.monotonic()
+        with self._cond:
+            free = self.max_concurrency - self._active
+            waves = math.ceil(max(position - free, 0) / self.max_concurrency)
+            rate_wait = max(
+                self.requests.time_until(position, now),
+                self.tokens.time_until(ticket.est_tokens * position, now),
+            )
+            pause = max(self._paused_until - now, 0.0)
+            return max(waves * self._service_time, rate_wait, pause)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "backoffs": self.backoffs,
+                "paused_for": max(self._paused_until - time.monotonic(), 0.0),
+            }
+
+    # -------------------------------------------------------------------------
+    # Internals (call with self._cond held)
+    # -------------------------------------------------------------------------
+
+    def _dispatch_order(self):
+        # Round-robin: each session's 1st ticket, then each session's 2nd, ...
+        queues = list(self._queues.values())
+        for depth in itertools.count():
+            row = [q[depth] for q in queues if len(q) > depth]
+            if not row:
+                return
+            yield from row
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._queues and self._active < self.max_concurrency and now >= self._paused_until:
+            session_id, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            if not self.requests.try_take(1, now):
+                return
+            if not self.tokens.try_take(ticket.est_tokens, now):
+                self.requests.adjust(-1, now)   # give the request token back
+                return
+            queue.popleft()
+            # This session had its turn — move it to the back of the line
+            del self._queues[session_id]
+            if queue:
+                self._queues[session_id] = queue
+            ticket.admitted_at = now
+            self._active += 1
+            self.admitted += 1
+            self._cond.notify_all()
+
+    def _next_opening(self) -> float:
+        if not self._queues:
+            return 1.0
+        now = time.monotonic()
+        head = next(iter(self._queues.values()))[0]
+        opening = max(
+            self._paused_until - now,
+            self.requests.time_until(1, now),
+            self.tokens.time_until(head.est_tokens, now),
+        )
+        if opening <= 0 and self._active >= self.max_concurrency:
+            return 1.0  # only a release can help, and release() notifies
+        return opening
@@ -0,0 +1,342 @@
+"""
+NEAR-DUPLICATE TOPICS — paraphrased headlines hit the cache too
+===============================================================
+"Governor delays NEET bill in Tamil Nadu", "TN governor NEET bill delay"
+and "NEET bill – TN Governor withholding assent" are one story. The exact
+cache key misses all but the first; this index maps the others onto it.
+
+Scoring is IDF-weighted cosine over normalized word tokens:
+
+- lowercased, punctuation dropped, light suffix stemming (delays → delay,
+  withholding → withhold, notified → notify), stopwords removed
+- common abbreviations expanded (TN → tamil nadu, SC → supreme court,
+  UCC → uniform civil code)
+- IDF is computed at query time from live document frequencies, so rare
+  words ("neet", "nicobar") dominate and "india", "government" barely count
+
+Cosine alone can't tell "Supreme Court upholds electoral bonds" from "…strikes
+down electoral bonds": same actors, one verb apart. Outcome words and Indian
+states are also read as facets (FACETS, STATES), and a stored topic that
+says something else on a facet the query names — upheld vs struck down,
+Kerala vs Tamil Nadu — is never matched, whatever its score.
+
+Lookup never walks the corpus: dot products come from the query tokens'
+posting lists alone, and only documents whose dot product could still
+clear the threshold get their norms computed.
+Everything is array-backed (array('i') postings, one flat int32 token
+array with offsets) so 100k topics take a few MB and a lookup stays well
+under a millisecond.
+"""
+
+import math
+import re
+import threading
+from array import array
+from dataclasses import dataclass
+
+import numpy as np
+
+from predictor.cache import normalize_topic
+
+DEFAULT_THRESHOLD = 0.70      # bench_similarity: first false match at 0.60 (100k topics) / 0.50 (200)
+
+_WORD = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an the of in on at to for from by with and or as is are was were be been its it this that
+over after before amid against into about under new news latest today says said report
+per cent percent
+""".split())
+
+# Expanded before stemming; keep to abbreviations that are unambiguous in news headlines
+ABBREVIATIONS = {
+    "tn": "tamil nadu", "up": "uttar pradesh", "ap": "andhra pradesh", "hp": "himachal pradesh",
+    "wb": "west bengal", "j&k": "jammu kashmir", "jk": "jammu kashmir", "uk": "united kingdom",
+    "us": "united states", "usa": "united states", "sc": "supreme court", "hc": "high court",
+    "eci": "election commission", "ec": "election commission", "cec": "chief election commissioner",
+    "govt": "government", "gov": "government", "guv": "governor", "pm": "prime minister",
+    "cm": "chief minister", "fm": "finance minister", "bn": "billion", "cr": "crore",
+    # acronyms the syllabus keeps coming back to
+    "ucc": "uniform civil code", "caa": "citizenship amendment act", "nrc": "national register citizens",
+    "dpdp": "digital personal data protection", "onoe": "one nation one election",
+    "jpc": "joint parliamentary committee", "mpc": "monetary policy committee",
+    "fta": "free trade agreement", "glof": "glacial lake outburst flood", "lac": "line actual control",
+}
+
+# Outcome facets: axis → value → words (stemmed like topic text). Two topics
+# with values on the same axis but none in common are different news.
+FACETS = {
+    "decision": {
+        "for": "upholds upheld gives given grants approves clears passes adopts ratifies signs",
+        "against": "strikes struck quashes unconstitutional rejects defeats denies refuses withholds delays "
+                   "returns vetoes scraps scrapped stalls",
+        "tabled": "introduces tabled",
+    },
+    "level": {
+        "up": "raises hikes hiked increases",
+        "down": "cuts slashes reduces lowers",
+        "same": "unchanged keeps kept holds paused",
+    },
+    "tension": {
+        "up": "escalates escalation standoff clashes",
+        "down": "disengagement disengages eases truce ceasefire",
+    },
+    "status": {
+        "in force": "declares imposes",
+        "ended": "lifts revokes ends",
+    },
+}
+
+STATES = {
+    "tamil nadu": "tamil nadu", "uttar pradesh": "uttar", "andhra pradesh": "andhra",
+    "himachal pradesh": "himachal", "madhya pradesh": "madhya", "arunachal pradesh": "arunachal",
+    "west bengal": "bengal", "jammu kashmir": "jammu kashmir",
+    **{state: state for state in """kerala karnataka telangana maharashtra gujarat rajasthan punjab haryana
+        bihar odisha jharkhand chhattisgarh goa assam manipur mizoram nagaland meghalaya tripura sikkim
+        uttarakhand ladakh delhi puducherry""".split()},
+}
+
+
+def _stem(word: str) -> str:
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith(("ies", "ied")) and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith(("sses", "shes", "ches", "xes")):
+        word = word[:-2]
+    elif word.endswith("ing") and len(word) > 5:
+        word = word[:-3]
+    elif word.endswith("ed") and len(word) > 4:
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    # declare / declared / declares all end up "declar"
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def terms(text: str) -> list:
+    """
+    Normalized content words of `text`, in order, repeats kept.
+    """
+    words = []
+    for word in _WORD.findall(normalize_topic(text).replace("j&k", "jk")):
+        for part in ABBREVIATIONS.get(word, word).split():
+            if part not in STOPWORDS:
+                words.append(_stem(part))
+    return words
+
+
+def tokenize(topic: str) -> list:
+    """
+    Sorted, de-duplicated content tokens of a topic.
+    """
+    return sorted(set(terms(topic)))
+
+
+# token → (axis, value), built with the same normalization as topics
+_FACET_OF = {token: (axis, value) for axis, values in FACETS.items()
+             for value, words in values.items() for token in terms(words)}
+_FACET_OF.update({token: ("state", state) for state, words in STATES.items() for token in terms(words)})
+
+
+def facets(tokens) -> dict:
+    """
+    {axis: frozenset of values} named by a topic's tokens.
+    """
+    found = {}
+    for token in tokens:
+        facet = _FACET_OF.get(token)
+        if facet:
+            found.setdefault(facet[0], set()).add(facet[1])
+    return {axis: frozenset(values) for axis, values in found.items()}
+
+
+def conflicting(a: dict, b: dict) -> bool:
+    """
+    True if two topics say different things on an axis both of them name.
+    """
+    return any(axis in b and not values & b[axis] for axis, values in a.items())
+
+
+@dataclass
+class Match:
+    key: str
+    topic: str
+    score: float
+
+
+class _IntArray:
+    """
+    Growable numpy int array (amortized doubling).
+    """
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        n = len(values)
+        if self.size + n > len(self.data):
+            grown = np.zeros(max(len(self.data) * 2, self.size + n), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:self.size + n] = values
+        self.size += n
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class TopicIndex:
+    """
+    Thread-safe. add() topics with the cache key their answer lives under;
+    lookup() returns the best stored topic above the threshold, if any.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._vocab = {}                        # token -> id
+        self._df = _IntArray(np.int32)          # id -> live documents containing it
+        self._postings = []                     # id -> array('i') of doc ids
+        self._tokens = _IntArray(np.int32)      # all documents' token ids, back to back
+        self._offsets = _IntArray(np.int64)     # doc i = _tokens[_offsets[i]:_offsets[i + 1]]
+        self._offsets.extend([0])
+        self._alive = _IntArray(np.int8)
+        self._keys = []                         # doc id -> cache key
+        self._topics = []                       # doc id -> original topic text
+        self._facets = []                       # doc id -> facets(tokens)
+        self._by_key = {}                       # cache key -> doc id
+        self.live = 0
+        self.lookups = 0
+        self.matches = 0
+        self.conflicts = 0                      # lookups where a facet clash turned down the best candidate
+
+    def __len__(self) -> int:
+        return self.live
+
+    def add(self, topic: str, key: str):
+        tokens = tokenize(topic)
+        if not tokens:
+            return
+        with self._lock:
+            if key in self._by_key:
+                if self._topics[self._by_key[key]] == topic:
+                    return
+                self._remove(self._by_key[key])
+            doc = len(self._keys)
+            ids = []
+            for token in tokens:
+                token_id = self._vocab.get(token)
+                if token_id is None:
+                    token_id = self._vocab[token] = len(self._postings)
+                    self._postings.append(array("i"))
+                    self._df.extend([0])
+                ids.append(token_id)
+                self._postings[token_id].append(doc)
+            ids = np.array(ids, dtype=np.int32)
+            self._df.data[ids] += 1
+            self._tokens.extend(ids)
+            self._offsets.extend([self._tokens.size])
+            self._alive.extend([1])
+            self._keys.append(key)
+            self._topics.append(topic)
+            self._facets.append(facets(tokens))
+            self._by_key[key] = doc
+            self.live += 1
+
+    def remove(self, key: str):
+        """
+        Forget a topic (its cached answer expired or was evicted).
+        """
+        with self._lock:
+            doc = self._by_key.get(key)
+            if doc is not None:
+                self._remove(doc)
+
+    def _remove(self, doc: int):
+        # Tombstone; postings keep the id and skip it at lookup time
+        self._alive.data[doc] = 0
+        offsets = self._offsets.data
+        self._df.data[self._tokens.data[offsets[doc]:offsets[doc + 1]]] -= 1
+        del self._by_key[self._keys[doc]]
+        self.live -= 1
+
+    def lookup(self, topic: str, threshold: float = None) -> Match:
+        threshold = self.threshold if threshold is None else threshold
+        tokens = tokenize(topic)
+        with self._lock:
+            self.lookups += 1
+            if not tokens or not self.live:
+                return None
+            n = self.live
+            df = self._df.data
+
+            # Query weights; words we've never seen get the maximum IDF
+            known, unknown_weight = [], 0.0
+            for token in tokens:
+                token_id = self._vocab.get(token)
+                count = df[token_id] if token_id is not None else 0
+                weight = math.log((n + 1) / (count + 1)) + 1.0
+                if count:
+                    known.append((weight, token_id))
+                else:
+                    unknown_weight += weight * weight
+            if not known:
+                return None
+            known.sort(reverse=True)
+            query_norm = math.sqrt(sum(w * w for w, _ in known) + unknown_weight)
+
+            # Exact dot products for every document at once: a shared token
+            # has the same weight on both sides, so each posting contributes
+            # weight^2. One bincount over the query's postings, no sorting.
+            postings = [np.frombuffer(self._postings[t], dtype=np.int32) for _, t in known]
+            dots = np.bincount(np.concatenate(postings),
+                               np.repeat([w * w for w, _ in known], [len(p) for p in postings]),
+                               minlength=len(self._keys))
+            # |doc| >= sqrt(dot), so score >= threshold needs dot >= (threshold * |query|)^2.
+            # That discards nearly everything before the per-document work below.
+            candidates = np.flatnonzero((dots >= (threshold * query_norm) ** 2) & (self._alive.view() == 1))
+            if not len(candidates):
+                return None
+
+            # Document norms under the current IDF, for the survivors only
+            offsets = self._offsets.data
+            starts, ends = offsets[candidates], offsets[candidates + 1]
+            lengths = ends - starts
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            weights = np.log((n + 1) / (df[self._tokens.data[positions]] + 1.0)) + 1.0
+            owner = np.repeat(np.arange(len(candidates)), lengths)
+            doc_norms = np.sqrt(np.bincount(owner, weights * weights, minlength=len(candidates)))
+            scores = dots[candidates] / (doc_norms * query_norm)
+
+            # Best score first, skipping stored topics that contradict the query
+            wanted = facets(tokens)
+            for best in np.argsort(-scores):
+                score = float(scores[best])
+                if score < threshold:
+                    break
+                doc = int(candidates[best])
+                if wanted and conflicting(wanted, self._facets[doc]):
+                    self.conflicts += 1
+                    continue
+                self.matches += 1
+                return Match(key=self._keys[doc], topic=self._topics[doc], score=score)
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "topics": self.live,
+                "vocabulary": len(self._vocab),
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "conflicts": self.conflicts,
+                "match_rate": self.matches / self.lookups if self.lookups else 0.0,
+            }
@@ -0,0 +1,458 @@
+"""
+TELEMETRY — one structured event per request, written off the hot path
+======================================================================
+Every generation (and every credit outcome the page settles) becomes one
+JSON line:
+
+    {"ts": 1760790000.1, "event": "generation", "request_id": "…", "outcome": "upstream",
+     "mode": "stream", "input": "text", "queue_wait": 0.0, "ttft": 1.8, "total": 21.4,
+     "input_tokens": 1890, "output_tokens": 5120, "cache_read_input_tokens": 3900, …}
+
+    {"ts": …, "event": "credit", "request_id": "…", "outcome": "committed"}
+
+Each upstream call behind a generation (one, or three for the sectional
+pipeline, plus any repair) is also a "call" event with its model tier, task,
+max_tokens, seconds and tokens — the data predictor.routing is tuned from.
+The page's background jobs (predictor.jobs) add "job" events: started,
+completed, failed, abandoned (finished with nobody watching), recovered
+(picked up by a session that came back) and expired.
+
+emit() only puts the event on a bounded in-memory queue; a background
+thread batches them into a size-rotated JSONL file (events.jsonl →
+events.jsonl.1 → …). A full queue drops events (counted) rather than slow
+a request down. The same events feed in-process counters and histograms,
+served in Prometheus text format by api_server.py's /metrics or, for the
+Streamlit process, a small HTTP server on UPSC_METRICS_PORT.
+
+    python telemetry_report.py              # p50/p95/p99 and cost per day
+
+Outcomes: upstream (paid call), cache (exact hit), similar (paraphrase hit),
+coalesced (joined an identical in-flight call), degraded (upstream down, the
+closest cached paper served instead), error.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# {pid}: one file per process — rotation isn't safe with two writers on one file
+DEFAULT_PATH = os.path.join(".cache", "telemetry", "events-{pid}.jsonl")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+QUEUE_SIZE = 10_000
+FLUSH_INTERVAL = 1.0        # seconds an event may sit in memory before it is written
+
+# Histogram buckets, seconds: cache hits land in the first few, upstream calls in the rest
+BUCKETS = (0.005, 0.025, 0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180)
+
+GENERATION = "generation"
+CREDIT = "credit"
+CALL = "call"
+JOB = "job"
+
+# outcome values
+UPSTREAM = "upstream"
+CACHE = "cache"
+SIMILAR = "similar"
+COALESCED = "coalesced"
+DEGRADED = "degraded"
+ERROR = "error"
+
+_TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+_TOKEN_KINDS = dict(zip(_TOKEN_FIELDS, ("input", "output", "cache_write", "cache_read")))
+
+
+class Histogram:
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str) -> list:
+        out, running = [], 0
+        sep = "," if labels else ""
+        for bound, n in zip(BUCKETS, self.counts):
+            running += n
+            out.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {running}')
+        out.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels}}} {self.sum:.6f}" if labels else f"{name}_sum {self.sum:.6f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}" if labels else f"{name}_count {self.count}")
+        return out
+
+
+def generation_event(result, *, request_id: str = None, session_id: str = None, model: str = None,
+                     image=None, mode: str = None, plan: str = None) -> dict:
+    """
+    The event for one GenerationResult (predictor.core).
+    """
+    timings = result.timings or {}
+    if result.error_kind:
+        outcome = ERROR
+    elif timings.get("degraded"):
+        outcome = DEGRADED
+    elif timings.get("similar_to"):
+        outcome = SIMILAR
+    elif timings.get("cached"):
+        outcome = CACHE
+    elif timings.get("coalesced"):
+        outcome = COALESCED
+    else:
+        outcome = UPSTREAM
+    event = {
+        "event": GENERATION,
+        "request_id": request_id,
+        "session": session_id,
+        "outcome": outcome,
+        "mode": mode,
+        "input": "image" if image is not None else "text",
+        "model": model,
+    }
+    if plan:
+        event["plan"] = plan
+    if result.error_kind:
+        event["error_kind"] = result.error_kind
+        event["error"] = result.error
+    for name in ("queue_wait", "ttft", "total"):
+        if timings.get(name) is not None:
+            event[name] = round(timings[name], 4)
+    if timings.get("repaired"):
+        event["repaired"] = timings["repaired"]
+    if timings.get("attempts", 0) > 1:
+        event["attempts"] = timings["attempts"]
+    if timings.get("hedged"):
+        event["hedged"] = True
+    usage = result.usage
+    if usage is not None:
+        event["model"] = usage.model or model
+        event["stop_reason"] = usage.stop_reason
+        for name in _TOKEN_FIELDS:
+            event[name] = getattr(usage, name)
+        event["cost_usd"] = round(usage.cost(batch=mode == "batch"), 6)    # exact even across tiers
+    if image is not None:
+        event["image_bytes"] = len(image.data)
+        event["image_original_bytes"] = image.original_bytes
+    return event
+
+
+class Telemetry:
+    """
+    Thread-safe. `path=None` keeps the metrics but writes no file.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, *, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backups: int = DEFAULT_BACKUPS, queue_size: int = QUEUE_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.path = path and path.format(pid=os.getpid())
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._outcomes = {}         # (outcome, error_kind) → count
+        self._credits = {}          # outcome → count
+        self._jobs = {}             # outcome → count
+        self._tokens = dict.fromkeys(_TOKEN_FIELDS, 0)
+        self._image_bytes = {"original": 0, "sent": 0}
+        self._retries = {"retried": 0, "hedged": 0}    # extra upstream calls, by why
+        self._calls = {}            # (tier, task) → Histogram of seconds
+        self._tier_tokens = {}      # (tier, kind) → tokens
+        self._latency = {}          # outcome → Histogram
+        self._ttft = Histogram()
+        self._queue_wait = Histogram()
+        self._gauges = []
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+
+        self._queue = None
+        self._writer = None
+        self._server = None
+        if self.path:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._flushed = threading.Condition(self._lock)
+            self._writer = threading.Thread(target=self._write_loop, name="telemetry-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)     # the writer is a daemon; don't lose the last second of events
+
+    @classmethod
+    def from_env(cls) -> "Telemetry":
+        """
+        UPSC_TELEMETRY (path; "off" to keep metrics only), UPSC_TELEMETRY_MAX_MB,
+        UPSC_TELEMETRY_BACKUPS, UPSC_METRICS_PORT (serve /metrics from this process).
+        """
+        env = os.environ.get
+        path = env("UPSC_TELEMETRY", DEFAULT_PATH)
+        telemetry = cls(
+            None if path.lower() in ("", "off", "0", "none") else path,
+            max_bytes=int(float(env("UPSC_TELEMETRY_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024),
+            backups=int(env("UPSC_TELEMETRY_BACKUPS", DEFAULT_BACKUPS)),
+        )
+        if env("UPSC_METRICS_PORT"):
+            telemetry.serve_metrics(int(env("UPSC_METRICS_PORT")), env("UPSC_METRICS_HOST", "127.0.0.1"))
+        return telemetry
+
+    # -------------------------------------------------------------------------
+    # EVENTS
+    # -------------------------------------------------------------------------
+
+    def emit(self, event: str, **fields):
+        """
+        Record one event. Never blocks and never raises.
+        """
+        record = {"ts": round(time.time(), 3), "event": event, **fields}
+        self._count(record)
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def generation(self, result, **context):
+        """
+        Emit the event for a GenerationResult; see generation_event() for `context`.
+        """
+        event = generation_event(result, **context)
+        self.emit(event.pop("event"), **event)
+
+    def call(self, *, tier: str, task: str, seconds: float, usage, max_tokens: int, session_id: str = ""):
+        """
+        One upstream call: which tier did which task, how long it took and what it used.
+        """
+        self.emit(CALL, session=session_id, tier=tier, task=task, model=usage.model, max_tokens=max_tokens,
+                  seconds=round(seconds, 4), stop_reason=usage.stop_reason,
+                  **{name: getattr(usage, name) for name in _TOKEN_FIELDS})
+
+    def credit(self, outcome: str, request_id: str = None, **fields):
+        """
+        How the page settled a paid click: committed, refunded or refused.
+        """
+        self.emit(CREDIT, request_id=request_id, outcome=outcome, **fields)
+
+    def job(self, outcome: str, **fields):
+        """
+        A background generation job changed state (see predictor.jobs).
+        """
+        self.emit(JOB, outcome=outcome, **fields)
+
+    def _count(self, record: dict):
+        with self._lock:
+            self.emitted += 1
+            if record["event"] == CREDIT:
+                self._credits[record["outcome"]] = self._credits.get(record["outcome"], 0) + 1
+                return
+            if record["event"] == JOB:
+                self._jobs[record["outcome"]] = self._jobs.get(record["outcome"], 0) + 1
+                return
+            if record["event"] == CALL:
+                tier = record["tier"]
+                self._calls.setdefault((tier, record["task"]), Histogram()).observe(record["seconds"])
+                for name in _TOKEN_FIELDS:
+                    key = (tier, _TOKEN_KINDS[name])
+                    self._tier_tokens[key] = self._tier_tokens.get(key, 0) + record.get(name, 0)
+                return
+            if record["event"] != GENERATION:
+                return
+            outcome = record["outcome"]
+            key = (outcome, record.get("error_kind", ""))
+            self._outcomes[key] = self._outcomes.get(key, 0) + 1
+            if "total" in record:
+                self._latency.setdefault(outcome, Histogram()).observe(record["total"])
+            if outcome == UPSTREAM:
+                # Only a stream has a first token; otherwise ttft is just the total
+                if record.get("mode") == "stream" and record.get("ttft") is not None:
+                    self._ttft.observe(record["ttft"])
+                self._queue_wait.observe(record.get("queue_wait", 0.0))
+            for name in _TOKEN_FIELDS:
+                self._tokens[name] += record.get(name, 0)
+            hedged = int(record.get("hedged", False))
+            self._retries["hedged"] += hedged
+            self._retries["retried"] += max(record.get("attempts", 1) - 1 - hedged, 0)
+            if "image_bytes" in record:
+                self._image_bytes["sent"] += record["image_bytes"]
+                self._image_bytes["original"] += record["image_original_bytes"]
+
+    # -------------------------------------------------------------------------
+    # SINK
+    # -------------------------------------------------------------------------
+
+    def _write_loop(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a", encoding="utf-8")
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [r for r in batch if r is not None]
+            if records:
+                try:
+                    f.write("".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n"
+                                    for r in records))
+                    f.flush()
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "a", encoding="utf-8")
+                except OSError:
+                    with self._lock:
+                        self.write_errors += 1
+            with self._lock:
+                self.written += len(records)
+                self._flushed.notify_all()
+            if stop:
+                f.close()
+                return
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for n in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{n}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{n + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until everything emitted so far is on disk (tests, shutdown).
+        """
+        if self._queue is None:
+            return True
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self.written + self.dropped < self.emitted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    # -------------------------------------------------------------------------
+    # METRICS
+    # -------------------------------------------------------------------------
+
+    def add_gauges(self, collect):
+        """
+        `collect()` → {name: (help, value)}, read at every scrape (e.g. queue depth).
+        """
+        self._gauges.append(collect)
+
+    def metrics_text(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("upsc_generations_total", "counter", "Generations by outcome (upstream, cache, similar, coalesced, degraded, error).")
+            for (outcome, error_kind), n in sorted(self._outcomes.items()):
+                lines.append(f'upsc_generations_total{{outcome="{outcome}",error_kind="{error_kind}"}} {n}')
+            family("upsc_generation_seconds", "histogram", "End-to-end generation time by outcome.")
+            for outcome, histogram in sorted(self._latency.items()):
+                lines += histogram.lines("upsc_generation_seconds", f'outcome="{outcome}"')
+            family("upsc_upstream_ttft_seconds", "histogram", "Time to first token of streamed upstream calls.")
+            lines += self._ttft.lines("upsc_upstream_ttft_seconds", "")
+            family("upsc_queue_wait_seconds", "histogram", "Time upstream calls waited for admission.")
+            lines += self._queue_wait.lines("upsc_queue_wait_seconds", "")
+            family("upsc_extra_upstream_calls_total", "counter", "Upstream calls beyond the first, by reason.")
+            for reason, n in self._retries.items():
+                lines.append(f'upsc_extra_upstream_calls_total{{reason="{reason}"}} {n}')
+            family("upsc_tier_call_seconds", "histogram", "Upstream call time by model tier and task.")
+            for (tier, task), histogram in sorted(self._calls.items()):
+                lines += histogram.lines("upsc_tier_call_seconds", f'tier="{tier}",task="{task}"')
+            family("upsc_tier_tokens_total", "counter", "Tokens billed by model tier and kind.")
+            for (tier, kind), n in sorted(self._tier_tokens.items()):
+                lines.append(f'upsc_tier_tokens_total{{tier="{tier}",kind="{kind}"}} {n}')
+            family("upsc_tokens_total", "counter", "Tokens billed, by kind.")
+            for name, n in self._tokens.items():
+                lines.append(f'upsc_tokens_total{{kind="{_TOKEN_KINDS[name]}"}} {n}')
+            family("upsc_image_bytes_total", "counter", "Screenshot bytes as uploaded and as sent upstream.")
+            for stage, n in self._image_bytes.items():
+                lines.append(f'upsc_image_bytes_total{{stage="{stage}"}} {n}')
+            family("upsc_credits_total", "counter", "Paid clicks by how the credit was settled.")
+            for outcome, n in sorted(self._credits.items()):
+                lines.append(f'upsc_credits_total{{outcome="{outcome}"}} {n}')
+            family("upsc_jobs_total", "counter", "Background generation jobs by outcome (started, completed, failed, abandoned, recovered, expired).")
+            for outcome, n in sorted(self._jobs.items()):
+                lines.append(f'upsc_jobs_total{{outcome="{outcome}"}} {n}')
+            family("upsc_telemetry_dropped_total", "counter", "Events dropped because the writer fell behind.")
+            lines.append(f"upsc_telemetry_dropped_total {self.dropped}")
+            gauges = list(self._gauges)
+        for collect in gauges:
+            for name, (help_text, value) in collect().items():
+                family(name, "gauge", help_text)
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, port: int, host: str = "127.0.0.1"):
+        """
+        Serve GET /metrics on a daemon thread (for processes without their own HTTP server).
+        """
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.metrics_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "emitted": self.emitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "write_errors": self.write_errors,
+            }
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._writer is not None:
+            self._queue.put(None)       # blocking: the last events must not be dropped
+            self._writer.join(timeout=10)
+            self._writer = None
@@ -0,0 +1,126 @@
+"""
+USAGE RECORDS — what each generation actually cost
+==================================================
+One UsageRecord per upstream call (straight from `response.usage`), plus a
+process-wide UsageTotals so we can see how much of the input is being
+served from the prompt cache, and what it all cost in dollars.
+"""
+
+import threading
+from dataclasses import asdict, dataclass
+
+# USD per million tokens: input, output, cache write, cache read
+PRICES = {
+    "claude-sonnet-4-20250514": (3.00, 15.00, 3.75, 0.30),
+    "claude-3-5-haiku-20241022": (0.80, 4.00, 1.00, 0.08),
+    "claude-opus-4-20250514": (15.00, 75.00, 18.75, 1.50),
+}
+DEFAULT_PRICES = PRICES["claude-sonnet-4-20250514"]     # unknown / mock models
+BATCH_DISCOUNT = 0.5        # Message Batches API: half price
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int, cache_creation_input_tokens: int = 0,
+             cache_read_input_tokens: int = 0, *, batch: bool = False) -> float:
+    """
+    List-price cost of one call (or a sum of calls to the same model).
+    """
+    prices = PRICES.get(model, DEFAULT_PRICES)
+    tokens = (input_tokens, output_tokens, cache_creation_input_tokens, cache_read_input_tokens)
+    cost = sum(n * price for n, price in zip(tokens, prices)) / 1e6
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+@dataclass
+class UsageRecord:
+    model: str = ""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    stop_reason: str = None
+    cost_usd: float = None      # set when calls to different models were combined
+
+    @classmethod
+    def from_message(cls, message) -> "UsageRecord":
+        """
+        Build from an SDK Message (plain or prompt-caching beta).
+        Older responses have no cache fields at all — treat them as 0.
+        """
+        usage = message.usage
+        return cls(
+            model=message.model,
+            input_tokens=usage.input_tokens or 0,
+            output_tokens=usage.output_tokens or 0,
+            cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+            cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+            stop_reason=message.stop_reason,
+        )
+
+    @classmethod
+    def combine(cls, records: list) -> "UsageRecord":
+        """
+        Sum several calls that together made one paper (e.g. the sectional pipeline).
+        The stop reason is the first one that isn't end_turn, if any. `model`
+        is the last call's (the questions, not the detection step); the cost
+        is summed call by call, so it stays right when the models differ.
+        """
+        models = {r.model for r in records}
+        return cls(
+            model=records[-1].model if records else "",
+            input_tokens=sum(r.input_tokens for r in records),
+            output_tokens=sum(r.output_tokens for r in records),
+            cache_creation_input_tokens=sum(r.cache_creation_input_tokens for r in records),
+            cache_read_input_tokens=sum(r.cache_read_input_tokens for r in records),
+            stop_reason=next((r.stop_reason for r in records if r.stop_reason != "end_turn"), "end_turn"),
+            cost_usd=(sum(r.cost() for r in records)
+                      if len(models) > 1 or any(r.cost_usd is not None for r in records) else None),
+        )
+
+    @property
+    def total_input_tokens(self) -> int:
+        # input_tokens only counts the uncached part of the prompt
+        return self.input_tokens + self.cache_creation_input_tokens + self.cache_read_input_tokens
+
+    def cost(self, *, batch: bool = False) -> float:
+        if self.cost_usd is not None:
+            return self.cost_usd * BATCH_DISCOUNT if batch else self.cost_usd
+        return cost_usd(self.model, self.input_tokens, self.output_tokens, self.cache_creation_input_tokens,
+                        self.cache_read_input_tokens, batch=batch)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class UsageTotals:
+    """
+    Running sums across every request in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+
+    def add(self, record: UsageRecord):
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += record.input_tokens
+            self.output_tokens += record.output_tokens
+            self.cache_creation_input_tokens += record.cache_creation_input_tokens
+            self.cache_read_input_tokens += record.cache_read_input_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            prompt = self.input_tokens + self.cache_creation_input_tokens + self.cache_read_input_tokens
+            return {
+                "requests": self.requests,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cache_creation_input_tokens": self.cache_creation_input_tokens,
+                "cache_read_input_tokens": self.cache_read_input_tokens,
+                # Share of all prompt tokens that came out of the prompt cache
+                "prompt_cache_read_ratio": (self.cache_read_input_tokens / prompt) if prompt else 0.0,
+            }
@@ -0,0 +1,253 @@
+"""
+VALIDATION + TARGETED REPAIR
+============================
+Checks a generated paper against the format in the system prompt and, when
+questions are missing or malformed, re-asks for ONLY those questions in a
+small follow-up call and splices them back in — instead of paying for a
+whole new 6000-token generation.
+
+Checked per question:
+- MCQ 1-5 and MAINS 1-5 all present
+- MCQ: question text, an answer naming option (a)-(d), a trap code in the
+  known T-01…T-32 set, an archetype shaped like P-01 (or P-01/P-06)
+- MAINS: question text, an archetype shaped like EVAL-PC-3D-H, an answer
+  framework and must-includes
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+
+from predictor.parser import parse, ParsedOutput
+from predictor.prompts import RULE, SECTION_B_HEADER
+
+EXPECTED_MCQS = 5
+EXPECTED_MAINS = 5
+KNOWN_TRAPS = frozenset(f"T-{n:02d}" for n in range(1, 33))
+
+_MCQ_ARCHETYPE = re.compile(r"^P-\d{2}(?:\s*/\s*P-\d{2})*$")
+_MAINS_ARCHETYPE = re.compile(r"^[A-Z]{2,5}-[A-Z]{2,3}-\dD-[A-Z]\b")
+# "(c)", "c)", "c", "C.", "Option (c)", "option c: …" — the prompt only asks for "[Correct option]"
+_ANSWER_OPTION = re.compile(r"^(?:option\s*)?\(?[a-d][).:]?(?:\s|$)", re.I)
+
+# Rough output cost of one question, for sizing the repair call
+TOKENS_PER_MCQ = 450
+TOKENS_PER_MAINS = 700
+
+REPAIR_INSTRUCTION = """A previous answer for this topic had some questions missing or malformed.
+The topic detection was:
+
+{detection}
+
+Write ONLY these questions again, in the exact output format specified: {wanted}.
+Start each one with its header line (e.g. "{example}") and write nothing else — no section headers, no other questions."""
+
+
+@dataclass
+class Issue:
+    kind: str           # "MCQ" / "MAINS" / "detection"
+    number: int         # 0 for detection
+    problems: list
+
+    def __str__(self):
+        label = "Topic detection" if self.kind == "detection" else f"{self.kind} {self.number}"
+        return f"{label}: {', '.join(self.problems)}"
+
+
+@dataclass
+class ValidationReport:
+    parsed: ParsedOutput
+    issues: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    @property
+    def to_repair(self) -> list:
+        # Questions only — a shaky detection block alone isn't worth a call
+        return [i for i in self.issues if i.kind != "detection"]
+
+
+# =============================================================================
+# VALIDATION
+# =============================================================================
+
+def _check_mcq(mcq) -> list:
+    problems = []
+    if not mcq.question.strip():
+        problems.append("no question text")
+    if not mcq.answer or not _ANSWER_OPTION.match(mcq.answer.strip()):
+        problems.append("no answer option")
+    if mcq.trap_code not in KNOWN_TRAPS:
+        problems.append(f"unknown trap code {mcq.trap_code}" if mcq.trap_code else "no trap code")
+    if not mcq.archetype or not _MCQ_ARCHETYPE.match(mcq.archetype.strip()):
+        problems.append("bad archetype code")
+    return problems
+
+
+def _check_mains(mains) -> list:
+    problems = []
+    if not mains.question:
+        problems.append("no question text")
+    if not mains.archetype or not _MAINS_ARCHETYPE.match(mains.archetype.strip()):
+        problems.append("bad archetype code")
+    if not mains.framework:
+        problems.append("no answer framework")
+    if not mains.must_include:
+        problems.append("no must-includes")
+    return problems
+
+
+def _check_section(kind: str, records: list, expected: int, check) -> list:
+    issues = []
+    seen = {}
+    for record in records:
+        seen.setdefault(record.number, record)   # duplicates: the first one counts
+    for number in range(1, expected + 1):
+        record = seen.get(number)
+        problems = ["missing"] if record is None else check(record)
+        if problems:
+            issues.append(Issue(kind, number, problems))
+    return issues
+
+
+def validate(text: str) -> ValidationReport:
+    parsed = parse(text)
+    report = ValidationReport(parsed)
+
+    detection = parsed.detection
+    if detection is None:
+        report.issues.append(Issue("detection", 0, ["missing"]))
+    else:
+        problems = [name for name, value in (("no subject", detection.subject), ("no paper", detection.paper))
+                    if not value]
+        if len(detection.angles) < 3:
+            problems.append(f"{len(detection.angles)} cross-subject angles")
+        if problems:
+            report.issues.append(Issue("detection", 0, problems))
+
+    report.issues += _check_section("MCQ", parsed.mcqs, EXPECTED_MCQS, _check_mcq)
+    report.issues += _check_section("MAINS", parsed.mains, EXPECTED_MAINS, _check_mains)
+    return report
+
+
+# =============================================================================
+# REPAIR
+# =============================================================================
+
+def repair_budget(report: ValidationReport) -> int:
+    return sum(TOKENS_PER_MCQ if i.kind == "MCQ" else TOKENS_PER_MAINS for i in report.to_repair) + 200
+
+
+def repair_instruction(text: str, report: ValidationReport) -> str:
+    detection = report.parsed.detection
+    wanted = [f"{i.kind} {i.number}" for i in report.to_repair]
+    return REPAIR_INSTRUCTION.format(
+        detection=text[detection.start:detection.end].strip() if detection else "(not available)",
+        wanted=", ".join(wanted),
+        example=f"{wanted[0]}:",
+    )
+
+
+def _insert_point(text: str, parsed: ParsedOutput, kind: str, number: int) -> int:
+    records = parsed.mcqs if kind == "MCQ" else parsed.mains
+    before = [r for r in records if r.number < number]
+    if before:
+        return max(before, key=lambda r: r.number).end
+    after = [r for r in records if r.number > number]
+    if after:
+        return min(after, key=lambda r: r.number).start
+    # Nothing from this section survived: MCQs go before section B, MAINS before the closing rule
+    if kind == "MCQ":
+        at = text.find(SECTION_B_HEADER)
+        if at >= 0:
+            return at
+        return parsed.mains[0].start if parsed.mains else len(text)
+    tail = text.rstrip()
+    return tail.rfind(RULE) if tail.endswith(RULE) else len(text)
+
+
+def splice(text: str, report: ValidationReport, repair_text: str) -> tuple:
+    """
+    Put repaired questions into `text`. Returns (new_text, questions_spliced).
+    """
+    wanted = {(i.kind, i.number) for i in report.to_repair}
+    repaired = parse(repair_text)
+
+    edits = []      # (start, end, number, replacement) against the original text
+    for kind, fresh_records, old_records in (("MCQ", repaired.mcqs, report.parsed.mcqs),
+                                             ("MAINS", repaired.mains, report.parsed.mains)):
+        old = {}
+        for record in old_records:
+            old.setdefault(record.number, record)
+        for fresh in fresh_records:
+            if (kind, fresh.number) not in wanted:
+                continue
+            wanted.discard((kind, fresh.number))
+            block = repair_text[fresh.start:fresh.end].strip() + "\n\n"
+            if fresh.number in old:
+                edits.append((old[fresh.number].start, old[fresh.number].end, fresh.number, block))
+            else:
+                at = _insert_point(text, report.parsed, kind, fresh.number)
+                edits.append((at, at, fresh.number, block))
+
+    # Apply back to front so earlier offsets stay valid; at a shared insert
+    # point the higher number goes in first so the lower one lands before it
+    for start, end, _, block in sorted(edits, key=lambda e: (e[0], e[2]), reverse=True):
+        text = text[:start] + block + text[end:]
+    return text, len(edits)
+
+
+def repair(create, source: list, text: str, report: ValidationReport, *, model: str, system) -> tuple:
+    """
+    One follow-up call for everything in report.to_repair.
+    Returns (spliced_text, questions_spliced, response).
+    """
+    instruction = repair_instruction(text, report)
+    response = create(
+        model=model,
+        max_tokens=repair_budget(report),
+        system=system,
+        messages=[{"role": "user", "content": source + [{"type": "text", "text": instruction}]}],
+    )
+    new_text, spliced = splice(text, report, response.content[0].text)
+    return new_text, spliced, response
+
+
+class RepairStats:
+    """
+    How often papers need fixing, and what targeted repair saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.needed_repair = 0
+        self.questions_repaired = 0
+        self.still_broken = 0
+        self.repair_output_tokens = 0
+        self.full_output_tokens = 0     # what regenerating the whole paper would have cost
+
+    def record(self, needed: bool, repaired: int = 0, still_broken: bool = False,
+               repair_tokens: int = 0, full_tokens: int = 0):
+        with self._lock:
+            self.checked += 1
+            if needed:
+                self.needed_repair += 1
+                self.questions_repaired += repaired
+                self.still_broken += still_broken
+                self.repair_output_tokens += repair_tokens
+                self.full_output_tokens += full_tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "needed_repair": self.needed_repair,
+                "repair_rate": self.needed_repair / self.checked if self.checked else 0.0,
+                "questions_repaired": self.questions_repaired,
+                "still_broken": self.still_broken,
+                "repair_output_tokens": self.repair_output_tokens,
+                "tokens_saved": self.full_output_tokens - self.repair_output_tokens,
+            }
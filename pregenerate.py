@@ -0,0 +1,75 @@
+"""
+UPSC MULTI-ANGLE PREDICTOR — OFF-PEAK PRE-GENERATION
+====================================================
+Generate the day's expected topics into the response cache before anyone
+asks, so the first daytime user gets a warm hit.
+
+    python pregenerate.py topics.txt                    # 4 at a time, live API
+    python pregenerate.py topics.jsonl --concurrency 8
+    python pregenerate.py topics.txt --batch            # Message Batches API (half price, slower)
+
+topics.txt has one topic per line; .jsonl lines are {"topic": "..."}.
+Safe to re-run at any time: cached topics are skipped, and a --batch run
+that crashed picks up its submitted job from the state file.
+
+Uses the same UPSC_* settings (cache path, rate limits) as the app — run it
+on the host whose cache the app reads, e.g. from cron at 05:30.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+
+from predictor.batch import DEFAULT_POLL_INTERVAL, read_topics, run_concurrent, run_message_batch
+from predictor.core import Generator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate topics into the response cache")
+    parser.add_argument("topics", help="file with one topic per line, or JSONL")
+    parser.add_argument("--concurrency", type=int, default=4, help="generations at once (live mode)")
+    parser.add_argument("--pipeline", action="store_true", help="use the sectional pipeline (live mode)")
+    parser.add_argument("--batch", action="store_true", help="submit one Message Batches API job instead")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between batch polls")
+    parser.add_argument("--state", help="batch state file (default: next to the cache, per topics file)")
+    args = parser.parse_args()
+
+    try:
+        topics = read_topics(args.topics)
+    except (OSError, ValueError) as e:
+        sys.exit(f"error: {e}")
+
+    generator = Generator.from_env(max_workers=args.concurrency)
+    if not generator.api_key:
+        sys.exit("error: ANTHROPIC_API_KEY is not set")
+    print(f"{len(topics)} topics from {args.topics}")
+
+    def show(topic, result):
+        mark = "ok " if result.ok else "ERR"
+        detail = f"{result.timings['total']:.1f}s" if result.ok else result.error
+        print(f"  {mark} {topic[:70]:70}  {detail}", flush=True)
+
+    if args.batch:
+        default_state = os.path.join(
+            os.path.dirname(generator.cache.path) or ".",
+            f"pregenerate-{hashlib.sha256(os.path.abspath(args.topics).encode()).hexdigest()[:12]}.json",
+        )
+        report = run_message_batch(
+            generator, topics, state_path=args.state or default_state, poll_interval=args.poll,
+            on_status=lambda b: print(f"  batch {b.id}: {b.processing_status} "
+                                      f"({b.request_counts.succeeded} done, {b.request_counts.processing} left)",
+                                      flush=True),
+            on_result=show,
+        )
+    else:
+        report = run_concurrent(generator, topics, concurrency=args.concurrency,
+                                pipeline=args.pipeline, on_result=show)
+
+    print(report.summary())
+    generator.close()
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
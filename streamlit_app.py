@@ -10,11 +10,18 @@ Version: 1.0
 """
 
 import streamlit as st
-import anthropic
-import base64
 from datetime import datetime
-import json
-import re
+import os
+import time
+import uuid
+
+import page_sections
+import paper_cards
+from predictor.core import CAPACITY, OVERLOADED, Generator
+from predictor.exports import FORMATS as EXPORT_FORMATS, ExportStore
+from predictor.images import PreparedImage, prepare as prepare_image
+from predictor.jobs import Job, JobStore
+from predictor.ledger import COMMITTED, DEFAULT_PATH as LEDGER_PATH, InsufficientCredits, Ledger, open_ledger
 
 # =============================================================================
 # PAGE CONFIGURATION
@@ -28,389 +35,348 @@ st.set_page_config(
 )
 
 # =============================================================================
-# CUSTOM CSS — Makes it look professional
+# SESSION STATE INITIALIZATION
 # =============================================================================
 
-st.markdown("""
-<style>
-    /* Main container */
-    .main {
-        padding: 1rem 2rem;
-    }
-    
-    /* Header styling */
-    .hero-title {
-        font-size: 2.5rem;
-        font-weight: 700;
-        color: #1a365d;
-        text-align: center;
-        margin-bottom: 0;
-    }
-    
-    .hero-subtitle {
-        font-size: 1.3rem;
-        color: #e53e3e;
-        text-align: center;
-        margin-top: 0.5rem;
-    }
-    
-    .chai-tagline {
-        background: linear-gradient(135deg, #f6e05e 0%, #ed8936 100%);
-        padding: 1rem 2rem;
-        border-radius: 10px;
-        text-align: center;
-        margin: 1.5rem 0;
-    }
-    
-    .chai-tagline h2 {
-        color: #744210;
-        margin: 0;
-        font-size: 1.5rem;
-    }
-    
-    /* Question cards */
-    .question-card {
-        background: #f7fafc;
-        border-left: 4px solid #3182ce;
-        padding: 1rem;
-        margin: 1rem 0;
-        border-radius: 0 8px 8px 0;
-    }
-    
-    .mcq-card {
-        border-left-color: #38a169;
-    }
-    
-    .mains-card {
-        border-left-color: #805ad5;
-    }
-    
-    .trap-alert {
-        background: #fff5f5;
-        border: 1px solid #fc8181;
-        padding: 0.5rem 1rem;
-        border-radius: 5px;
-        margin: 0.5rem 0;
-        font-size: 0.9rem;
-    }
-    
-    /* Pricing cards */
-    .pricing-card {
-        background: white;
-        border: 2px solid #e2e8f0;
-        border-radius: 10px;
-        padding: 1.5rem;
-        text-align: center;
-        transition: transform 0.2s;
-    }
+@st.cache_resource
+def get_ledger() -> Ledger:
+    """
+    Credits, query counts and history, shared by every session and replica
+    (UPSC_LEDGER: a path or sqlite:/// URL).
+    """
+    return open_ledger(os.environ.get("UPSC_LEDGER", LEDGER_PATH))
+
+
+def get_api_key() -> str:
+    """
+    Works with both Streamlit Cloud and Hugging Face Spaces.
+    """
+    api_key = None
     
-    .pricing-card:hover {
-        transform: translateY(-5px);
-        border-color: #3182ce;
-    }
+    # Try Streamlit secrets first
+    try:
+        api_key = st.secrets["ANTHROPIC_API_KEY"]
+    except:
+        pass
     
-    .pricing-card.featured {
-        border-color: #ed8936;
-        background: #fffaf0;
-    }
+    # Try environment variable (Hugging Face uses this)
+    if not api_key:
+        api_key = os.environ.get("ANTHROPIC_API_KEY")
     
-    .price-tag {
-        font-size: 2rem;
-        font-weight: 700;
-        color: #2d3748;
-    }
+    return api_key
+
+
+@st.cache_resource
+def get_generator() -> Generator:
+    """
+    One generation core per process, shared by every session: response cache,
+    admission queue, coalescing and the pooled client all live in here.
+    Configured from the UPSC_* environment variables.
+    """
+    return Generator.from_env(get_api_key())
+
+
+@st.cache_resource
+def get_jobs() -> JobStore:
+    """
+    Background generation jobs, shared by every session: a paper keeps being
+    written through a refresh, a dropped connection or a rerun, and the
+    session that comes back picks it up (predictor.jobs; UPSC_JOBS,
+    UPSC_JOB_RETENTION_HOURS). A job failed on behalf of a crashed or
+    stalled process gets its credit back here — its own settle never ran.
+    """
+    telemetry = get_generator().telemetry
+    ledger = get_ledger()
     
-    /* Footer */
-    .footer {
-        text-align: center;
-        padding: 2rem;
-        color: #718096;
-        font-size: 0.9rem;
-    }
+    def refund(job: Job):
+        ledger.refund(hold_key(job.owner, job.id))
+        telemetry.credit("refunded", job.id)
     
-    /* Hide Streamlit branding */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-</style>
-""", unsafe_allow_html=True)
+    jobs = JobStore.from_env(telemetry, on_interrupted=refund)
+    telemetry.add_gauges(jobs.gauges)
+    return jobs
 
-# =============================================================================
-# SESSION STATE INITIALIZATION
-# =============================================================================
 
-if 'credits' not in st.session_state:
-    st.session_state.credits = 2  # Free credits for trial
+def hold_key(account: str, request_id: str) -> str:
+    """
+    The ledger reservation behind one paid click.
+    """
+    return f"{account}:{request_id}"
 
-if 'query_history' not in st.session_state:
-    st.session_state.query_history = []
 
-if 'total_queries' not in st.session_state:
-    st.session_state.total_queries = 0
+def running_hold(key: str) -> bool:
+    """
+    A hold whose click's job is still running: not stale, however long it
+    has waited (a crashed process's jobs are refunded through get_jobs()).
+    """
+    _, _, request_id = key.rpartition(":")
+    job = get_jobs().get(request_id)
+    return job is not None and not job.finished
+
+
+def get_account() -> str:
+    """
+    The visitor's ledger account. Kept in the URL (?account=...) so a
+    refresh or a bookmark comes back to the same credits.
+    """
+    account = st.query_params.get("account")
+    if not account:
+        account = uuid.uuid4().hex
+        st.query_params["account"] = account
+    return account
+
+
+ACCOUNT = get_account()
+
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # fair-queueing identity
+    get_ledger().open_account(ACCOUNT)              # free trial credits, first visit only
+    get_ledger().refund_stale(keep=running_hold)    # holds left behind by a crashed process
+    st.session_state.plan = get_ledger().plan(ACCOUNT)      # picks the model tiers (predictor.routing)
+
+if 'click_id' not in st.session_state:
+    st.session_state.click_id = uuid.uuid4().hex    # idempotency key for the next paid click
+
+# Past papers: only the latest page is held in the session; older pages are
+# read from the ledger while they're on screen, full papers only on re-open
+HISTORY_PAGE = 8
+
+if 'recent_history' not in st.session_state:
+    st.session_state.recent_history = get_ledger().history(ACCOUNT, HISTORY_PAGE)
+    st.session_state.history_page = 0
+    st.session_state.paper = None       # (output_hash, label, timings) on screen; timings None = re-opened
+
+credits, total_queries = get_ledger().balance(ACCOUNT)
 
 # =============================================================================
 # SIDEBAR — Credits & Pricing
 # =============================================================================
 
 with st.sidebar:
-    st.markdown("## ☕ Your Credits")
-    st.markdown(f"### **{st.session_state.credits}** queries left")
+    st.markdown(f"## ☕ Your Credits\n### **{credits}** queries left")
     
-    if st.session_state.credits <= 1:
+    if credits <= 1:
         st.warning("Running low! Add more credits below.")
     
-    st.markdown("---")
-    
-    st.markdown("## 💰 Add Credits")
-    
     # Pricing options
-    st.markdown("""
-    | Plan | Price | Credits |
-    |------|-------|---------|
-    | ☕ **Try** | ₹15 | 1 |
-    | 📚 Starter | ₹149 | 10 |
-    | 🎯 Pro | ₹499 | 40 |
-    | 🏆 Premium | ₹899 | 80 |
-    """)
+    st.markdown(page_sections.SIDEBAR_PLANS)
     
     # Payment button (placeholder - connect to Razorpay)
     if st.button("🛒 Buy Credits", use_container_width=True):
         st.info("Payment integration coming soon! For now, email us at support@upscpredictor.com")
     
-    st.markdown("---")
-    
-    st.markdown("## 📊 Your Stats")
-    st.markdown(f"Total queries: **{st.session_state.total_queries}**")
+    st.markdown(f"---\n## 📊 Your Stats\nTotal queries: **{total_queries}**\n\n---")
     
-    st.markdown("---")
+    # Filled in at the end of the script, so a paper generated on this run is already listed
+    history_panel = st.container()
     
-    st.markdown("### 🔗 Quick Links")
-    st.markdown("- [Sample Output (PDF)](#)")
-    st.markdown("- [How it Works](#how-it-works)")
-    st.markdown("- [Contact Us](#)")
+    st.markdown(page_sections.SIDEBAR_LINKS)
 
 # =============================================================================
 # MAIN CONTENT — Hero Section
 # =============================================================================
 
-st.markdown('<h1 class="hero-title">UPSC Multi-Angle Predictor</h1>', unsafe_allow_html=True)
-st.markdown('<p class="hero-subtitle">One Topic → 10 Questions → 5 GS Papers</p>', unsafe_allow_html=True)
-
-st.markdown("""
-<div class="chai-tagline">
-    <h2>☕ ₹15 = Price of One Chai = 10 UPSC Questions</h2>
-    <p style="margin:0.5rem 0 0 0; color:#744210;">Skip the chai. Crack the exam.</p>
-</div>
-""", unsafe_allow_html=True)
+# Prebuilt once per process (page_sections), one element for styles + hero
+st.markdown(page_sections.HERO, unsafe_allow_html=True)
 
 # =============================================================================
-# INPUT SECTION — Text or Image
+# QUESTION GENERATION LOGIC
 # =============================================================================
 
-st.markdown("## 📝 Enter Today's News Topic")
+# Stream tokens into the page as they arrive (set UPSC_STREAMING=0 to block instead)
+STREAMING = os.environ.get("UPSC_STREAMING", "1") != "0"
 
-input_method = st.radio(
-    "Choose input method:",
-    ["✍️ Type/Paste Topic", "📷 Upload Screenshot"],
-    horizontal=True,
-    label_visibility="collapsed"
-)
+# How often the page checks on a running job when nothing new has arrived
+JOB_POLL_SECONDS = 1.0
 
-topic_text = None
-uploaded_image = None
+# Typical mobile uplink, for estimating the upload time screenshot compression saves
+UPLINK_MBPS = float(os.environ.get("UPSC_UPLINK_MBPS", 10))
 
-if input_method == "✍️ Type/Paste Topic":
-    topic_text = st.text_area(
-        "Enter any current affairs topic or news headline:",
-        placeholder="Example: Governor delays NEET bill in Tamil Nadu\nExample: India-China LAC disengagement\nExample: RBI keeps repo rate unchanged",
-        height=100
-    )
-else:
-    uploaded_image = st.file_uploader(
-        "Upload a screenshot of news article:",
-        type=['png', 'jpg', 'jpeg'],
-        help="Screenshot from Hindu, Indian Express, PIB, or any news source"
-    )
-    
-    if uploaded_image:
-        st.image(uploaded_image, caption="Uploaded Screenshot", use_container_width=True)
-
-# Generate button
-col1, col2, col3 = st.columns([1, 2, 1])
-with col2:
-    generate_clicked = st.button(
-        "🚀 Generate 10 Questions (Uses 1 Credit)",
-        use_container_width=True,
-        type="primary",
-        disabled=(st.session_state.credits < 1)
-    )
-
-if st.session_state.credits < 1:
-    st.error("⚠️ No credits left! Please add credits to continue.")
 
-# =============================================================================
-# QUESTION GENERATION LOGIC
-# =============================================================================
-
-def generate_questions(topic: str, image_data: bytes = None) -> str:
+def start_generation(label: str, topic: str = None, image: PreparedImage = None, pipeline: bool = False) -> Job:
     """
-    Call Claude API to generate UPSC questions.
+    Hold one credit for this click and start its generation as a background
+    job. The job settles the credit itself when it ends — spent and filed in
+    the history on success, given back on failure — whether or not this page
+    is still there. A rerun of the same click (Streamlit restarts the script
+    on a second click) reuses the hold and the running job.
+    
+    With pipeline=True the paper is generated as detection → (MCQs ∥ MAINS)
+    instead of one long call (not streamed).
     """
-    
-    # Get API key - works with both Streamlit Cloud and Hugging Face Spaces
-    import os
-    api_key = None
-    
-    # Try Streamlit secrets first
+    ledger = get_ledger()
+    generator = get_generator()
+    telemetry = generator.telemetry
+    account = ACCOUNT
+    session_id = st.session_state.session_id
+    plan = st.session_state.plan
+    request_id = st.session_state.click_id
+    key = hold_key(account, request_id)
     try:
-        api_key = st.secrets["ANTHROPIC_API_KEY"]
-    except:
-        pass
-    
-    # Try environment variable (Hugging Face uses this)
-    if not api_key:
-        api_key = os.environ.get("ANTHROPIC_API_KEY")
-    
-    if not api_key:
-        st.error("API key not configured. Please add ANTHROPIC_API_KEY to secrets.")
+        ledger.reserve(account, key)
+    except InsufficientCredits:
+        telemetry.credit("refused", request_id)
+        st.error("⚠️ No credits left! Please add credits to continue.")
         return None
     
-    try:
-        client = anthropic.Anthropic(api_key=api_key)
-    except Exception as e:
-        st.error(f"Error initializing API: {str(e)}")
-        return None
+    def work(report):
+        return generator.generate(
+            topic, image, stream=STREAMING, pipeline=pipeline,
+            session_id=session_id, request_id=request_id, plan=plan,
+            on_wait=report.waiting, on_progress=report.progress,
+        )
+    
+    def settle(job, result):
+        # On the job's worker thread: no st.* calls in here. The credit is
+        # spent last, so anything failing before it gives the credit back.
+        if not job.output:
+            ledger.refund(key)
+            telemetry.credit("refunded", request_id)
+            return None
+        entry = {
+            'topic': label,
+            'timestamp': datetime.now().isoformat(),
+            'timings': job.meta['timings'],
+            'usage': job.meta['usage'],
+        }
+        try:
+            # The full paper goes with it (compressed, stored once per distinct text)
+            output_hash = ledger.record(account, entry, job.output)
+        except Exception:
+            ledger.refund(key)
+            telemetry.credit("refunded", request_id)
+            raise
+        if ledger.commit(key).state == COMMITTED:
+            telemetry.credit("committed", request_id)
+        else:
+            telemetry.credit("late_commit", request_id)     # refunded as stale first: this paper went free
+        return {'output_hash': output_hash}
     
-    # Build the prompt
-    system_prompt = """You are an expert UPSC question paper setter with 20+ years experience. 
-You have deep knowledge of UPSC exam patterns from analyzing 1,472 Prelims and 417 Mains previous year questions.
-
-Your task: Generate 10 high-quality UPSC practice questions from the given topic.
-
-OUTPUT FORMAT:
-═══════════════════════════════════════════════════════════════════════════════
-TOPIC DETECTION
-═══════════════════════════════════════════════════════════════════════════════
-Primary Topic: [Detected topic]
-Subject: [Polity/Economy/History/Geography/Environment/Ethics/IR/Security]
-Paper: [GS-I/GS-II/GS-III/GS-IV]
-
-Cross-Subject Angles Identified:
-1. [Angle 1] - [Subject] - [Connection to main topic]
-2. [Angle 2] - [Subject] - [Connection to main topic]
-3. [Angle 3] - [Subject] - [Connection to main topic]
-
-═══════════════════════════════════════════════════════════════════════════════
-SECTION A: MCQs (5 Questions)
-═══════════════════════════════════════════════════════════════════════════════
-
-MCQ 1: [Archetype: P-01/P-06/P-07]
-[Question text with options a, b, c, d]
-
-✅ Answer: [Correct option]
-⚠️ Trap Applied: [T-XX: Name] — [How trap is embedded]
-📖 Explanation: [Brief explanation]
-
-[Repeat for MCQ 2-5, with at least 2 from cross-subject angles]
-
-═══════════════════════════════════════════════════════════════════════════════
-SECTION B: MAINS QUESTIONS (5 Questions)
-═══════════════════════════════════════════════════════════════════════════════
-
-MAINS 1:
-📋 Archetype: [EVAL-PC-3D-H / AN-ST-4D-D / etc.]
-📝 Question: [Full question text] (15 marks, 250 words)
-
-📝 Answer Framework:
-┌─ Introduction (30 words): [What to write]
-├─ Body Para 1 (50 words): [What to cover]
-├─ Body Para 2 (50 words): [What to cover]
-├─ Body Para 3 (50 words): [What to cover]
-├─ Body Para 4 (40 words): [What to cover]
-└─ Conclusion (30 words): [How to end]
-
-📌 Must-Include:
-• [Key case/committee/article 1]
-• [Key case/committee/article 2]
-• [Key case/committee/article 3]
-
-❌ Traps to Avoid:
-• Don't [common mistake 1]
-• Don't [common mistake 2]
-✓ Conclude with: [Balanced conclusion approach]
-
-[Repeat for MAINS 2-5, including Ethics case study if relevant]
-
-═══════════════════════════════════════════════════════════════════════════════
-
-IMPORTANT RULES:
-1. MCQs must embed realistic UPSC traps (T-01: Absolute words, T-02: Institution swap, T-06: Constitutional claims, T-20: May vs Shall, T-29: AND connector trap)
-2. Mains must have 4D archetype code and word allocation
-3. At least 3 questions must be from cross-subject angles
-4. Include one Ethics case study if topic allows
-5. All must-includes should be real (actual cases, committees, articles)
-6. Constitutional balance in conclusions — reforms not revolution
-"""
+    return get_jobs().start(request_id, owner=account, session=session_id, label=label, work=work, on_done=settle)
 
-    # Build message content
-    if image_data:
-        # Image input
-        base64_image = base64.standard_b64encode(image_data).decode("utf-8")
-        
-        # Detect image type
-        if image_data[:8] == b'\x89PNG\r\n\x1a\n':
-            media_type = "image/png"
-        else:
-            media_type = "image/jpeg"
-        
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": base64_image
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": "Read this news screenshot and generate 10 UPSC practice questions based on the topic/content shown. Follow the exact output format specified."
-                    }
-                ]
-            }
-        ]
-    else:
-        # Text input
-        messages = [
-            {
-                "role": "user",
-                "content": f"Generate 10 UPSC practice questions for this topic:\n\n{topic}\n\nFollow the exact output format specified."
-            }
-        ]
+
+def watch_job(job: Job) -> Job:
+    """
+    Follow a job until it ends: the queue position while it waits for
+    admission, then the questions block by block as they stream in. Every
+    poll is also the job's heartbeat. Returns the job once it has finished,
+    or still running once it is older than the job store's timeout.
+    """
+    jobs = get_jobs()
+    queue_status = st.empty()
+    preview = None
+    shown = None
+    
+    with st.spinner("🧠 Analyzing topic and generating questions..."):
+        while not job.finished and time.time() - job.created < jobs.timeout:
+            if job.progress and job.progress != shown:
+                # First completed block: swap the spinner's place for the questions header
+                if preview is None:
+                    queue_status.empty()
+                    st.markdown("---")
+                    st.markdown("## 📋 Generated Questions")
+                    preview = st.empty()
+                preview.markdown(paper_cards.fallback_html(job.progress), unsafe_allow_html=True)
+                shown = job.progress
+            elif job.waiting and preview is None:
+                position, wait = job.waiting
+                queue_status.info(f"⏳ High demand right now — you're #{position} in line (about {wait:.0f}s)")
+            job = jobs.wait(job.id, timeout=JOB_POLL_SECONDS)
+    queue_status.empty()
+    # The page re-renders the full output via display_output, so drop the preview
+    if preview is not None:
+        preview.empty()
+    return job
+
+
+def finish_job(job: Job, reattached: bool = False) -> str:
+    """
+    Hand a finished job to this session: report problems on the page, put
+    the paper on screen and refresh the history. Returns the paper, or None.
+    """
+    if not job.finished:
+        # Still the click's job: Generate again reattaches to it rather than paying twice
+        st.warning("⏳ This paper is taking much longer than usual. It is still being written — "
+                   "reload the page in a few minutes to pick it up.")
+        return None
+    get_jobs().deliver(job.id, st.session_state.session_id, reattached=reattached)
+    if job.id == st.session_state.click_id:
+        st.session_state.click_id = uuid.uuid4().hex
     
-    # Call Claude API
-    try:
-        with st.spinner("🧠 Analyzing topic and generating questions..."):
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=6000,
-                system=system_prompt,
-                messages=messages
-            )
-        
-        return response.content[0].text
+    if job.error_kind in (CAPACITY, OVERLOADED):
+        st.warning(f"⏳ {job.error} Please try again in a minute — no credit was used.")
+    elif job.error:
+        st.error(job.error)
     
-    except anthropic.APIError as e:
-        st.error(f"API Error: {str(e)}")
+    if not job.output:
         return None
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
+    if not job.meta.get('output_hash'):
+        # Written, but filing it in the history failed (the credit was given back): show it as it is
+        st.warning("⚠️ This paper couldn't be saved to your history — no credit was used. "
+                   "It stays on screen only until the page changes.")
+        display_output(job.output, job.meta.get('timings'))
         return None
+    st.session_state.recent_history = get_ledger().history(ACCOUNT, HISTORY_PAGE)
+    st.session_state.history_page = 0
+    st.session_state.paper = (job.meta['output_hash'], job.label, job.meta.get('timings'))
+    return job.output
 
 
-def display_output(output: str):
+def render_paper(output: str):
+    """
+    The paper as escaped question cards, one page at a time: answers, traps
+    and Mains frameworks sit in collapsed expanders, and only the page on
+    screen is sent to the browser.
+    """
+    paper = paper_cards.build(output)
+    if not paper.cards:
+        st.markdown(paper.fallback, unsafe_allow_html=True)
+        return
+    
+    labels = paper.page_labels()
+    page = 0
+    if len(labels) > 1:
+        page = labels.index(st.radio("Questions", labels, horizontal=True, label_visibility="collapsed"))
+    if page == 0 and paper.summary:
+        st.markdown(paper.summary, unsafe_allow_html=True)
+    for card in paper.page(page):
+        st.markdown(card.body, unsafe_allow_html=True)
+        with st.expander(card.details_label):
+            st.markdown(card.details, unsafe_allow_html=True)
+
+
+@st.cache_resource
+def get_exports() -> ExportStore:
+    """
+    PDF / Word / flashcard files, built in a small pool on first request and
+    kept on disk by content hash, shared by every session (predictor.exports;
+    UPSC_EXPORTS, UPSC_EXPORT_MAX_MB).
+    """
+    return ExportStore.from_env()
+
+
+def export_buttons(output: str, file_stem: str):
+    """
+    One download button per format. A format nobody has asked for yet shows
+    a build button instead; once built, the file comes off disk on every
+    rerun instead of being rebuilt or kept in the session.
+    """
+    exports = get_exports()
+    for column, fmt in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.values()):
+        with column:
+            slot = st.empty()
+            artifact = exports.get(output, fmt.name)
+            if artifact is None:
+                if not slot.button(f"📄 {fmt.label}", key=f"export-{fmt.name}", use_container_width=True):
+                    continue
+                with st.spinner(f"Preparing {fmt.label}..."):
+                    artifact = exports.request(output, fmt.name).result()
+            with artifact.open() as f:
+                slot.download_button(f"📥 {fmt.label}", data=f, file_name=f"{file_stem}.{fmt.extension}",
+                                     mime=fmt.mime, key=f"download-{fmt.name}", use_container_width=True)
+
+
+def display_output(output: str, timings: dict = None):
     """
     Display the generated questions in a nice format.
     """
@@ -418,251 +384,213 @@ def display_output(output: str):
     st.markdown("---")
     st.markdown("## 📋 Generated Questions")
     
-    # Display in a nice container
-    st.markdown(f"""
-    <div style="background: #f7fafc; padding: 1.5rem; border-radius: 10px; border: 1px solid #e2e8f0;">
-        <pre style="white-space: pre-wrap; font-family: 'Segoe UI', sans-serif; font-size: 0.95rem; line-height: 1.6;">{output}</pre>
-    </div>
-    """, unsafe_allow_html=True)
+    render_paper(output)
+    
+    if timings:
+        if timings.get('degraded'):
+            st.caption(f"🛟 The AI service is unavailable right now — this is the closest paper already "
+                       f"generated (“{timings['similar_to']}”)")
+        elif timings.get('similar_to'):
+            st.caption(f"♻️ Same story as an earlier topic (“{timings['similar_to']}”) — served from cache "
+                       f"in {timings['total'] * 1000:.0f} ms")
+        elif timings['cached']:
+            st.caption(f"⚡ Served from cache in {timings['total'] * 1000:.0f} ms")
+        elif timings['coalesced']:
+            st.caption(f"🤝 Same topic was already being generated — ready in {timings['total']:.1f}s")
+        else:
+            st.caption(f"⏱️ First content after {timings['ttft']:.1f}s · complete in {timings['total']:.1f}s")
+        if timings['repaired']:
+            st.caption(f"🔧 {timings['repaired']} incomplete question(s) were regenerated automatically")
     
-    # Download button
+    # Download buttons: the text as it is, then printable and flashcard copies
+    file_stem = f"upsc_questions_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     st.download_button(
         label="📥 Download as Text File",
         data=output,
-        file_name=f"upsc_questions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+        file_name=f"{file_stem}.txt",
         mime="text/plain"
     )
+    export_buttons(output, file_stem)
 
 
 # =============================================================================
-# HANDLE GENERATION
+# INPUT, GENERATION AND OUTPUT — one fragment
 # =============================================================================
 
-if generate_clicked:
+def reopen_paper(output_hash: str, label: str):
+    st.session_state.paper = (output_hash, label, None)
+
+
+def turn_history_page(step: int):
+    st.session_state.history_page += step
+
+
+def handle_generation(input_method: str, topic_text: str, uploaded_image, fast_mode: bool):
+    """
+    The Generate click: validate the input, spend a credit on it and show the paper.
+    """
     if input_method == "✍️ Type/Paste Topic":
         if not topic_text or len(topic_text.strip()) < 5:
             st.warning("Please enter a valid topic (at least 5 characters)")
-        else:
-            output = generate_questions(topic_text)
-            if output:
-                st.session_state.credits -= 1
-                st.session_state.total_queries += 1
-                st.session_state.query_history.append({
-                    'topic': topic_text,
-                    'timestamp': datetime.now().isoformat(),
-                    'output': output[:500] + "..."  # Store preview
-                })
-                display_output(output)
-                st.balloons()
+            return
+        job = start_generation(topic_text, topic_text, pipeline=fast_mode)
     else:
         if not uploaded_image:
             st.warning("Please upload an image first")
-        else:
-            image_bytes = uploaded_image.read()
-            output = generate_questions(None, image_bytes)
-            if output:
-                st.session_state.credits -= 1
-                st.session_state.total_queries += 1
-                st.session_state.query_history.append({
-                    'topic': "Image Upload",
-                    'timestamp': datetime.now().isoformat(),
-                    'output': output[:500] + "..."
-                })
-                display_output(output)
-                st.balloons()
-
-# =============================================================================
-# HOW IT WORKS SECTION
-# =============================================================================
-
-st.markdown("---")
-st.markdown('<a name="how-it-works"></a>', unsafe_allow_html=True)
-st.markdown("## 🎯 How It Works")
-
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown("""
-    ### 1️⃣ Input
-    Type topic or upload news screenshot
-    """)
-
-with col2:
-    st.markdown("""
-    ### 2️⃣ Analysis
-    AI detects subject + 3 cross-angles
-    """)
-
-with col3:
-    st.markdown("""
-    ### 3️⃣ Generation
-    10 questions with traps & frameworks
-    """)
-
-with col4:
-    st.markdown("""
-    ### 4️⃣ Practice
-    MCQs + Mains with answer guidance
-    """)
+            return
+        try:
+            image = prepare_image(uploaded_image.getvalue())
+        except ValueError as e:
+            st.warning(str(e))
+            return
+        get_generator().image_stats.record(image)
+        if image.bytes_saved > 0:
+            st.caption(
+                f"🗜️ Screenshot {image.original_bytes / 1024:,.0f} KB → {len(image.data) / 1024:,.0f} KB "
+                f"({image.original_width}×{image.original_height} → {image.width}×{image.height}) · "
+                f"~{image.upload_seconds_saved(UPLINK_MBPS * 125_000):.1f}s less upload "
+                f"at {UPLINK_MBPS:g} Mbit/s"
+            )
+        job = start_generation("Image Upload", image=image, pipeline=fast_mode)
+    
+    if job:
+        show_job(job)
 
-# =============================================================================
-# WHAT MAKES US DIFFERENT
-# =============================================================================
 
-st.markdown("---")
-st.markdown("## ✨ Why This is Different")
-
-col1, col2 = st.columns(2)
-
-with col1:
-    st.markdown("""
-    ### ❌ Generic AI (ChatGPT/Gemini)
-    - Single subject questions only
-    - No exam trap awareness
-    - Generic answer formats
-    - Missing key elements
-    - One-sided conclusions
-    """)
-
-with col2:
-    st.markdown("""
-    ### ✅ UPSC Predictor
-    - **Multi-angle**: 5 GS papers from 1 topic
-    - **32 traps**: Real UPSC patterns embedded
-    - **4D Archetypes**: Proper answer structure
-    - **Must-includes**: Cases, committees, articles
-    - **Constitutional balance**: Examiner-approved framing
-    """)
+def show_job(job: Job, reattached: bool = False):
+    """
+    Watch a job to the end, then rerun the whole page to show its paper: a
+    fragment rerun leaves the sidebar alone, and credits and history have
+    to catch up. The rerun draws the paper from st.session_state.paper.
+    """
+    if finish_job(watch_job(job), reattached):
+        st.session_state.celebrate = True
+        st.rerun()
 
-# =============================================================================
-# SAMPLE OUTPUT PREVIEW
-# =============================================================================
 
-st.markdown("---")
-st.markdown("## 📄 Sample Output Preview")
-
-with st.expander("Click to see sample output for 'CEC Impeachment' topic"):
-    st.markdown("""
-    ```
-    ═══════════════════════════════════════════════════════════════
-    TOPIC DETECTION
-    ═══════════════════════════════════════════════════════════════
-    Primary Topic: Election Commission / CEC Removal
-    Subject: Polity & Governance
-    Paper: GS-II
-    
-    Cross-Subject Angles Identified:
-    1. Historical Evolution - GS-I - T.N. Seshan era reforms
-    2. Federalism - GS-II - Centre-State in EC appointments
-    3. Institutional Ethics - GS-IV - Independence vs accountability
-    
-    ═══════════════════════════════════════════════════════════════
-    SECTION A: MCQs
-    ═══════════════════════════════════════════════════════════════
-    
-    MCQ 1: [Archetype: P-01]
-    Consider the following statements about CEC removal:
-    1. CEC can be removed only through impeachment
-    2. Removal procedure is same as Supreme Court judge
-    3. Grounds are incapacity and proved misbehavior
-    
-    Which is/are correct?
-    (a) 1 and 2 only  (b) 2 and 3 only  
-    (c) 1 and 3 only  (d) 1, 2 and 3
-    
-    ✅ Answer: (b) 2 and 3 only
-    ⚠️ Trap: T-01 (Absolute Words) — "only through impeachment" is 
-       imprecise. Constitution says "in like manner" as SC judge.
-    
-    [... 4 more MCQs ...]
-    
-    ═══════════════════════════════════════════════════════════════
-    SECTION B: MAINS
-    ═══════════════════════════════════════════════════════════════
+@st.fragment
+def workspace():
+    """
+    Everything a visitor interacts with while working: input, Generate and
+    the paper on screen. Typing, switching input or toggling fast mode
+    reruns only this function (a fragment), not the page around it.
+    """
+    credits, _ = get_ledger().balance(ACCOUNT)
     
-    MAINS 1:
-    📋 Archetype: EVAL-PC-3D-H
-    📝 Question: Critically examine the appointment and removal 
-       process of CEC. Has the 2023 Act addressed SC's concerns?
+    st.markdown("## 📝 Enter Today's News Topic")
     
-    📝 Answer Framework:
-    ┌─ Introduction (30 words): Recent controversy context
-    ├─ Constitutional Framework (40 words): Article 324
-    ├─ SC Judgment Analysis (50 words): Anoop Baranwal case
-    ├─ 2023 Act Evaluation (50 words): New process
-    ├─ Critical Assessment (50 words): Both sides
-    └─ Way Forward (30 words): Balanced reforms
+    input_method = st.radio(
+        "Choose input method:",
+        ["✍️ Type/Paste Topic", "📷 Upload Screenshot"],
+        horizontal=True,
+        label_visibility="collapsed"
+    )
     
-    📌 Must-Include:
-    • Article 324(2) and 324(5)
-    • Anoop Baranwal vs UOI (2023)
-    • T.N. Seshan tenure reference
+    topic_text = None
+    uploaded_image = None
     
-    [... 4 more Mains questions ...]
-    ```
-    """)
+    if input_method == "✍️ Type/Paste Topic":
+        topic_text = st.text_area(
+            "Enter any current affairs topic or news headline:",
+            placeholder="Example: Governor delays NEET bill in Tamil Nadu\nExample: India-China LAC disengagement\nExample: RBI keeps repo rate unchanged",
+            height=100
+        )
+    else:
+        uploaded_image = st.file_uploader(
+            "Upload a screenshot of news article:",
+            type=['png', 'jpg', 'jpeg', 'webp'],
+            help="Screenshot from Hindu, Indian Express, PIB, or any news source"
+        )
+        
+        if uploaded_image:
+            st.image(uploaded_image, caption="Uploaded Screenshot", use_container_width=True)
+    
+    # Generate button
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col2:
+        fast_mode = st.toggle(
+            "⚡ Fast mode — write MCQs and Mains in parallel",
+            value=os.environ.get("UPSC_PIPELINE", "0") == "1",
+            help="Detects the topic first, then generates both sections at the same time."
+        )
+        generate_clicked = st.button(
+            "🚀 Generate 10 Questions (Uses 1 Credit)",
+            use_container_width=True,
+            type="primary",
+            disabled=(credits < 1)
+        )
+    
+    if credits < 1:
+        st.error("⚠️ No credits left! Please add credits to continue.")
+    
+    pending = None if generate_clicked else get_jobs().pending(ACCOUNT)
+    if generate_clicked:
+        st.session_state.paper = None
+        handle_generation(input_method, topic_text, uploaded_image, fast_mode)
+    elif pending:
+        # Back after a refresh, a dropped connection or a rerun mid-generation:
+        # the job kept going without us, so pick it up instead of starting over
+        job = pending[0]
+        st.session_state.paper = None
+        if job.finished:
+            st.session_state.notice = f"🔄 Your paper for “{job.label}” finished while you were away"
+        else:
+            st.info(f"🔄 Still writing your paper for “{job.label}” — picking up where you left off")
+            st.session_state.notice = f"🔄 Your paper for “{job.label}” is ready"
+        show_job(job, reattached=True)
+    elif st.session_state.paper:
+        # Stays on screen through later interactions until the next Generate
+        output_hash, label, timings = st.session_state.paper
+        output = get_ledger().output(output_hash)
+        if not output:
+            st.warning("That paper is no longer in your history.")
+        elif timings is None:
+            st.info(f"📜 Re-opened “{label}” from your history — no credit used")
+            display_output(output)
+        else:
+            if 'notice' in st.session_state:
+                st.info(st.session_state.pop('notice'))
+            display_output(output, timings)
+            if st.session_state.pop('celebrate', False):
+                st.balloons()
 
-# =============================================================================
-# PRICING SECTION
-# =============================================================================
 
-st.markdown("---")
-st.markdown("## 💰 Simple Pricing")
-
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown("""
-    <div class="pricing-card featured">
-        <h3>☕ Try</h3>
-        <p class="price-tag">₹15</p>
-        <p>1 Query</p>
-        <p><small>Price of one chai!</small></p>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    st.markdown("""
-    <div class="pricing-card">
-        <h3>📚 Starter</h3>
-        <p class="price-tag">₹149</p>
-        <p>10 Queries</p>
-        <p><small>₹14.90 each</small></p>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col3:
-    st.markdown("""
-    <div class="pricing-card">
-        <h3>🎯 Pro</h3>
-        <p class="price-tag">₹499</p>
-        <p>40 Queries</p>
-        <p><small>₹12.48 each</small></p>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col4:
-    st.markdown("""
-    <div class="pricing-card">
-        <h3>🏆 Premium</h3>
-        <p class="price-tag">₹899</p>
-        <p>80 Queries</p>
-        <p><small>₹11.24 each</small></p>
-    </div>
-    """, unsafe_allow_html=True)
+workspace()
+
+with history_panel:
+    history_count = get_ledger().history_count(ACCOUNT)
+    st.markdown("## 📜 Your Papers")
+    if not history_count:
+        st.caption("Every paper you generate is kept here — re-open it any time without using a credit.")
+    else:
+        pages = -(-history_count // HISTORY_PAGE)
+        page = min(st.session_state.history_page, pages - 1)
+        entries = (st.session_state.recent_history if page == 0
+                   else get_ledger().history(ACCOUNT, HISTORY_PAGE, page * HISTORY_PAGE))
+        for i, entry in enumerate(entries):
+            when = datetime.fromisoformat(entry['timestamp']).strftime("%d %b %H:%M")
+            label = entry['topic'] if len(entry['topic']) <= 36 else entry['topic'][:35] + "…"
+            if entry.get('output_hash'):
+                st.button(f"{label} · {when}", key=f"history-{page}-{i}", use_container_width=True,
+                          on_click=reopen_paper, args=(entry['output_hash'], entry['topic']))
+            else:
+                st.caption(f"{label} · {when}")
+        if pages > 1:
+            back, where, forward = st.columns([1, 2, 1])
+            back.button("◀", key="history-back", disabled=page == 0,
+                        on_click=turn_history_page, args=(-1,))
+            where.caption(f"page {page + 1} of {pages}")
+            forward.button("▶", key="history-forward", disabled=page >= pages - 1,
+                           on_click=turn_history_page, args=(1,))
 
 # =============================================================================
-# FOOTER
+# HOW IT WORKS, WHY THIS IS DIFFERENT, SAMPLE OUTPUT, PRICING, FOOTER
 # =============================================================================
 
-st.markdown("---")
-st.markdown("""
-<div class="footer">
-    <p><strong>UPSC Multi-Angle Predictor</strong></p>
-    <p>Built for serious aspirants who want an edge.</p>
-    <p>Questions? Email: support@upscpredictor.com</p>
-    <p style="margin-top: 1rem; font-size: 0.8rem;">
-        ☕ Skip the chai. Crack the exam.
-    </p>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(page_sections.HOW_IT_WORKS, unsafe_allow_html=True)
+st.markdown(page_sections.WHY_DIFFERENT, unsafe_allow_html=True)
+
+with st.expander(page_sections.SAMPLE_OUTPUT_LABEL):
+    st.code(page_sections.SAMPLE_OUTPUT, language=None)
+
+st.markdown(page_sections.PRICING, unsafe_allow_html=True)
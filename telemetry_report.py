@@ -0,0 +1,206 @@
+"""
+UPSC MULTI-ANGLE PREDICTOR — TELEMETRY REPORT
+=============================================
+Read the JSONL events predictor.telemetry writes (rotated files included)
+and summarise them per day: outcomes, cache hit rate, p50 / p95 / p99 of
+upstream latency, time to first token and queue wait, tokens, list-price
+cost (predictor.usage.PRICES), how paid clicks were settled and how many
+background jobs were abandoned and then recovered; and per
+model tier and task (predictor.routing), upstream call latency, output
+tokens against the max_tokens budget and how often answers were cut off.
+
+    python telemetry_report.py                          # .cache/telemetry/
+    python telemetry_report.py /var/log/upsc/ --days 7
+    python telemetry_report.py events-*.jsonl* --json   # machine-readable
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from predictor.telemetry import CALL, CREDIT, DEFAULT_PATH, ERROR, GENERATION, JOB, UPSTREAM
+from predictor.usage import cost_usd
+
+HITS = ("cache", "similar", "coalesced", "degraded")
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def event_files(paths: list) -> list:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += glob.glob(os.path.join(path, "*.jsonl")) + glob.glob(os.path.join(path, "*.jsonl.*"))
+        else:
+            files += glob.glob(path)
+    return sorted(set(files))
+
+
+def read_events(files: list) -> tuple:
+    events, bad = [], 0
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    bad += 1        # a line cut short by a crash mid-write
+    return events, bad
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    return {f"p{q}": values[min(int(len(values) * q / 100), len(values) - 1)] for q in (50, 95, 99)}
+
+
+def summarise(events: list) -> dict:
+    outcomes, errors, credits, jobs = Counter(), Counter(), Counter(), Counter()
+    latency, ttft, queue_wait, hit_latency = [], [], [], []
+    tokens, cost = Counter(), 0.0
+    retried = hedged = 0
+    calls = defaultdict(list)
+    for e in events:
+        if e.get("event") == CALL:
+            calls[f"{e.get('tier')}/{e.get('task')}"].append(e)
+            continue
+        if e.get("event") == CREDIT:
+            credits[e.get("outcome")] += 1
+            continue
+        if e.get("event") == JOB:
+            jobs[e.get("outcome")] += 1
+            jobs["abandoned_recovered"] += e.get("outcome") == "recovered" and e.get("abandoned", False)
+            continue
+        if e.get("event") != GENERATION:
+            continue
+        outcome = e.get("outcome")
+        outcomes[outcome] += 1
+        retried += e.get("attempts", 1) > 1 + e.get("hedged", False)
+        hedged += e.get("hedged", False)
+        if outcome == ERROR:
+            errors[e.get("error_kind")] += 1
+        elif outcome in HITS and "total" in e:
+            hit_latency.append(e["total"])
+        elif outcome == UPSTREAM:
+            if "total" in e and e.get("mode") != "batch":
+                latency.append(e["total"])
+                queue_wait.append(e.get("queue_wait", 0.0))
+            if e.get("mode") == "stream" and e.get("ttft") is not None:
+                ttft.append(e["ttft"])
+        usage = [e.get(k, 0) for k in TOKEN_FIELDS]
+        if any(usage):
+            tokens.update(dict(zip(("input", "output", "cache_write", "cache_read"), usage)))
+            cost += e["cost_usd"] if "cost_usd" in e else cost_usd(e.get("model"), *usage,
+                                                                    batch=e.get("mode") == "batch")
+    served = sum(n for o, n in outcomes.items() if o != ERROR)
+    return {
+        "requests": sum(outcomes.values()),
+        "outcomes": dict(outcomes),
+        "errors": dict(errors),
+        "hit_rate": sum(outcomes[o] for o in HITS) / served if served else 0.0,
+        "upstream_seconds": percentiles(latency),
+        "ttft_seconds": percentiles(ttft),
+        "queue_wait_seconds": percentiles(queue_wait),
+        "hit_seconds": percentiles(hit_latency),
+        "tokens": dict(tokens),
+        "cost_usd": round(cost, 4),
+        "cost_per_paid_paper_usd": round(cost / outcomes[UPSTREAM], 4) if outcomes[UPSTREAM] else None,
+        "credits": dict(credits),
+        "jobs": {k: v for k, v in jobs.items() if v},
+        "retried": retried,     # generations that needed more than one upstream attempt
+        "hedged": hedged,       # generations that raced a duplicate request
+        "tiers": {name: summarise_calls(group) for name, group in sorted(calls.items())},
+    }
+
+
+def summarise_calls(calls: list) -> dict:
+    """
+    Upstream calls of one tier/task: the numbers the routing is tuned from.
+    """
+    output = [c.get("output_tokens", 0) for c in calls]
+    return {
+        "calls": len(calls),
+        "seconds": percentiles([c["seconds"] for c in calls if "seconds" in c]),
+        "output_tokens": percentiles(output),
+        "max_tokens_mean": round(sum(c.get("max_tokens", 0) for c in calls) / len(calls)),
+        "truncated": sum(c.get("stop_reason") == "max_tokens" for c in calls),
+        "cost_usd": round(sum(cost_usd(c.get("model"), *(c.get(k, 0) for k in TOKEN_FIELDS)) for c in calls), 4),
+    }
+
+
+def show(label: str, summary: dict):
+    def ps(values, scale=1.0, unit="s"):
+        if not values:
+            return "—"
+        return " / ".join(f"{values[p] * scale:.{1 if unit == 's' else 0}f}" for p in ("p50", "p95", "p99")) + f" {unit}"
+
+    outcomes = ", ".join(f"{k} {v}" for k, v in sorted(summary["outcomes"].items()))
+    print(f"{label}: {summary['requests']} generations ({outcomes or 'none'})")
+    print(f"  cache hit rate {summary['hit_rate']:.0%}"
+          + (f"; errors {', '.join(f'{k} {v}' for k, v in summary['errors'].items())}" if summary["errors"] else ""))
+    if summary["retried"] or summary["hedged"]:
+        print(f"  retried {summary['retried']}, hedged {summary['hedged']}")
+    print(f"  upstream total p50/p95/p99  {ps(summary['upstream_seconds'])}")
+    print(f"  first token   p50/p95/p99  {ps(summary['ttft_seconds'])}")
+    print(f"  queue wait    p50/p95/p99  {ps(summary['queue_wait_seconds'])}")
+    print(f"  cache hits    p50/p95/p99  {ps(summary['hit_seconds'], 1000, 'ms')}")
+    tokens = summary["tokens"]
+    per_paper = summary["cost_per_paid_paper_usd"]
+    print(f"  tokens in {tokens.get('input', 0):,} (+{tokens.get('cache_read', 0):,} cache read, "
+          f"{tokens.get('cache_write', 0):,} cache write), out {tokens.get('output', 0):,}; "
+          f"cost ${summary['cost_usd']:.2f}" + (f" (${per_paper:.3f} per paid paper)" if per_paper else ""))
+    if summary["credits"]:
+        print(f"  credits {', '.join(f'{k} {v}' for k, v in sorted(summary['credits'].items()))}")
+    jobs = summary["jobs"]
+    if jobs:
+        print(f"  jobs {', '.join(f'{k} {v}' for k, v in sorted(jobs.items()) if k != 'abandoned_recovered')}; "
+              f"{jobs.get('abandoned_recovered', 0)} of {jobs.get('abandoned', 0)} abandoned recovered")
+    for name, tier in summary["tiers"].items():
+        tokens = tier["output_tokens"]
+        cut_off = f", {tier['truncated']} cut off" if tier["truncated"] else ""
+        print(f"  {name:18} {tier['calls']:5} calls, p50/p95/p99 {ps(tier['seconds'])}, output p50/p99 "
+              f"{tokens.get('p50', 0)}/{tokens.get('p99', 0)} of ~{tier['max_tokens_mean']}{cut_off}, "
+              f"${tier['cost_usd']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise telemetry events per day")
+    parser.add_argument("paths", nargs="*", default=[os.path.dirname(DEFAULT_PATH)],
+                        help="event files, globs or directories (default: %(default)s)")
+    parser.add_argument("--days", type=int, help="only the last N days")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    args = parser.parse_args()
+
+    files = event_files(args.paths)
+    if not files:
+        sys.exit(f"error: no event files in {', '.join(args.paths)}")
+    events, bad = read_events(files)
+
+    by_day = defaultdict(list)
+    for e in events:
+        by_day[datetime.fromtimestamp(e.get("ts", 0)).strftime("%Y-%m-%d")].append(e)
+    days = sorted(by_day)[-args.days:] if args.days else sorted(by_day)
+    report = {
+        "files": len(files),
+        "unreadable_lines": bad,
+        "days": {day: summarise(by_day[day]) for day in days},
+        "total": summarise([e for day in days for e in by_day[day]]),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{len(events):,} events from {len(files)} file(s)" + (f", {bad} unreadable line(s) skipped" if bad else ""))
+    for day in days:
+        print()
+        show(day, report["days"][day])
+    if len(days) > 1:
+        print()
+        show("all days", report["total"])
+
+
+if __name__ == "__main__":
+    main()